@@ -1,61 +1,8 @@
 import json
 import re
 
-# 官方API的52家店铺数据（从用户提供的JSON中提取）
-official_stores = {
-    81: {"name": "아크테릭스 롯데백화점 본점", "address_full": "(04533) 서울 중구 남대문로 81 롯데백화점본점 7층", "code": "SB301"},
-    82: {"name": "아크테릭스 롯데백화점 평촌점", "address_full": "(14073) 경기 안양시 동안구 시민대로 180 롯데백화점 평촌점 4층", "code": "SB308"},
-    87: {"name": "아크테릭스 플래그십 스토어 강남", "address_full": "(06018) 서울 강남구 선릉로157길 18 아크테릭스 플래그십 스토어 강남", "code": "SA211"},
-    88: {"name": "아크테릭스 플래그십 스토어 대구수성", "address_full": "(42089) 대구 수성구 달구벌대로 2560 아크테릭스 플래그십 스토어 대구수성", "code": "SA205"},
-    89: {"name": "아크테릭스 도봉산점", "address_full": "(01300) 서울 도봉구 도봉산길 59 아크테릭스 도봉산점", "code": "SA204"},
-    90: {"name": "아크테릭스 봉무점", "address_full": "(41020) 대구 동구 팔공로 340 아크테릭스 봉무점", "code": "SA207"},
-    91: {"name": "아크테릭스 부산점", "address_full": "(48984) 부산 중구 구덕로 39 (남포동4가) 1층 아크테릭스 부산점", "code": "SA208"},
-    92: {"name": "아크테릭스 여주프리미엄빌리지점", "address_full": "(12646) 경기 여주시 명품1로 42-5 아크테릭스 여주프리미엄빌리지점", "code": "SC102"},
-    93: {"name": "아크테릭스 일산점", "address_full": "(10447) 경기 고양시 일산동구 중앙로 1080 116-117호", "code": "SA202"},
-    94: {"name": "아크테릭스 종로점", "address_full": "(03196) 서울 종로구 동호로38길 23 아크테릭스 종로점", "code": "SA201"},
-    95: {"name": "아크테릭스 롯데프리미엄아울렛 의왕점", "address_full": "(16016) 경기 의왕시 바라산로 1 롯데프리미엄아울렛 타임빌라스점 2층", "code": "SB338"},
-    96: {"name": "아크테릭스 롯데프리미엄아울렛 동부산점", "address_full": "(46084) 부산 기장군 기장읍 기장해안로 147 롯데몰동부산점 2층 아크테릭스", "code": "SB331"},
-    97: {"name": "아크테릭스 롯데프리미엄아울렛 이천점", "address_full": "(17384) 경기 이천시 호법면 프리미엄아울렛로 177-74 롯데프리미엄아울렛 청자동 1층 아크테릭스", "code": "SB316"},
-    98: {"name": "아크테릭스 신세계사이먼 프리미엄 아울렛 파주점", "address_full": "(10862) 경기 파주시 탄현면 필승로 200 파주프리미엄아울렛 1층 109호", "code": "SB326"},
-    99: {"name": "아크테릭스 신세계사이먼 프리미엄 아울렛 제주점", "address_full": "(63522) 제주특별자치도 서귀포시 안덕면 서광리 24 제주신화월드 B1층 235호 아크테릭스", "code": "SB337"},
-    103: {"name": "아크테릭스 현대프리미엄아울렛 김포점", "address_full": "(10135) 경기 김포시 고촌읍 전호리 654 현대프리미엄아울렛 3층 아크테릭스", "code": "SB329"},
-    104: {"name": "아크테릭스 현대프리미엄아울렛 송도점", "address_full": "(21984) 인천 연수구 송도국제대로 123 B1 층 아크테릭스", "code": "SB313"},
-    105: {"name": "아크테릭스 현대프리미엄아울렛 대전점", "address_full": "(34030) 대전 유성구 용산동 579 아크테릭스 현대프리미엄아울렛 대전점", "code": "SB318"},
-    106: {"name": "아크테릭스 신세계사이먼 프리미엄 아울렛 시흥점", "address_full": "(15010) 경기 시흥시 정왕동 1773-1 시흥프리미엄아울렛 3층 스포츠 필드관", "code": "SB330"},
-    107: {"name": "아크테릭스 현대프리미엄아울렛 SPACE 1", "address_full": "(12248) 경기 남양주시 다산동 6141 현대프리미엄아울렛 SPACE1 더 기어샵", "code": "SB350"},
-    108: {"name": "아크테릭스 신세계사이먼 프리미엄 아울렛 부산점", "address_full": "(46029) 부산 기장군 장안읍 좌천리 545 부산프리미엄아울렛 Phase2.0 SOUTH 2층 더 기어샵", "code": "SB403"},
-    109: {"name": "아크테릭스 롯데프리미엄아울렛 파주점", "address_full": "(10881) 경기 파주시 문발동 640 롯데프리미엄아울렛 패션빅 2층 아크테릭스", "code": "SB307"},
-    110: {"name": "아크테릭스 플래그십 스토어 롯데월드몰", "address_full": "(05551) 서울 송파구 신천동 29 롯데월드타워앤드롯데월드몰 지하1층", "code": "SB347"},
-    111: {"name": "아크테릭스 스타필드 코엑스몰점", "address_full": "(06164) 서울 강남구 삼성동 159 스타필드 코엑스몰 B1 , C110호 아크테릭스", "code": "SB336"},
-    112: {"name": "아크테릭스 롯데백화점 동탄점", "address_full": "(18478) 경기 화성시 동탄역로 160 롯데백화점 5층 아크테릭스", "code": "SB334"},
-    113: {"name": "아크테릭스 대구신세계", "address_full": "(41229) 대구 동구 동부로 149 신세계백화점 대구점 6층 아크테릭스", "code": "SB327"},
-    114: {"name": "아크테릭스 롯데백화점 대전점", "address_full": "(35299) 대전 서구 계룡로 598 롯데백화점 6층 아크테릭스", "code": "SB325"},
-    115: {"name": "아크테릭스 롯데백화점 노원점", "address_full": "(01695) 서울 노원구 동일로 1414 롯데백화점 6층 아크테릭스", "code": "SB324"},
-    116: {"name": "아크테릭스 현대백화점 판교점", "address_full": "(13529) 경기 성남시 분당구 판교역로146번길 20 현대백화점 7층 아크테릭스", "code": "SB323"},
-    117: {"name": "아크테릭스 광주신세계", "address_full": "(61937) 광주 서구 무진대로 932 신세계백화점 본관 7층 아크테릭스", "code": "SB319"},
-    118: {"name": "아크테릭스 롯데백화점 수원점", "address_full": "(16621) 경기 수원시 권선구 세화로 134 롯데백화점 5층 아크테릭스", "code": "SB317"},
-    119: {"name": "아크테릭스 롯데백화점 광복점", "address_full": "(48944) 부산 중구 중앙대로 2 롯데백화점 7층 아크테릭스", "code": "SB314"},
-    120: {"name": "아크테릭스 신세계백화점 센텀시티", "address_full": "(48058) 부산 해운대구 센텀4로 15 신세계 센텀시티 몰 1층 아크테릭스", "code": "SB310"},
-    121: {"name": "아크테릭스 롯데백화점 울산점", "address_full": "(44719) 울산 남구 삼산로 288 롯데백화점 5층 아크테릭스", "code": "SB309"},
-    122: {"name": "아크테릭스 신세계백화점 본점", "address_full": "(04530) 서울 중구 소공로 63 신세계백화점 5층 아크테릭스", "code": "SB305"},
-    123: {"name": "아크테릭스 신세계백화점 강남점", "address_full": "(06546) 서울 서초구 신반포로 176 신세계백화점 강남점 신관 8층 아크테릭스", "code": "SB304"},
-    124: {"name": "아크테릭스 롯데백화점 부산본점", "address_full": "(47285) 부산 부산진구 가야대로 772 롯데백화점 5층 아크테릭스", "code": "SB303"},
-    125: {"name": "아크테릭스 롯데백화점 전주점", "address_full": "(54946) 전북특별자치도 전주시 완산구 서신동 971 롯데백화점 4층 아크테릭스", "code": "SB306"},
-    126: {"name": "아크테릭스 더현대 서울", "address_full": "(07335) 서울 영등포구 여의도동 22 더 현대 서울 4층 아크테릭스", "code": "SB333"},
-    127: {"name": "아크테릭스 롯데백화점 영등포점", "address_full": "(07306) 서울 영등포구 영등포동 618-496 롯데백화점 영등포점 아크테릭스", "code": "SB315"},
-    128: {"name": "아크테릭스 현대백화점 목동점", "address_full": "(07998) 서울 양천구 목동동로 257 현대백화점 유플렉스 지하3층 아크테릭스", "code": "SB332"},
-    129: {"name": "아크테릭스 대전신세계 Art&Science", "address_full": "(34126) 대전 유성구 엑스포로 1 CMB 엑스포아트홀 4층 아크테릭스", "code": "SB339"},
-    130: {"name": "아크테릭스 롯데백화점 잠실점", "address_full": "(05554) 서울 송파구 올림픽로 240 롯데백화점 6층 아크테릭스", "code": "SB302"},
-    131: {"name": "아크테릭스 신세계 사우스시티", "address_full": "(16896) 경기 용인시 수지구 포은대로 536 신세계백화점 경기점 5층 아크테릭스", "code": "SB342"},
-    132: {"name": "아크테릭스 현대백화점 울산점", "address_full": "(44705) 울산 남구 삼산동 1521-1 현대백화점 9층 아크테릭스", "code": "SB346"},
-    133: {"name": "아크테릭스 현대백화점 충청점", "address_full": "(28424) 충북 청주시 흥덕구 직지대로 308 현대백화점 4층 아크테릭스", "code": "SB345"},
-    134: {"name": "아크테릭스 무등산점", "address_full": "(61493) 광주 동구 운림동 970 1층 아크테릭스", "code": "SC148"},
-    135: {"name": "아크테릭스 덕소삼패점", "address_full": "(12245) 경기 남양주시 삼패동 343-48 아크테릭스 덕소삼패점", "code": "SC134"},
-    136: {"name": "아크테릭스 중구점", "address_full": "(41909) 대구 중구 경상감영길 132 아크테릭스 중구점", "code": "SC110"},
-    137: {"name": "아크테릭스 진주점", "address_full": "(52691) 경남 진주시 동성동 11-2 아크테릭스 진주점", "code": "SC118"},
-    138: {"name": "아크테릭스 안산점", "address_full": "(15499) 경기 안산시 상록구 사동 1531 안산의류상설할인매장", "code": "SC139"},
-    139: {"name": "아크테릭스 롯데백화점 인천점", "address_full": "(22242) 인천 미추홀구 연남로 35 롯데백화점 4층 아크테릭스", "code": "SB335"},
-}
+# 官方API的52家店铺数据统一维护在 store_registry.py
+from store_registry import official_stores
 
 print("=" * 80)
 print("官方API店铺数据统计分析")
@@ -0,0 +1,388 @@
+# basket_optimizer.py
+import heapq
+import time
+from functools import reduce
+from itertools import product as iter_product
+from math import gcd
+
+import numpy as np
+
+from calculation_utils import calculate_detailed_price
+from pricing_engine import price_baskets
+
+# 产品数不超过该值时使用子集动态规划求精确解，否则使用分批剥离 + 局部搜索
+EXACT_ITEM_LIMIT = 10
+
+# 价格网格最大点数（总价 / 价格最大公约数），超过时改用按需计算并缓存
+PRICE_GRID_LIMIT = 2_000_000
+
+# 局部搜索最长时间（秒）
+LOCAL_SEARCH_SECONDS = 0.5
+
+
+class _TransactionPricer:
+    """单笔交易实付金额查询（按价格最大公约数为单位预先批量计算整张价格表）
+
+    variant 为 once_only 优惠的使用位掩码：第 k 位为 1 表示该笔交易使用第 k 个 once_only 优惠。
+    """
+
+    def __init__(self, prices, base_options, once_options):
+        self.base_options = base_options
+        self.once_options = once_options
+        self.unit = reduce(gcd, prices) or 1
+        self.units = [price // self.unit for price in prices]
+        self.max_units = sum(self.units)
+        self.n_variants = 1 << len(once_options)
+        self._cache = {}
+
+        self.grid = None
+        self.grid_arrays = None
+        if (self.max_units + 1) * self.n_variants <= PRICE_GRID_LIMIT:
+            totals = np.arange(self.max_units + 1, dtype=np.float64) * self.unit
+            self.grid_arrays = [
+                price_baskets(totals, self._options_for(variant))['final_payment']
+                for variant in range(self.n_variants)
+            ]
+            # 单点查询用列表（比数组下标快）
+            self.grid = [array.tolist() for array in self.grid_arrays]
+
+    def _options_for(self, variant):
+        extra = [option for k, option in enumerate(self.once_options) if variant >> k & 1]
+        return self.base_options + extra
+
+    def cost(self, total_units, variant=0):
+        """总价（以 unit 计）为 total_units 的一笔交易的最终实付"""
+        if total_units == 0:
+            return 0.0
+        if self.grid is not None:
+            return self.grid[variant][total_units]
+        key = (total_units, variant)
+        value = self._cache.get(key)
+        if value is None:
+            value = float(price_baskets([total_units * self.unit], self._options_for(variant))['final_payment'][0])
+            self._cache[key] = value
+        return value
+
+    def costs(self, total_units):
+        """批量查询多个总价（以 unit 计，均大于0）的最终实付（不使用 once_only 优惠）"""
+        if self.grid_arrays is not None:
+            return self.grid_arrays[0][total_units]
+        return np.array([self.cost(int(total)) for total in total_units])
+
+    def once_gain(self, totals):
+        """
+        once_only 优惠在各笔交易间择优分配（每个最多使用一次）带来的实付变化（≤0）
+
+        Returns:
+            元组: (实付变化, 每笔交易的 variant 列表)
+        """
+        variants = [0] * len(totals)
+        if not self.once_options or not totals:
+            return 0.0, variants
+
+        if len(self.once_options) == 1:
+            # 只有一个 once_only 优惠（常见情况）：用在节省最多的那笔交易上
+            diffs = [self.cost(total, 1) - self.cost(total) for total in totals]
+            t = min(range(len(totals)), key=diffs.__getitem__)
+            if diffs[t] < -1e-9:
+                variants[t] = 1
+                return diffs[t], variants
+            return 0.0, variants
+
+        # 多个 once_only 优惠：枚举每个优惠分配到某一笔交易或不使用（None）
+        base = [self.cost(total) for total in totals]
+        best_gain = 0.0
+        for assignment in iter_product(list(range(len(totals))) + [None], repeat=len(self.once_options)):
+            assigned = {}
+            for k, t in enumerate(assignment):
+                if t is not None:
+                    assigned[t] = assigned.get(t, 0) | 1 << k
+            gain = sum(self.cost(totals[t], variant) - base[t] for t, variant in assigned.items())
+            if gain < best_gain - 1e-9:
+                best_gain = gain
+                variants = [assigned.get(t, 0) for t in range(len(totals))]
+        return best_gain, variants
+
+    def partition_cost(self, totals):
+        """
+        一组交易的最低总实付
+
+        Returns:
+            元组: (总实付, 每笔交易的 variant 列表)
+        """
+        gain, variants = self.once_gain(totals)
+        return sum(self.cost(total) for total in totals) + gain, variants
+
+
+def _exact_partition(pricer):
+    """子集动态规划求精确最优拆单（适用于少量产品）"""
+    n = len(pricer.units)
+    full = (1 << n) - 1
+    n_variants = pricer.n_variants
+
+    sums = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + pricer.units[low.bit_length() - 1]
+    costs = [[pricer.cost(total, variant) for total in sums] for variant in range(n_variants)]
+
+    # dp[used][mask]: 将 mask 中的产品拆单、且恰好使用 used 中 once_only 优惠时的最低实付
+    inf = float("inf")
+    dp = [[inf] * (full + 1) for _ in range(n_variants)]
+    choice = [[None] * (full + 1) for _ in range(n_variants)]
+    dp[0][0] = 0.0
+
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        rest = mask ^ low
+        sub = rest
+        while True:
+            block = sub | low
+            remaining = mask ^ block
+            for used in range(n_variants):
+                # 本笔交易使用 variant（used 的子集），其余交易使用 used - variant
+                variant = used
+                while True:
+                    previous = dp[used ^ variant][remaining]
+                    if previous < inf:
+                        cost = costs[variant][block] + previous
+                        if cost < dp[used][mask] - 1e-9:
+                            dp[used][mask] = cost
+                            choice[used][mask] = (block, variant)
+                    if variant == 0:
+                        break
+                    variant = (variant - 1) & used
+            if sub == 0:
+                break
+            sub = (sub - 1) & rest
+
+    best_used = min(range(n_variants), key=lambda used: dp[used][full])
+    blocks = []
+    mask, used = full, best_used
+    while mask:
+        block, variant = choice[used][mask]
+        blocks.append([i for i in range(n) if block >> i & 1])
+        mask ^= block
+        used ^= variant
+    return blocks
+
+
+def _peel_partition(pricer):
+    """分批剥离：每次用子集和位集DP找出节省率最高的可达总价，剥离对应产品作为一笔交易"""
+    remaining = list(range(len(pricer.units)))
+    blocks = []
+
+    while remaining:
+        max_total = sum(pricer.units[i] for i in remaining)
+        if (len(remaining) + 1) * (max_total + 1) > PRICE_GRID_LIMIT * 4:
+            blocks.append(remaining)
+            break
+
+        # reach[k][s]: 前 k 个剩余产品能否凑出总价 s
+        reach = np.zeros((len(remaining) + 1, max_total + 1), dtype=bool)
+        reach[0, 0] = True
+        for k, i in enumerate(remaining):
+            units = pricer.units[i]
+            reach[k + 1] = reach[k]
+            reach[k + 1, units:] |= reach[k, :max_total + 1 - units]
+
+        totals = np.flatnonzero(reach[-1])
+        totals = totals[totals > 0]
+        if totals.size == 0:
+            blocks.append(remaining)
+            break
+        costs = pricer.costs(totals)
+        rates = (totals * pricer.unit - costs) / (totals * pricer.unit)
+        # 节省率相同时优先选择总价更高的组合
+        best = int(totals[np.lexsort((totals, rates))[-1]])
+
+        # 回溯出凑成该总价的产品
+        block = []
+        target = best
+        for k in range(len(remaining), 0, -1):
+            if not reach[k - 1, target]:
+                i = remaining[k - 1]
+                block.append(i)
+                target -= pricer.units[i]
+        blocks.append(block)
+        remaining = [i for i in remaining if i not in set(block)]
+
+    return blocks
+
+
+def _local_search(pricer, blocks, deadline):
+    """局部搜索：合并两笔交易、移动单个产品、交换两个产品，直到无法改进
+
+    只有变动的交易需要重新查价（once_only 优惠的分配另行计算），单次评估开销与交易数无关。
+    """
+    blocks = [list(block) for block in blocks if block]
+    totals = [sum(pricer.units[i] for i in block) for block in blocks]
+    base = [pricer.cost(total) for total in totals]
+    base_sum = sum(base)
+    best_cost = base_sum + pricer.once_gain(totals)[0]
+
+    # 只有一个 once_only 优惠时，记录各笔交易使用它的实付变化及最小的3个（一次变动最多涉及2笔交易）
+    single_once = len(pricer.once_options) == 1
+    diffs = [pricer.cost(total, 1) - cost for total, cost in zip(totals, base)] if single_once else []
+    smallest = heapq.nsmallest(3, range(len(diffs)), key=diffs.__getitem__)
+
+    def evaluate(changes):
+        """changes: {交易下标: 新总价}（下标为 len(totals) 表示新交易）；返回新的总实付"""
+        new_base_sum = base_sum
+        for t, total in changes.items():
+            new_base_sum += pricer.cost(total) - (base[t] if t < len(base) else 0.0)
+        if not pricer.once_options:
+            return new_base_sum
+        if single_once:
+            gain = min([0.0] + [diffs[t] for t in smallest if t not in changes][:1] +
+                       [pricer.cost(total, 1) - pricer.cost(total) for total in changes.values()])
+            return new_base_sum + gain
+        new_totals = [changes.get(t, total) for t, total in enumerate(totals)]
+        if len(totals) in changes:
+            new_totals.append(changes[len(totals)])
+        return new_base_sum + pricer.once_gain([total for total in new_totals if total > 0])[0]
+
+    def apply(changes):
+        nonlocal base_sum, smallest
+        for t, total in changes.items():
+            base_sum += pricer.cost(total) - base[t]
+            totals[t] = total
+            base[t] = pricer.cost(total)
+            if single_once:
+                diffs[t] = pricer.cost(total, 1) - base[t]
+        for t in sorted((t for t in range(len(totals)) if not blocks[t]), reverse=True):
+            del blocks[t], totals[t], base[t]
+            if single_once:
+                del diffs[t]
+        if single_once:
+            smallest = heapq.nsmallest(3, range(len(diffs)), key=diffs.__getitem__)
+
+    def find_move():
+        # 合并两笔交易
+        for a in range(len(blocks)):
+            for b in range(a + 1, len(blocks)):
+                changes = {a: totals[a] + totals[b], b: 0}
+                cost = evaluate(changes)
+                if cost < best_cost - 1e-6:
+                    blocks[a].extend(blocks[b])
+                    blocks[b] = []
+                    return changes, cost
+
+        # 移动单个产品到其他交易或新交易
+        for a in range(len(blocks)):
+            for i in blocks[a]:
+                units = pricer.units[i]
+                for b in range(len(blocks) + 1):
+                    if b == a or (b == len(blocks) and len(blocks[a]) == 1):
+                        continue
+                    changes = {a: totals[a] - units, b: (totals[b] if b < len(totals) else 0) + units}
+                    cost = evaluate(changes)
+                    if cost < best_cost - 1e-6:
+                        blocks[a].remove(i)
+                        if b == len(blocks):
+                            blocks.append([i])
+                        else:
+                            blocks[b].append(i)
+                        return changes, cost
+
+        # 交换两笔交易中的产品
+        for a in range(len(blocks)):
+            for b in range(a + 1, len(blocks)):
+                for i in blocks[a]:
+                    for j in blocks[b]:
+                        delta = pricer.units[j] - pricer.units[i]
+                        if delta == 0:
+                            continue
+                        changes = {a: totals[a] + delta, b: totals[b] - delta}
+                        cost = evaluate(changes)
+                        if cost < best_cost - 1e-6:
+                            blocks[a].remove(i)
+                            blocks[b].remove(j)
+                            blocks[a].append(j)
+                            blocks[b].append(i)
+                            return changes, cost
+        return None
+
+    while time.monotonic() < deadline:
+        move = find_move()
+        if move is None:
+            break
+        changes, best_cost = move
+        if len(totals) in changes:
+            # 新交易的产品已经追加到 blocks 末尾
+            totals.append(0)
+            base.append(0.0)
+            if single_once:
+                diffs.append(0.0)
+        apply(changes)
+
+    return blocks
+
+
+def optimize_basket(products, selected_discounts, price_key="price_krw"):
+    """
+    计算最优拆单方案（将产品拆分为多笔交易，使总实付最低）
+
+    每笔交易单独计算税前优惠、退税和税后赠券；标记 once_only 的优惠只能用于其中一笔交易。
+    产品数不超过 EXACT_ITEM_LIMIT 时为精确解，否则为启发式解（分批剥离 + 局部搜索）。
+
+    Args:
+        products: 产品列表（需包含价格字段）
+        selected_discounts: 选中的优惠选项
+        price_key: 价格字段名
+
+    Returns:
+        字典: {
+            "transactions": [{"products", "total_krw", "once_only", "result"}],
+            "final_payment": 拆单后总实付,
+            "single_payment": 不拆单（一笔交易）的实付,
+            "savings": 节省金额,
+            "exact": 是否为精确解
+        }
+    """
+    if not products:
+        return {"transactions": [], "final_payment": 0, "single_payment": 0, "savings": 0, "exact": True}
+
+    prices = [int(round(float(product[price_key]))) for product in products]
+    base_options = [option for option in selected_discounts if not option.get('once_only')]
+    once_options = [option for option in selected_discounts if option.get('once_only')]
+    pricer = _TransactionPricer(prices, base_options, once_options)
+
+    exact = len(products) <= EXACT_ITEM_LIMIT
+    if exact:
+        blocks = _exact_partition(pricer)
+    else:
+        deadline = time.monotonic() + LOCAL_SEARCH_SECONDS
+        candidates = [
+            _local_search(pricer, _peel_partition(pricer), deadline),
+            _local_search(pricer, [list(range(len(products)))], deadline)
+        ]
+        blocks = min(
+            candidates,
+            key=lambda bs: pricer.partition_cost([sum(pricer.units[i] for i in b) for b in bs])[0]
+        )
+
+    totals = [sum(pricer.units[i] for i in block) for block in blocks]
+    _, variants = pricer.partition_cost(totals)
+
+    transactions = []
+    for block, total_units, variant in zip(blocks, totals, variants):
+        total_krw = total_units * pricer.unit
+        once_used = [option for k, option in enumerate(once_options) if variant >> k & 1]
+        transactions.append({
+            "products": [products[i] for i in block],
+            "total_krw": total_krw,
+            "once_only": [option['name'] for option in once_used],
+            "result": calculate_detailed_price(total_krw, base_options + once_used)
+        })
+    transactions.sort(key=lambda transaction: transaction["total_krw"], reverse=True)
+
+    final_payment = sum(transaction["result"]["final_payment"] for transaction in transactions)
+    single_payment = calculate_detailed_price(sum(prices), selected_discounts)["final_payment"]
+    return {
+        "transactions": transactions,
+        "final_payment": final_payment,
+        "single_payment": single_payment,
+        "savings": single_payment - final_payment,
+        "exact": exact
+    }
@@ -1,20 +1,125 @@
 import streamlit as st
 import requests
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import sys
 
+# 每个会话产品缓存的内存上限（字节），超出后淘汰最久未使用的条目
+PRODUCT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+def deep_sizeof(obj):
+    """递归计算对象占用的字节数（包含容器内的字符串等内容，同一对象只计算一次）"""
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__") and not isinstance(item, type):
+            stack.append(vars(item))
+    return total
+
 
 class ProductCache:
-    def __init__(self, ttl_minutes=30):
+    """会话级产品缓存（LRU，按 TTL 过期，并限制总字节数）
+
+    条目保存在 st.session_state 中的有序字典里，大小按 deep_sizeof 递归计算；
+    总大小超过上限时淘汰最久未使用的条目。命中、未命中、淘汰次数供缓存管理页显示。
+    """
+
+    def __init__(self, ttl_minutes=30, max_bytes=PRODUCT_CACHE_MAX_BYTES):
         self.ttl_minutes = ttl_minutes
+        self.max_bytes = max_bytes
+
+    def _entries(self):
+        """当前会话的缓存条目：缓存键 -> {data, product_id, timestamp, size}"""
+        entries = st.session_state.get("product_cache_entries")
+        if not isinstance(entries, OrderedDict):
+            entries = OrderedDict()
+            st.session_state.product_cache_entries = entries
+        return entries
+
+    def _counters(self):
+        """当前会话的缓存计数"""
+        counters = st.session_state.get("product_cache_counters")
+        if not isinstance(counters, dict):
+            counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "total_size": 0}
+            st.session_state.product_cache_counters = counters
+        return counters
+
+    def _remove(self, cache_key):
+        entry = self._entries().pop(cache_key, None)
+        if entry is not None:
+            self._counters()["total_size"] -= entry["size"]
+        return entry
+
+    def is_expired(self, entry):
+        """检查条目是否已过期"""
+        elapsed = datetime.now() - entry["timestamp"]
+        return elapsed.total_seconds() > (self.ttl_minutes * 60)
+
+    def get(self, cache_key):
+        """获取缓存数据（未缓存或已过期时返回 None）"""
+        entries = self._entries()
+        counters = self._counters()
+        entry = entries.get(cache_key)
+        if entry is not None and self.is_expired(entry):
+            self._remove(cache_key)
+            counters["expired"] += 1
+            entry = None
+
+        if entry is None:
+            counters["misses"] += 1
+            return None
+
+        entries.move_to_end(cache_key)
+        counters["hits"] += 1
+        return entry["data"]
+
+    def put(self, cache_key, data, product_id=None):
+        """写入缓存（超过字节上限时淘汰最久未使用的条目），返回条目大小（字节）"""
+        entries = self._entries()
+        counters = self._counters()
+        self._remove(cache_key)
+
+        size = deep_sizeof(data)
+        if size > self.max_bytes:
+            # 单个条目超过上限时不缓存
+            print(f"缓存条目过大，不缓存: {cache_key} ({size} 字节)")
+            return size
+
+        entries[cache_key] = {
+            "data": data,
+            "product_id": product_id,
+            "timestamp": datetime.now(),
+            "size": size
+        }
+        counters["total_size"] += size
+
+        while counters["total_size"] > self.max_bytes:
+            oldest_key = next(iter(entries))
+            self._remove(oldest_key)
+            counters["evictions"] += 1
+        return size
 
     def fetch_and_cache_product_info(self, product_id, detail_url):
         """获取并缓存产品信息（不依赖具体解析函数）"""
         cache_key = f"product_{product_id}"
 
         # 检查缓存
-        if not self.should_refresh_cache(cache_key):
-            return st.session_state[cache_key]['data']
+        cache_data = self.get(cache_key)
+        if cache_data is not None:
+            return cache_data
 
         # 获取HTML内容（不依赖product_detail的函数）
         html_content = self.fetch_html_from_url(detail_url)
@@ -29,7 +134,7 @@ class ProductCache:
             'product_id': product_id
         }
 
-        st.session_state[cache_key] = cache_data
+        self.put(cache_key, cache_data, product_id=product_id)
         return cache_data
 
     def fetch_html_from_url(self, url):
@@ -49,69 +154,60 @@ class ProductCache:
 
     def should_refresh_cache(self, cache_key):
         """检查是否需要刷新缓存"""
-        if cache_key not in st.session_state:
-            return True
-        
-        cache_data = st.session_state[cache_key]
-        if 'timestamp' not in cache_data:
-            return True
-        
-        elapsed = datetime.now() - cache_data['timestamp']
-        return elapsed.total_seconds() > (self.ttl_minutes * 60)
+        entry = self._entries().get(cache_key)
+        return entry is None or self.is_expired(entry)
 
     def get_all_cache_items(self):
-        """获取所有缓存项"""
+        """获取所有缓存项（按最近使用时间升序）"""
         cache_items = []
-        for key in st.session_state:
-            if key.startswith('product_'):
-                cache_data = st.session_state[key]
-                if isinstance(cache_data, dict) and 'timestamp' in cache_data:
-                    cache_items.append({
-                        'key': key,
-                        'product_id': cache_data.get('product_id', '未知'),
-                        'timestamp': cache_data.get('timestamp', '未知'),
-                        'size': self._get_object_size(cache_data)
-                    })
+        for key, entry in self._entries().items():
+            cache_items.append({
+                'key': key,
+                'product_id': entry.get('product_id') or '未知',
+                'timestamp': entry['timestamp'],
+                'size': entry['size']
+            })
         return cache_items
 
     def _get_object_size(self, obj):
-        """获取对象大小（字节）"""
-        return sys.getsizeof(obj)
+        """获取对象大小（字节，递归计算）"""
+        return deep_sizeof(obj)
 
     def get_total_cache_size(self):
         """获取总缓存大小（字节）"""
-        total_size = 0
-        for key in st.session_state:
-            if key.startswith('product_'):
-                total_size += sys.getsizeof(st.session_state[key])
-        return total_size
+        return self._counters()["total_size"]
 
     def clear_specific_cache(self, cache_key):
         """清除特定的缓存项"""
-        if cache_key in st.session_state:
-            del st.session_state[cache_key]
-            return True
-        return False
+        return self._remove(cache_key) is not None
 
     def clear_all_cache(self):
         """清除所有缓存"""
-        keys_to_delete = [key for key in st.session_state if key.startswith('product_')]
-        for key in keys_to_delete:
-            del st.session_state[key]
-        return len(keys_to_delete)
+        entries = self._entries()
+        removed_count = len(entries)
+        entries.clear()
+        self._counters()["total_size"] = 0
+        return removed_count
 
     def get_cache_statistics(self):
         """获取缓存统计信息"""
         cache_items = self.get_all_cache_items()
-        total_size = self.get_total_cache_size()
-        
+        counters = self._counters()
+        lookups = counters["hits"] + counters["misses"]
+
         return {
             'count': len(cache_items),
-            'total_size': total_size,
+            'total_size': counters["total_size"],
+            'max_bytes': self.max_bytes,
             'items': cache_items,
-            'ttl_minutes': self.ttl_minutes
+            'ttl_minutes': self.ttl_minutes,
+            'hits': counters["hits"],
+            'misses': counters["misses"],
+            'evictions': counters["evictions"],
+            'expired': counters["expired"],
+            'hit_rate': round(counters["hits"] / lookups * 100, 1) if lookups else 0
         }
 
 
 # 创建全局缓存实例
-product_cache = ProductCache(ttl_minutes=30)  # 30分钟缓存时间
\ No newline at end of file
+product_cache = ProductCache(ttl_minutes=30)  # 30分钟缓存时间
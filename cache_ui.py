@@ -1,5 +1,7 @@
 import streamlit as st
 from cache_manager import product_cache
+from catalog_store import catalog_store
+from image_cache import image_cache
 from datetime import datetime
 
 
@@ -41,6 +43,7 @@ def show_cache_management_tab():
     
     with col2:
         st.metric("总缓存大小", format_size(stats['total_size']))
+        st.caption(f"上限 {format_size(stats['max_bytes'])}，超出后淘汰最久未使用的条目")
     
     with col3:
         st.metric("缓存时效", f"{stats['ttl_minutes']} 分钟")
@@ -48,6 +51,21 @@ def show_cache_management_tab():
     with col4:
         expired_count = count_expired_items(stats['items'])
         st.metric("过期项数", expired_count, "项")
+
+    # 命中统计（本会话）
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric("命中率", f"{stats['hit_rate']}%")
+
+    with col2:
+        st.metric("命中 / 未命中", f"{stats['hits']} / {stats['misses']}")
+
+    with col3:
+        st.metric("容量淘汰", stats['evictions'], "次")
+
+    with col4:
+        st.metric("过期清除", stats['expired'], "次")
     
     st.divider()
     
@@ -97,6 +115,39 @@ def show_cache_management_tab():
         if st.button("🔄 刷新统计", use_container_width=True):
             st.rerun()
 
+    st.divider()
+
+    # 本地产品目录（SQLite，重启后保留）
+    st.write("**本地产品目录：**")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.metric("目录产品数", catalog_store.count(), "个")
+        st.caption(f"有效期 {catalog_store.ttl_hours} 小时，过期后重新获取产品页")
+
+    with col2:
+        if st.button("🗑️ 清空产品目录", use_container_width=True):
+            removed_count = catalog_store.clear()
+            st.success(f"✅ 已清空产品目录（{removed_count} 个产品）")
+            st.rerun()
+
+    st.divider()
+
+    # 产品图片和颜色色块（本地磁盘，所有会话共享）
+    st.write("**图片缓存：**")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        image_count, image_size = image_cache.disk_usage()
+        st.metric("缓存图片文件", image_count, "个")
+        st.caption(f"占用 {format_size(image_size)} / 上限 {format_size(image_cache.max_bytes)}，超出后淘汰最久未使用的图片")
+
+    with col2:
+        if st.button("🗑️ 清空图片缓存", use_container_width=True):
+            removed_count = image_cache.clear()
+            st.success(f"✅ 已清空图片缓存（{removed_count} 个文件）")
+            st.rerun()
+
 
 def is_cache_expired(timestamp, ttl_minutes):
     """检查缓存是否已过期"""
@@ -0,0 +1,136 @@
+# catalog_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 数据库结构版本：结构变化时递增，旧数据会被自动清空重建
+SCHEMA_VERSION = 1
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+CATALOG_DB_PATH = os.path.join(CACHE_DIR, "catalog.sqlite3")
+
+# 产品目录有效期（小时），超过后重新获取产品页
+CATALOG_TTL_HOURS = 12
+
+
+class CatalogStore:
+    """本地 SQLite 产品目录（持久化解析后的产品详情、变体和SKU映射，重启后仍可使用）"""
+
+    def __init__(self, db_path=CATALOG_DB_PATH, ttl_hours=CATALOG_TTL_HOURS):
+        self.db_path = db_path
+        self.ttl_hours = ttl_hours
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _ensure_schema(self):
+        """初始化数据库结构（版本不一致时重建）"""
+        if self._ready:
+            return
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS products")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS products (
+                    product_id TEXT PRIMARY KEY,
+                    detail_url TEXT NOT NULL,
+                    details TEXT,
+                    colors TEXT NOT NULL,
+                    sizes TEXT NOT NULL,
+                    skus TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._ready = True
+
+    def is_fresh(self, fetched_at):
+        """检查数据是否在有效期内"""
+        return fetched_at is not None and time.time() - fetched_at <= self.ttl_hours * 3600
+
+    def get(self, product_id):
+        """
+        读取产品的变体索引
+
+        Returns:
+            元组: (变体索引 或 None, 获取时间戳 或 None)
+        """
+        try:
+            with self._lock:
+                self._ensure_schema()
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT details, colors, sizes, skus, fetched_at FROM products WHERE product_id = ?",
+                        (str(product_id),)
+                    ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            print(f"产品目录读取失败: {e}")
+            return None, None
+
+        if not row:
+            return None, None
+
+        details, colors, sizes, skus, fetched_at = row
+        index = {
+            "details": json.loads(details) if details else None,
+            "colors": json.loads(colors),
+            "sizes": json.loads(sizes),
+            "skus": json.loads(skus)
+        }
+        return index, fetched_at
+
+    def put(self, product_id, detail_url, index):
+        """写入产品的变体索引"""
+        try:
+            with self._lock:
+                self._ensure_schema()
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO products "
+                        "(product_id, detail_url, details, colors, sizes, skus, fetched_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            str(product_id),
+                            detail_url,
+                            json.dumps(index["details"], ensure_ascii=False) if index["details"] else None,
+                            json.dumps(index["colors"], ensure_ascii=False),
+                            json.dumps(index["sizes"], ensure_ascii=False),
+                            json.dumps(index["skus"], ensure_ascii=False),
+                            time.time()
+                        )
+                    )
+        except (sqlite3.Error, OSError) as e:
+            print(f"产品目录写入失败: {e}")
+
+    def count(self):
+        """获取目录中的产品数量"""
+        try:
+            with self._lock:
+                self._ensure_schema()
+                with self._connect() as conn:
+                    return conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        except (sqlite3.Error, OSError) as e:
+            print(f"产品目录读取失败: {e}")
+            return 0
+
+    def clear(self):
+        """清空产品目录"""
+        try:
+            with self._lock:
+                self._ensure_schema()
+                with self._connect() as conn:
+                    return conn.execute("DELETE FROM products").rowcount
+        except (sqlite3.Error, OSError) as e:
+            print(f"产品目录清空失败: {e}")
+            return 0
+
+
+# 创建全局产品目录实例
+catalog_store = CatalogStore()
@@ -1,46 +1,162 @@
 import requests
-import json
-from datetime import datetime, timedelta
-import streamlit as st
+import threading
+import time
+from datetime import datetime
 
+from rate_history import rate_history
 
-def get_exchange_rate():
+EXCHANGE_RATE_URL = "https://marketing.unionpayintl.com/h5Rate/rate/getRateInfoByCountryCode?insCode=101710156&channelCode=&countryCode=410&language=zh&currCode=410"
+
+# 汇率刷新间隔（秒）：超过该时间后在后台刷新，刷新期间继续使用旧汇率
+EXCHANGE_RATE_REFRESH_SECONDS = 300
+
+# 首次获取汇率时最长等待时间（秒）
+EXCHANGE_RATE_TIMEOUT_SECONDS = 10
+
+
+def fetch_exchange_rate(timeout=EXCHANGE_RATE_TIMEOUT_SECONDS):
     """
-    获取韩元兑人民币汇率（银联优惠汇率接口）
-    返回格式：10000 KRW = XX.XX CNY
-    每次都从API获取最新数据，不使用缓存
+    从银联优惠汇率接口获取韩元兑人民币汇率
+
+    Returns:
+        10000韩元兑换的人民币金额（float），获取失败返回 None
     """
     try:
-        url = "https://marketing.unionpayintl.com/h5Rate/rate/getRateInfoByCountryCode?insCode=101710156&channelCode=&countryCode=410&language=zh&currCode=410"
-        response = requests.get(url, timeout=10)
+        response = requests.get(EXCHANGE_RATE_URL, timeout=timeout)
         response.raise_for_status()
-        
+
         data = response.json()
-        
+
         # 提取汇率数据
         if data.get('responseCode') == '00' and data.get('data'):
             rate_data = data['data'][0]
             conv_rate_notice = rate_data.get('convRateNotice', [])
-            
+
             if conv_rate_notice:
-                # 获取一级优享汇率（第一个）
-                discount_rate_str = conv_rate_notice[0].get('discountConvRate', '0')
-                discount_rate = float(discount_rate_str)
-                
-                # 乘以10000得到最终汇率
-                final_rate = discount_rate * 10000
-                final_rate = round(final_rate, 2)
-                
-                # 格式化日期和时间
-                current_time = datetime.now()
-                display_time = current_time.strftime("%Y年%m月%d日 %H:%M")
-                
-                result = f"{display_time}，10000韩元={final_rate}人民币"
-                
-                return result
-        
-        return ""
-    
+                # 获取一级优享汇率（第一个），乘以10000得到最终汇率
+                discount_rate = float(conv_rate_notice[0].get('discountConvRate', '0'))
+                final_rate = round(discount_rate * 10000, 2)
+                if final_rate > 0:
+                    return final_rate
+
+        print("汇率获取失败: 接口未返回有效汇率")
+        return None
+
     except Exception as e:
         print(f"汇率获取失败: {e}")
-        return ""
\ No newline at end of file
+        return None
+
+
+class ExchangeRateService:
+    """进程级汇率服务（所有会话共享）
+
+    内存中保存最近一次成功获取的汇率（10000韩元兑人民币）和获取时间；
+    过期后在后台线程刷新，刷新失败时继续使用上一次的有效汇率。每次成功获取的汇率都记录到汇率历史。
+    换算时只读取内存中的数值，不解析字符串、不访问网络。
+    """
+
+    def __init__(self, refresh_seconds=EXCHANGE_RATE_REFRESH_SECONDS, fetcher=fetch_exchange_rate,
+                 history=rate_history):
+        self.refresh_seconds = refresh_seconds
+        self._fetcher = fetcher
+        self._history = history
+        self._snapshot = (None, None)  # (汇率, 获取时间戳)，整体替换，读取无需加锁
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.last_error_at = None
+
+    def refresh(self):
+        """同步获取一次汇率（失败时保留原汇率）"""
+        rate = self._fetcher()
+        if rate:
+            fetched_at = time.time()
+            self._snapshot = (rate, fetched_at)
+            self.last_error_at = None
+            # 记录到本地汇率历史
+            if self._history is not None:
+                self._history.record(rate, fetched_at)
+        else:
+            self.last_error_at = time.time()
+        return rate
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="exchange-rate-refresh", daemon=True).start()
+
+    def _is_stale(self, fetched_at):
+        # 上次刷新失败后同样等待一个刷新间隔再重试，避免接口故障时频繁请求
+        last_attempt = max(fetched_at or 0, self.last_error_at or 0)
+        return time.time() - last_attempt >= self.refresh_seconds
+
+    def get_rate(self, wait=False):
+        """
+        获取当前汇率（10000韩元兑人民币）
+
+        Args:
+            wait: 尚无任何汇率时是否同步等待首次获取（页面顶部显示汇率时使用）
+
+        Returns:
+            汇率（float），从未成功获取时返回 None
+        """
+        rate, fetched_at = self._snapshot
+        if rate is None and wait and self._is_stale(fetched_at):
+            with self._lock:
+                first_load = not self._refreshing and self._snapshot[0] is None
+                if first_load:
+                    self._refreshing = True
+            if first_load:
+                try:
+                    if not self.refresh() and self._history is not None:
+                        # 首次获取失败时使用汇率历史中最近一次的汇率（按原获取时间显示）
+                        latest = self._history.latest()
+                        if latest:
+                            self._snapshot = latest
+                finally:
+                    with self._lock:
+                        self._refreshing = False
+            rate, fetched_at = self._snapshot
+        elif self._is_stale(fetched_at):
+            self._refresh_in_background()
+        return rate
+
+    @property
+    def fetched_at(self):
+        return self._snapshot[1]
+
+    def krw_to_cny(self, krw_amount):
+        """韩元换算人民币（取整），没有可用汇率时返回0"""
+        rate = self.get_rate()
+        if not rate:
+            return 0
+        return int(krw_amount / 10000 * rate)
+
+    def display_text(self, wait=True):
+        """汇率显示文本，如"2025年01月01日 12:00，10000韩元=50.34人民币"，没有可用汇率时返回空字符串"""
+        rate = self.get_rate(wait=wait)
+        if not rate:
+            return ""
+        display_time = datetime.fromtimestamp(self.fetched_at).strftime("%Y年%m月%d日 %H:%M")
+        return f"{display_time}，10000韩元={rate}人民币"
+
+
+# 创建全局汇率服务实例
+exchange_rate_service = ExchangeRateService()
+
+
+def get_exchange_rate():
+    """
+    获取韩元兑人民币汇率（银联优惠汇率接口）
+    返回格式：XXXX年XX月XX日 XX:XX，10000韩元=XX.XX人民币（不可用时返回空字符串）
+    """
+    return exchange_rate_service.display_text()
@@ -0,0 +1,140 @@
+# export_utils.py
+import csv
+import io
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+
+from inventory_matrix import as_inventory_matrix
+
+# 导出格式: 格式键 -> (显示名称, 文件扩展名, MIME类型)
+EXPORT_FORMATS = {
+    "xlsx": ("Excel", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV", "csv", "text/csv"),
+    "parquet": ("Parquet", "parquet", "application/octet-stream"),
+}
+
+# 导出结果缓存的最大条目数（LRU）
+EXPORT_CACHE_MAX_ENTRIES = 6
+
+
+def parquet_available():
+    """检查是否安装了 pyarrow（Parquet 导出为可选功能）"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def available_formats():
+    """当前环境可用的导出格式"""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or parquet_available()]
+
+
+def _export_layout(matrix, store_names):
+    """导出的行（店铺下标）和列（选中店铺中出现过的产品下标）"""
+    rows = np.array([matrix.store_index[name] for name in store_names if name in matrix.store_index], dtype=np.intp)
+    if len(rows):
+        columns = np.flatnonzero(matrix.present[rows].any(axis=0))
+    else:
+        columns = np.array([], dtype=np.intp)
+    return rows, columns
+
+
+def _iter_rows(matrix, rows, columns):
+    """逐行生成 [店铺, 库存...]（接口未返回的单元格为 None）"""
+    for i in rows:
+        stock = matrix.stock[i, columns].tolist()
+        present = matrix.present[i, columns].tolist()
+        yield [matrix.stores[i]] + [value if has else None for value, has in zip(stock, present)]
+
+
+def _export_xlsx(matrix, rows, columns):
+    """流式写入 xlsx（openpyxl write_only 模式，逐行写出，不在内存中保留整个工作表）"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("库存数据")
+    sheet.append(["店铺"] + [matrix.products[j] for j in columns])
+    for row in _iter_rows(matrix, rows, columns):
+        sheet.append(row)
+
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def _export_csv(matrix, rows, columns):
+    """导出 CSV（带 BOM，Excel 打开中文不乱码）"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["店铺"] + [matrix.products[j] for j in columns])
+    writer.writerows(_iter_rows(matrix, rows, columns))
+    return output.getvalue().encode("utf-8-sig")
+
+
+def _export_parquet(matrix, rows, columns):
+    """导出 Parquet（直接由库存数组构建列，未安装 pyarrow 时返回 None）"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("未安装 pyarrow，无法导出 Parquet")
+        return None
+
+    arrays = [pa.array([matrix.stores[i] for i in rows], type=pa.string())]
+    names = ["店铺"]
+    for j in columns:
+        arrays.append(pa.array(matrix.stock[rows, j], type=pa.int32(), mask=~matrix.present[rows, j]))
+        names.append(matrix.products[j])
+
+    output = io.BytesIO()
+    pq.write_table(pa.Table.from_arrays(arrays, names=names), output)
+    return output.getvalue()
+
+
+_EXPORTERS = {
+    "xlsx": _export_xlsx,
+    "csv": _export_csv,
+    "parquet": _export_parquet,
+}
+
+
+def export_inventory(inventory_matrix, store_names, fmt="xlsx"):
+    """
+    导出库存矩阵中指定店铺的数据
+
+    Args:
+        inventory_matrix: 库存矩阵
+        store_names: 导出的店铺名称（按导出顺序，如筛选排序后的店铺）
+        fmt: 导出格式（xlsx / csv / parquet）
+
+    Returns:
+        文件字节内容（格式不可用时返回 None）
+    """
+    matrix = as_inventory_matrix(inventory_matrix)
+    rows, columns = _export_layout(matrix, store_names)
+    return _EXPORTERS[fmt](matrix, rows, columns)
+
+
+def get_cached_export(inventory_matrix, filter_key, store_names, fmt="xlsx"):
+    """获取导出文件（按矩阵版本、筛选条件和格式缓存在会话状态的LRU中）"""
+    matrix = as_inventory_matrix(inventory_matrix)
+    cache_key = (matrix.version, filter_key, fmt)
+
+    export_cache = st.session_state.get("export_cache")
+    if export_cache is None:
+        export_cache = OrderedDict()
+        st.session_state.export_cache = export_cache
+
+    if cache_key in export_cache:
+        export_cache.move_to_end(cache_key)
+        return export_cache[cache_key]
+
+    data = export_inventory(matrix, store_names, fmt)
+    export_cache[cache_key] = data
+    while len(export_cache) > EXPORT_CACHE_MAX_ENTRIES:
+        export_cache.popitem(last=False)
+    return data
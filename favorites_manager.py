@@ -1,31 +1,123 @@
 # favorites_manager.py
 import json
 import os
+import threading
+import time
 from datetime import datetime
-from utils import is_duplicate
+from utils import favorite_key
 from supabase_client import supabase_manager  # 修改：替换MongoDB导入
 
+# 收藏缓存最长保留时间（秒），超过后重新从 Supabase 加载（兼顾其他实例的写入）
+FAVORITES_MAX_AGE_SECONDS = 300
 
-def load_favorites():
-    """从 Supabase 加载所有收藏产品"""
-    try:
+
+class FavoritesRepository:
+    """进程级收藏仓库（内存缓存 + 写穿透到 Supabase）
+
+    - 按 (标准化型号, 颜色, 尺码) 建立哈希集合，重复检测为 O(1)
+    - 按 id 建立索引，删除只需一次网络请求
+    """
+
+    def __init__(self, max_age_seconds=FAVORITES_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._items = None
+        self._keys = set()
+        self._by_id = {}
+        self._loaded_at = 0.0
+
+    def _reindex(self):
+        """重建去重集合和 id 索引（需持有锁）"""
+        self._keys = {favorite_key(item) for item in self._items}
+        self._by_id = {item['id']: item for item in self._items}
+
+    def _ensure_loaded(self):
+        """缓存为空或过期时从 Supabase 加载（需持有锁）"""
+        if self._items is not None and time.time() - self._loaded_at <= self.max_age_seconds:
+            return
+
+        try:
+            client = supabase_manager.get_client()
+            response = client.table('favorites').select('*').order('added_time', desc=True).execute()
+            self._items = response.data if response.data else []
+            self._loaded_at = time.time()
+        except Exception as e:
+            print(f"❌❌ 从Supabase加载收藏失败: {e}")
+            # 加载失败时保留已有数据，下次访问再重试
+            if self._items is None:
+                return
+            self._loaded_at = 0.0
+        self._reindex()
+
+    def all(self):
+        """获取全部收藏（按添加时间倒序）"""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._items or [])
+
+    def get(self, favorite_id):
+        """按 id 获取收藏"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._by_id.get(favorite_id)
+
+    def contains(self, product_info):
+        """检查产品是否已收藏"""
+        with self._lock:
+            self._ensure_loaded()
+            return favorite_key(product_info) in self._keys
+
+    def add(self, product_data):
+        """写入收藏，返回插入后的记录（失败返回 None）"""
+        client = supabase_manager.get_client()
+        response = client.table('favorites').insert(product_data).execute()
+        if not response.data:
+            return None
+
+        record = response.data[0]
+        with self._lock:
+            if self._items is not None:
+                self._items.insert(0, record)
+                self._keys.add(favorite_key(record))
+                self._by_id[record['id']] = record
+        return record
+
+    def remove(self, favorite_id):
+        """按 id 删除收藏，返回是否删除成功"""
         client = supabase_manager.get_client()
-        response = client.table('favorites').select('*').order('added_time', desc=True).execute()
+        response = client.table('favorites').delete().eq('id', favorite_id).execute()
+        if not response.data:
+            return False
 
-        favorites = response.data if response.data else []
-        return favorites
+        with self._lock:
+            if self._items is not None:
+                self._items = [item for item in self._items if item['id'] != favorite_id]
+                self._reindex()
+        return True
+
+    def invalidate(self):
+        """清除缓存，下次访问时重新加载"""
+        with self._lock:
+            self._items = None
+            self._keys = set()
+            self._by_id = {}
+            self._loaded_at = 0.0
 
-    except Exception as e:
-        print(f"❌❌ 从Supabase加载收藏失败: {e}")
-        return []
+
+# 创建全局收藏仓库实例
+favorites_repository = FavoritesRepository()
+
+
+def load_favorites():
+    """加载所有收藏产品（优先使用内存缓存）"""
+    return favorites_repository.all()
 
 
 def add_to_favorites(product_info):
     """添加产品到 Supabase 收藏"""
     try:
         # 检查是否重复
-        existing_favorites = load_favorites()
-        if is_duplicate(existing_favorites, product_info):
+        if favorites_repository.contains(product_info):
             return False, "该产品已存在于收藏中"
 
         # 准备插入数据
@@ -45,10 +137,7 @@ def add_to_favorites(product_info):
         }
 
         # 插入数据
-        client = supabase_manager.get_client()
-        response = client.table('favorites').insert(product_data).execute()
-
-        if response.data:
+        if favorites_repository.add(product_data):
             return True, "成功添加到收藏"
         else:
             return False, "添加到数据库失败"
@@ -58,35 +147,36 @@ def add_to_favorites(product_info):
         return False, f"添加到收藏失败: {str(e)}"
 
 
-def remove_from_favorites(index):
-    """根据索引从收藏中移除产品"""
+def remove_favorite_by_id(favorite_id):
+    """根据 id 从收藏中移除产品"""
     try:
-        favorites = load_favorites()
-        if 0 <= index < len(favorites):
-            id_to_remove = favorites[index]['id']
-            client = supabase_manager.get_client()
-            response = client.table('favorites').delete().eq('id', id_to_remove).execute()
-
-            if response.data:
-                return True, f"已从收藏中移除"
-            else:
-                return False, "删除失败，未找到对应记录"
+        if favorites_repository.remove(favorite_id):
+            return True, f"已从收藏中移除"
         else:
-            return False, "索引超出范围"
+            return False, "删除失败，未找到对应记录"
 
     except Exception as e:
         print(f"❌❌ 从收藏移除失败: {e}")
         return False, f"数据库错误: {str(e)}"
 
 
+def remove_from_favorites(index):
+    """根据索引从收藏中移除产品（兼容旧接口，建议使用 remove_favorite_by_id）"""
+    favorites = load_favorites()
+    if 0 <= index < len(favorites):
+        return remove_favorite_by_id(favorites[index]['id'])
+    return False, "索引超出范围"
+
+
 def clear_favorites():
     """清空收藏表"""
     try:
         client = supabase_manager.get_client()
         response = client.table('favorites').delete().neq('id', '').execute()
+        favorites_repository.invalidate()
 
         deleted_count = len(response.data) if response.data else 0
         return True, f"已清空收藏列表，删除了 {deleted_count} 条记录"
     except Exception as e:
         print(f"❌❌ 清空收藏失败: {e}")
-        return False, f"清空失败: {str(e)}"
\ No newline at end of file
+        return False, f"清空失败: {str(e)}"
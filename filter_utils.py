@@ -1,108 +1,66 @@
-import pandas as pd
-from io import BytesIO
-from inventory_check import get_store_region
+from collections import OrderedDict
+import numpy as np
+from inventory_matrix import as_inventory_matrix
+from store_registry import store_registry
 import streamlit as st
-import hashlib
-import json
 
 
-def any_has_stock(products):
-    """检查店铺中是否有任何产品有库存"""
-    for stock in products.values():
-        if stock and str(stock).isdigit() and int(stock) > 0:
-            return True
-    return False
-
-
-def store_in_region(store_name, target_region):
-    """检查店铺是否在目标区域"""
-    if target_region == "全部":
-        return True
-    return get_store_region(store_name) == target_region
-
-
-def _hash_inventory_matrix(inventory_matrix):
-    """为库存矩阵生成哈希值（用于缓存）"""
-    try:
-        matrix_json = json.dumps(inventory_matrix, sort_keys=True, default=str)
-        return hashlib.md5(matrix_json.encode()).hexdigest()
-    except:
-        return None
-
-
-@st.cache_data(ttl=3600)
-def apply_filters_and_sort(inventory_matrix_hash, stock_filter, region_filter, sort_option):
-    """应用筛选和排序（缓存优化版）
-    
-    注意：接收库存矩阵的哈希值以便缓存，调用时使用 _hash_inventory_matrix()
-    """
-    # 由于接收的是哈希值，这个函数在实际调用时应该是这样的：
-    # 实际应该直接在main.py中调用不缓存的版本
-    # 这个设计有问题，改为使用装饰器工厂
-    pass
+# 筛选结果缓存的最大条目数（LRU）
+FILTER_CACHE_MAX_ENTRIES = 16
 
 
 def apply_filters_and_sort_internal(inventory_matrix, stock_filter, region_filter, sort_option):
-    """应用筛选和排序的内部实现"""
-    filtered_data = {}
+    """应用筛选和排序的内部实现（基于库存矩阵数组计算）"""
+    matrix = as_inventory_matrix(inventory_matrix)
+    rows = np.arange(len(matrix))
+
+    # 库存状态筛选
+    if stock_filter != "全部":
+        has_stock = (matrix.stock > 0).any(axis=1)
+        if stock_filter == "有库存":
+            rows = rows[has_stock[rows]]
+        elif stock_filter == "无库存":
+            rows = rows[~has_stock[rows]]
+
+    # 区域筛选
+    if region_filter != "全部":
+        in_region = np.array(
+            [store_registry.get(store_name).region == region_filter for store_name in matrix.stores],
+            dtype=bool
+        )
+        rows = rows[in_region[rows]]
 
-    for store_name, products in inventory_matrix.items():
-        # 库存状态筛选
-        if stock_filter != "全部":
-            has_stock = any_has_stock(products)
-            if (stock_filter == "有库存" and not has_stock) or \
-                    (stock_filter == "无库存" and has_stock):
-                continue
+    # 排序（库存总量相同的店铺保持原顺序）
+    if sort_option != "默认" and len(rows):
+        totals = matrix.stock[rows].sum(axis=1, dtype=np.int64)
+        if sort_option == "库存总量降序":
+            totals = -totals
+        rows = rows[np.argsort(totals, kind="stable")]
 
-        # 区域筛选
-        if region_filter != "全部" and not store_in_region(store_name, region_filter):
-            continue
+    return {matrix.stores[i]: matrix[matrix.stores[i]] for i in rows}
 
-        filtered_data[store_name] = products
 
-    # 排序
-    if sort_option != "默认":
-        sorted_items = sorted(
-            filtered_data.items(),
-            key=lambda x: sum(int(stock) for stock in x[1].values() if stock and str(stock).isdigit()),
-            reverse=(sort_option == "库存总量降序")
-        )
-        filtered_data = dict(sorted_items)
+def apply_filters_and_sort(inventory_matrix, stock_filter, region_filter, sort_option):
+    """应用筛选和排序（按矩阵版本缓存在会话状态的LRU中）"""
+    matrix = as_inventory_matrix(inventory_matrix)
+    cache_key = (matrix.version, stock_filter, region_filter, sort_option)
 
-    return filtered_data
+    # 检查会话状态缓存
+    filter_cache = st.session_state.get("filter_cache")
+    if not isinstance(filter_cache, OrderedDict):
+        filter_cache = OrderedDict()
+        st.session_state.filter_cache = filter_cache
 
+    if cache_key in filter_cache:
+        filter_cache.move_to_end(cache_key)
+        return filter_cache[cache_key]
 
-# 创建缓存版本（使用会话状态缓存）
-def apply_filters_and_sort(inventory_matrix, stock_filter, region_filter, sort_option):
-    """应用筛选和排序（支持会话状态缓存）"""
-    # 生成缓存键
-    cache_key = f"filtered_matrix_{stock_filter}_{region_filter}_{sort_option}_{_hash_inventory_matrix(inventory_matrix)}"
-    
-    # 检查会话状态缓存
-    if "filter_cache" not in st.session_state:
-        st.session_state.filter_cache = {}
-    
-    if cache_key in st.session_state.filter_cache:
-        return st.session_state.filter_cache[cache_key]
-    
     # 执行过滤和排序
-    result = apply_filters_and_sort_internal(inventory_matrix, stock_filter, region_filter, sort_option)
-    
-    # 缓存结果
-    st.session_state.filter_cache[cache_key] = result
-    
-    return result
+    result = apply_filters_and_sort_internal(matrix, stock_filter, region_filter, sort_option)
 
+    # 缓存结果（超出上限时淘汰最久未使用的条目）
+    filter_cache[cache_key] = result
+    while len(filter_cache) > FILTER_CACHE_MAX_ENTRIES:
+        filter_cache.popitem(last=False)
 
-@st.cache_data(ttl=3600)
-def convert_to_excel(df_dict_str):
-    """将DataFrame转换为Excel字节流（缓存优化版）"""
-    # 从字典字符串重建DataFrame
-    df_dict = json.loads(df_dict_str)
-    df = pd.DataFrame.from_dict(df_dict, orient='index')
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='库存数据', index=True)
-    excel_data = output.getvalue()
-    return excel_data
\ No newline at end of file
+    return result
@@ -0,0 +1,340 @@
+# image_cache.py
+import base64
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import requests
+
+from catalog_store import CACHE_DIR
+
+IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "images")
+
+# 图片尺寸规格：规格名 -> 最长边（像素）。每张图片下载一次，同时生成全部规格
+IMAGE_VARIANTS = {
+    "chip": 64,  # 颜色色块
+    "thumbnail": 300,  # 收藏列表（以150宽显示，保留2倍清晰度）
+    "detail": 800,  # 产品详情
+}
+IMAGE_QUALITY = 80
+
+# 磁盘缓存上限（字节），超出后按最近使用时间淘汰到上限的90%
+IMAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# 内存中保留的图片数量（LRU）
+IMAGE_MEMORY_ITEMS = 300
+
+# 后台预取的并发下载数
+IMAGE_PREFETCH_WORKERS = 6
+
+# 图片下载失败后多久再重试（秒），避免每次重跑都请求失效的图片
+IMAGE_RETRY_SECONDS = 300
+
+IMAGE_DOWNLOAD_TIMEOUT_SECONDS = 5
+
+
+def pil_available():
+    """检查是否安装了 Pillow（图片缓存为可选功能，未安装时直接显示原图）"""
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def download_image(url, timeout=IMAGE_DOWNLOAD_TIMEOUT_SECONDS):
+    """下载原图，失败返回 None"""
+    try:
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Accept": "image/avif,image/webp,image/*,*/*;q=0.8",
+        }
+        response = requests.get(url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return response.content
+    except Exception as e:
+        print(f"图片下载失败: {url} - {e}")
+        return None
+
+
+def make_variants(data, variants=IMAGE_VARIANTS, quality=IMAGE_QUALITY):
+    """
+    将原图缩小为各规格的 JPEG（保持比例，最长边不超过规格尺寸，不放大）
+
+    Returns:
+        {规格名: JPEG字节}，原图无法解析时返回 None
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            if image.mode in ("RGBA", "LA", "P"):
+                # 透明背景填充为白色
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+
+            results = {}
+            # 从大到小依次缩小，小规格基于上一规格生成
+            for name, size in sorted(variants.items(), key=lambda item: -item[1]):
+                image = image.copy()
+                image.thumbnail((size, size), Image.LANCZOS)
+                output = io.BytesIO()
+                image.save(output, format="JPEG", quality=quality, optimize=True)
+                results[name] = output.getvalue()
+            return results
+    except Exception as e:
+        print(f"图片缩放失败: {e}")
+        return None
+
+
+class ImageCache:
+    """产品图片与颜色色块的本地缓存（进程级，所有会话共享）
+
+    每张图片只从韩国 CDN 下载一次，缩小为各规格后保存在 .cache/images（文件名为图片URL哈希与规格），
+    磁盘占用超过上限时按最近使用时间淘汰；最近使用的图片同时保留在内存中。
+    预取在后台线程池中进行，同一图片正在下载时，前台请求等待该下载而不重复请求。
+    页面以字节或 data URI 显示图片，浏览器不再访问 CDN。
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, variants=IMAGE_VARIANTS, max_bytes=IMAGE_CACHE_MAX_BYTES,
+                 memory_items=IMAGE_MEMORY_ITEMS, workers=IMAGE_PREFETCH_WORKERS, fetcher=download_image):
+        self.cache_dir = cache_dir
+        self.variants = dict(variants)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.workers = workers
+        self._fetcher = fetcher
+        self._memory = OrderedDict()  # (图片URL, 规格) -> JPEG字节
+        self._failed = {}  # 图片URL -> 失败时间
+        self._pending = {}  # 图片URL -> 正在下载的 Future
+        self._disk_bytes = None  # 磁盘占用（首次写入时统计）
+        self._executor = None
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+
+    def _path(self, url, variant):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}_{variant}_{self.variants[variant]}.jpg")
+
+    def _remember(self, url, variant, data):
+        with self._lock:
+            key = (url, variant)
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _recently_failed(self, url):
+        failed_at = self._failed.get(url)
+        return failed_at is not None and time.time() - failed_at < IMAGE_RETRY_SECONDS
+
+    def _read_disk(self, url, variant):
+        path = self._path(url, variant)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        # 更新修改时间，作为 LRU 淘汰依据
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _scan_disk(self):
+        """磁盘上的缓存文件列表 [(修改时间, 大小, 路径)]"""
+        files = []
+        try:
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and entry.name.endswith(".jpg"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            pass
+        return files
+
+    def _evict(self):
+        """按最近使用时间淘汰磁盘文件，直到占用不超过上限的90%（调用方持有 _disk_lock）"""
+        files = sorted(self._scan_disk())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._disk_bytes = total
+        if removed:
+            print(f"图片缓存淘汰 {removed} 个文件，当前占用 {total} 字节")
+
+    def _write_disk(self, url, variant, data):
+        """写入图片（先写临时文件再替换，避免并发读到不完整的文件）"""
+        path = self._path(url, variant)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"图片缓存写入失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _load(self, url):
+        """下载原图并生成全部规格（写入磁盘），失败返回 None"""
+        try:
+            original = self._fetcher(url)
+            variants = make_variants(original, self.variants) if original else None
+            if not variants:
+                with self._lock:
+                    self._failed[url] = time.time()
+                return None
+
+            with self._lock:
+                self._failed.pop(url, None)
+            for variant, data in variants.items():
+                self._write_disk(url, variant, data)
+            return variants
+        finally:
+            with self._lock:
+                self._pending.pop(url, None)
+
+    def _submit(self, url):
+        """提交下载任务（同一图片只下载一次），返回 Future"""
+        with self._lock:
+            future = self._pending.get(url)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-prefetch")
+                future = self._executor.submit(self._load, url)
+                self._pending[url] = future
+            return future
+
+    def _cached(self, url, variant):
+        """从内存或磁盘读取，未缓存返回 None"""
+        with self._lock:
+            data = self._memory.get((url, variant))
+            if data is not None:
+                self._memory.move_to_end((url, variant))
+                return data
+
+        data = self._read_disk(url, variant)
+        if data is not None:
+            self._remember(url, variant, data)
+        return data
+
+    def get(self, url, variant="thumbnail", wait=True):
+        """
+        获取指定规格的图片
+
+        Args:
+            url: 原图URL
+            variant: 规格名（chip / thumbnail / detail）
+            wait: 未缓存时是否等待下载完成（False 时只在后台下载）
+
+        Returns:
+            JPEG 字节，图片不可用、尚未下载完成或未安装 Pillow 时返回 None（调用方可退回显示原图）
+        """
+        if not url or not pil_available():
+            return None
+
+        data = self._cached(url, variant)
+        if data is not None:
+            return data
+        with self._lock:
+            if self._recently_failed(url):
+                return None
+
+        future = self._submit(url)
+        if not wait:
+            return None
+        try:
+            variants = future.result(timeout=IMAGE_DOWNLOAD_TIMEOUT_SECONDS * 2)
+        except FutureTimeoutError:
+            return None
+        if not variants:
+            return None
+
+        data = variants[variant]
+        self._remember(url, variant, data)
+        return data
+
+    def data_uri(self, url, variant="chip", wait=True):
+        """图片的 data URI（用于 HTML 中的 <img> 或 background-image），不可用时返回 None"""
+        data = self.get(url, variant, wait=wait)
+        if data is None:
+            return None
+        return "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+
+    def prefetch(self, urls):
+        """
+        在后台下载尚未缓存的图片（立即返回）
+
+        Returns:
+            提交下载的图片数量
+        """
+        if not pil_available():
+            return 0
+
+        submitted = 0
+        for url in dict.fromkeys(url for url in urls if url):
+            with self._lock:
+                if self._recently_failed(url) or url in self._pending:
+                    continue
+            if all(os.path.exists(self._path(url, variant)) for variant in self.variants):
+                continue
+            self._submit(url)
+            submitted += 1
+        return submitted
+
+    def disk_usage(self):
+        """磁盘缓存统计，返回 (文件数, 总字节数)"""
+        files = self._scan_disk()
+        return len(files), sum(size for _, size, _ in files)
+
+    def clear(self):
+        """清除内存和磁盘上的全部图片，返回删除的文件数"""
+        with self._lock:
+            self._memory.clear()
+            self._failed.clear()
+        removed = 0
+        with self._disk_lock:
+            for _, _, path in self._scan_disk():
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    print(f"图片缓存清除失败: {e}")
+            self._disk_bytes = None
+        return removed
+
+
+# 创建全局图片缓存实例
+image_cache = ImageCache()
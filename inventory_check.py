@@ -1,5 +1,14 @@
+import asyncio
+import time
 import requests
 import json
+import threading
+import numpy as np
+from inventory_matrix import InventoryMatrix, as_inventory_matrix
+from stock_engine import stock_engine, build_stock_query_url, DEFAULT_HEADERS, MAX_CONCURRENCY
+from stock_cache import stock_cache, FRESH, STALE
+from rate_limiter import api_governor, governed_get, CircuitOpenError
+from store_registry import store_registry, store_translation, STORE_REGION_MAPPING, REGION_KEY_MAPPING
 # 确保新函数可以被其他模块导入
 __all__ = [
     'get_store_region', 'map_region_to_key', 'simplify_store_name',
@@ -7,118 +16,11 @@ __all__ = [
     'get_inventory_matrix_transposed', 'calculate_stock_status_distribution',
     'calculate_region_heatmap', 'calculate_product_depth_stats',
     'calculate_enhanced_inventory_stats',
-    'calculate_key_store_analysis'
+    'calculate_key_store_analysis', 'compute_inventory_analytics'
 
 ]
 
-# 店铺名称翻译字典
-store_translation = {
-    "아크테릭스 롯데백화점 본점": "始祖鸟乐天百货总店",
-    "아크테릭스 롯데백화점 평촌极": "始祖鸟乐天百货平村店",
-    "아크테릭스 플래그십 스토어 강남": "始祖鸟旗舰店江南",
-    "아크테릭스 플래그십 스토어 대구수성": "始祖鸟旗舰店大邱寿城",
-    "아크테릭스 도봉산점": "始祖鸟道峰山店",
-    "아크테릭스 봉무점": "始祖鸟奉武店",
-    "아크테릭스 부산점": "始祖鸟釜山店",
-    "아크테릭스 여주프리미엄빌리지점": "始祖鸟骊州Premium Village店",
-    "아크테릭스 일산점": "始祖鸟一山店",
-    "아크테릭스 종로점": "始祖鸟钟路店",
-    "아크테릭스 롯데프리미엄아울렛 의왕점": "始祖鸟乐天Premium Outlet义王店",
-    "아크테릭스 롯데프리미엄아울렛 동부산점": "始祖鸟乐天Premium Outlet东釜山店",
-    "아크테릭스 롯데极프리미엄아울렛 이천점": "始祖鸟乐天Premium Outlet利川店",
-    "아크테릭스 신세계사이먼 프리미엄 아울렛 파주점": "始祖鸟新世界Simon Premium Outlet坡州店",
-    "아크테릭스 신세계사이먼 프리미엄 아울렛 제주점": "始祖鸟新世界Simon Premium Outlet济州店",
-    "아极테릭스 현대프리미엄아울렛 김포점": "始祖鸟现代Premium Outlet金浦店",
-    "아크테릭스 현대프리미엄아울렛 송도점": "始祖鸟现代Premium Outlet松岛店",
-    "아크테릭스 현대프리미엄아울렛 대전점": "始祖鸟现代Premium Outlet大田店",
-    "아크테릭스 신세계사이먼 프리미엄 아울렛 시흥점": "始祖鸟新世界Simon Premium Outlet始兴店",
-    "아크테릭스 현대프리미엄아울렛 SPACE 1": "始祖鸟现代Premium Outlet SPACE 1",
-    "아크테릭스 신세계사이먼 프리미엄 아울렛 부산점": "始祖鸟新世界Simon Premium Outlet釜山店",
-    "아크테릭스 롯데프리미엄아울렛 파주점": "始祖鸟乐天Premium Outlet坡州店",
-    "아크테릭스 플래그십 스토어 롯데월드몰": "始祖鸟旗舰店乐天世界购物中心",
-    "아크테릭스 스타필드 코엑스몰점": "始祖鸟Starfield COEX购物中心店",
-    "아크테릭스 롯데백화점 동탄점": "始祖鸟乐天百货东滩店",
-    "아크테릭스 대구신세계": "始祖鸟大邱新世界",
-    "아크테릭스 롯데백화점 대전점": "始祖鸟乐极百货大田店",
-    "아크테릭스 롯데백화점 노원점": "始祖鸟乐天百货芦原店",
-    "아크테릭스 현대백화점 판교점": "始祖鸟现代百货板桥店",
-    "아크테릭스 광주신세계": "始祖鸟光州新世界",
-    "아크테릭스 롯데백화점 수원점": "始祖鸟乐天百货水原店",
-    "아크테릭스 롯데백화점 광복점": "始祖鸟乐天百货光复店",
-    "아크테릭스 신세계백화점 센텀시티": "始祖鸟新世界百货Centum City店",
-    "아크테릭스 롯데백화점 울산점": "始祖鸟乐天百货蔚山店",
-    "아크테릭스 신세계백화점 본점": "始祖鸟新世界百货总店",
-    "아크테릭스 신세계백화점 강남점": "始祖鸟新世界百货江南店",
-    "아크테릭스 롯데백화점 부산본점": "始祖鸟乐天百货釜山总店",
-    "아크테릭스 롯데백화점 전주점": "始祖鸟乐天百货全州店",
-    "아크테릭스 더현대 서울": "始祖鸟The Hyundai首尔",
-    "아크테릭스 롯데백화점 영등포점": "始祖鸟乐天百货永登浦店",
-    "아크테릭스 현대백화점 목동极": "始祖鸟现代百货木洞店",
-    "아크테릭스 대전신세계 Art&Science": "始祖鸟大田新世界Art&Science",
-    "아크테릭스 롯데백화점 잠실점": "始祖鸟乐天百货蚕室店",
-    "아크테릭스 신세계 사우스시티": "始祖鸟新世界South City",
-    "아크테릭스 현대백화점 울산점": "始祖鸟现代百货蔚山店",
-    "아크테릭스 현대백화점 충청점": "始祖鸟现代百货忠清店",
-    "아크테릭스 무등산점": "始祖鸟无等山店",
-    "아크테릭스 덕소삼패점": "始祖鸟德沼三牌店",
-    "아크테릭스 중구점": "始祖鸟中区店",
-    "아크테릭스 진주점": "始祖鸟晋州店",
-    "아크테릭스 안산점": "始祖鸟安山店",
-    "아크테릭스 롯데백화점 인천점": "始祖鸟乐天百货仁川店",
-    "아크테릭스 현대프리미엄아울렛 김포점": "始祖鸟现代Premium Outlet金浦店",
-    "아크테릭스 롯데백화점 평촌점": "始祖鸟乐天百货平村店",
-    "아크테릭스 현대백화점 목동점": "始祖鸟现代百货木洞店",
-    "아크테릭스 롯데프리미엄아울렛 이천점": "始祖鸟乐天Premium Outlet利川店"
-}
-
-# 硬编码的店铺-区域映射表（直接复制 store_region_mapping.txt 的内容）
-STORE_REGION_MAPPING = {
-    "始祖鸟乐天百货总店": "首尔城区",
-    "始祖鸟乐天百货平村店": "京畿道地区",
-    "始祖鸟旗舰店江南": "首尔城区",
-    "始祖鸟旗舰店大邱寿城": "大邱",
-    "始祖鸟道峰山店": "京畿道地区",
-    "始祖鸟釜山店": "釜山",
-    "始祖鸟骊州Premium Village店": "京畿道地区",
-    "始祖鸟一山店": "京畿道地区",
-    "始祖鸟钟路店": "首尔城区",
-    "始祖鸟乐天Premium Outlet义王店": "京畿道地区",
-    "始祖鸟乐天Premium Outlet东釜山店": "釜山",
-    "始祖鸟新世界Simon Premium Outlet坡州店": "京畿道地区",
-    "始祖鸟新世界Simon Premium Outlet济州店": "京畿道地区",
-    "始祖鸟现代Premium Outlet金浦店": "京畿道地区",
-    "始祖鸟现代Premium Outlet松岛店": "京畿道地区",
-    "始祖鸟现代Premium Outlet大田店": "京畿道地区",
-    "始祖鸟新世界Simon Premium Outlet始兴店": "京畿道地区",
-    "始祖鸟现代Premium Outlet SPACE 1": "京畿道地区",
-    "始祖鸟新世界Simon Premium Outlet釜山店": "釜山",
-    "始祖鸟乐天Premium Outlet坡州店": "京畿道地区",
-    "始祖鸟旗舰店乐天世界购物中心": "首尔城区",
-    "始祖鸟Starfield COEX购物中心店": "首尔城区",
-    "始祖鸟乐天百货东滩店": "京畿道地区",
-    "始祖鸟大邱新世界": "大邱",
-    "始祖鸟乐极百货大田店": "京畿道地区",
-    "始祖鸟乐天百货芦原店": "京畿道地区",
-    "始祖鸟现代百货板桥店": "京畿道地区",
-    "始祖鸟乐天百货水原店": "京畿道地区",
-    "始祖鸟乐天百货光复店": "釜山",
-    "始祖鸟新世界百货Centum City店": "釜山",
-    "始祖鸟新世界百货总店": "首尔城区",
-    "始祖鸟新世界百货江南店": "首尔城区",
-    "始祖鸟乐天百货釜山总店": "釜山",
-    "始祖鸟The Hyundai首尔": "首尔城区",
-    "始祖鸟乐天百货永登浦店": "首尔城区",
-    "始祖鸟现代百货木洞店": "首尔城区",
-    "始祖鸟乐天百货蚕室店": "首尔城区",
-    "始祖鸟新世界South City": "京畿道地区",
-    "始祖鸟德沼三牌店": "京畿道地区",
-    "始祖鸟安山店": "京畿道地区",
-    "始祖鸟乐天百货仁川店": "京畿道地区",
-    "始祖鸟现代Premium Outlet金浦店": "首尔城区",
-    "始祖鸟乐天百货平村店": "京畿道地区",
-    "始祖鸟现代百货木洞店": "首尔城区",
-    "始祖鸟乐天Premium Outlet利川店": "京畿道地区"
-}
+# 店铺名称翻译、区域映射和官方店铺数据统一维护在 store_registry.py
 
 def get_store_region(store_name):
     """根据店铺名称判断所属区域（严格依赖硬编码的映射表）"""
@@ -126,21 +28,12 @@ def get_store_region(store_name):
 
 def map_region_to_key(region):
     """将店铺区域映射到区域分类键"""
-    if region == "首尔城区":
-        return "首尔圈"
-    elif region == "京畿道地区":
-        return "京畿道圈"
-    elif region == "釜山":
-        return "釜山圈"
-    elif region == "大邱":
-        return "大邱圈"
-    return None
+    return REGION_KEY_MAPPING.get(region)
 
 def simplify_store_name(store_name):
     """简化店铺名称（去掉'始祖鸟'前缀）"""
-    if store_name.startswith("始祖鸟"):
-        return store_name[3:]  # 去掉前3个字符
-    return store_name
+    return store_registry.get(store_name).simple_name
+
 def translate_store_name(korean_name):
     """翻译店铺名称"""
     return store_translation.get(korean_name, korean_name)
@@ -160,16 +53,31 @@ def get_stock_status(stock):
         return "❓❓ 库存信息异常"
 
 
+# 单个查询共享的HTTP会话（复用keep-alive连接）
+_http_session = requests.Session()
+_http_session.headers.update(DEFAULT_HEADERS)
+
+
 def query_stock_by_product_id(product_id):
-    """根据产品ID查询库存（保持原有函数不变，用于回退和单个查询）"""
-    url = f"https://api.arcteryx.co.kr/api/stores?limit=0&page=1&local_code=&search_keyword=&x=&y=&product_option_id={product_id}&orderby=store_sort%7Casc"
+    """根据产品ID查询库存（优先使用共享库存缓存，过期数据先返回再后台刷新）"""
+    rows, state = stock_cache.lookup(product_id)
+    if state == FRESH:
+        return rows
+    if state == STALE:
+        _revalidate_in_background([product_id])
+        return rows
+
+    rows = _fetch_stock_by_product_id(product_id)
+    stock_cache.put(product_id, rows)
+    return rows
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    }
+
+def _fetch_stock_by_product_id(product_id):
+    """直接请求接口查询单个产品库存（不经过缓存）"""
+    url = build_stock_query_url(product_id)
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = governed_get(url, session=_http_session, timeout=10)
         response.raise_for_status()
         data = response.json()
 
@@ -183,90 +91,170 @@ def query_stock_by_product_id(product_id):
         return []
 
 
-def get_inventory_matrix_transposed(favorites_list):
-    """转置库存矩阵：店铺×产品（并发优化版）"""
-    if not favorites_list:
-        return {}, {"success": 0, "failed": 0, "failed_details": []}
+# 分批查询配置：每批SKU数量，以及断点数据的有效期（秒）
+QUERY_CHUNK_SIZE = 40
+CHECKPOINT_MAX_AGE = 600
 
-    # 提取所有SKU ID用于批量查询
-    product_ids = [favorite['sku'] for favorite in favorites_list]
 
-    print(f"开始处理 {len(product_ids)} 个产品的库存查询...")
+def _merge_stock_rows(inventory_data, product_key, stores_data):
+    """将单个产品的店铺库存数据合并到库存矩阵中"""
+    for store_data in stores_data:
+        store_name = store_registry.resolve(store_data).name
+        if store_name not in inventory_data:
+            inventory_data[store_name] = {}
 
-    # 根据产品数量动态调整并发数（优化版：提高并发度）
-    if len(product_ids) <= 3:
-        max_workers = 3  # 产品少时使用较低并发
-    elif len(product_ids) <= 10:
-        max_workers = 6  # 中等数量使用中等并发
-    else:
-        max_workers = 10  # 产品多时使用更高并发
+        stock_count = store_data.get("usable_stock", 0)
+        inventory_data[store_name][product_key] = stock_count
+
+
+def _load_checkpoint(checkpoint):
+    """读取断点中已完成的SKU（过期的断点会被重置）"""
+    if checkpoint is None:
+        return {}
+
+    started_at = checkpoint.get("started_at")
+    if not started_at or time.time() - started_at > CHECKPOINT_MAX_AGE:
+        checkpoint.clear()
+        checkpoint["started_at"] = time.time()
+        checkpoint["completed"] = {}
+
+    return checkpoint["completed"]
 
-    # 使用并发查询
-    batch_results, stats = batch_query_stock_concurrent(
-        product_ids,
-        max_workers=max_workers,
-        timeout_per_request=12  # 稍微延长超时时间
-    )
 
-    # 构建产品键映射
+def get_inventory_matrix_transposed(favorites_list, checkpoint=None, on_chunk=None, chunk_size=QUERY_CHUNK_SIZE):
+    """转置库存矩阵：店铺×产品（分批并发版）
+
+    Args:
+        favorites_list: 收藏产品列表
+        checkpoint: 可选的断点字典（如 st.session_state 中的字典），记录已完成的SKU，
+            查询被中断后再次调用会跳过这些SKU；全部批次完成后自动清空
+        on_chunk: 可选回调 on_chunk(部分库存矩阵, 进度字典)，每完成一批调用一次
+        chunk_size: 每批查询的SKU数量
+    """
+    if not favorites_list:
+        return {}, {"success": 0, "failed": 0, "failed_details": []}
+
+    # 构建产品键映射（同时按SKU去重）
     product_key_mapping = {}
     for favorite in favorites_list:
         product_key = f"{favorite['product_model']} {favorite['color']} {favorite['size']}"
         product_key_mapping[favorite['sku']] = product_key
 
-    # 转换数据格式
+    product_ids = list(product_key_mapping.keys())
+    completed = _load_checkpoint(checkpoint)
+
+    print(f"开始处理 {len(product_ids)} 个产品的库存查询...")
+
+    # 从断点恢复已完成的SKU
     inventory_data = {}
-    for product_id, stores_data in batch_results.items():
-        if not stores_data:
-            continue
+    resumed_ids = [pid for pid in product_ids if pid in completed]
+    for product_id in resumed_ids:
+        _merge_stock_rows(inventory_data, product_key_mapping[product_id], completed[product_id])
+    if resumed_ids:
+        print(f"从断点恢复 {len(resumed_ids)} 个产品，跳过重复查询")
 
-        product_key = product_key_mapping.get(product_id)
-        if not product_key:
-            continue
+    pending_ids = [pid for pid in product_ids if pid not in completed]
 
-        # 处理每个店铺的库存数据
-        for store_data in stores_data:
-            store_name = translate_store_name(store_data.get("store_name", ""))
-            if store_name not in inventory_data:
-                inventory_data[store_name] = {}
+    # 并发上限交给共享流控（api_governor）根据延迟和限流情况自适应调整
+    max_workers = MAX_CONCURRENCY
 
-            stock_count = store_data.get("usable_stock", 0)
-            inventory_data[store_name][product_key] = stock_count
+    success_count = len(resumed_ids)
+    failed_details = []
+    start_time = time.time()
 
-    print(f"库存矩阵构建完成: 共 {len(inventory_data)} 个店铺")
-    return inventory_data, stats
-def calculate_stock_status_distribution(inventory_matrix):
-    """计算库存状态分布"""
+    # 分批查询，每批完成后写入断点并回传部分矩阵
+    for offset in range(0, len(pending_ids), chunk_size):
+        chunk_ids = pending_ids[offset:offset + chunk_size]
+        batch_results, chunk_stats = batch_query_stock_concurrent(
+            chunk_ids,
+            max_workers=max_workers,
+            timeout_per_request=12  # 稍微延长超时时间
+        )
+
+        for product_id, stores_data in batch_results.items():
+            if not stores_data:
+                continue
+            completed[product_id] = stores_data
+            _merge_stock_rows(inventory_data, product_key_mapping[product_id], stores_data)
+
+        success_count += len(batch_results)
+        failed_details.extend(chunk_stats.get("failed_details", []))
+
+        if on_chunk:
+            on_chunk(inventory_data, {
+                "done": len(resumed_ids) + offset + len(chunk_ids),
+                "total": len(product_ids),
+                "success": success_count,
+                "failed": len(failed_details)
+            })
+
+    # 全部批次已处理，清空断点，下次查询重新获取最新库存
+    if checkpoint is not None:
+        checkpoint.clear()
+
+    duration = round(time.time() - start_time, 2)
+    success_rate = success_count / len(product_ids) * 100 if product_ids else 0
+    stats = {
+        "success": success_count,
+        "failed": len(failed_details),
+        "total": len(product_ids),
+        "success_rate": round(success_rate, 1),
+        "duration": duration,
+        "failed_details": failed_details,
+        "resumed": len(resumed_ids)
+    }
+
+    # 转换为列式矩阵（保留所有收藏产品的列，即使没有任何店铺记录）
+    inventory_matrix = InventoryMatrix.from_dict(
+        inventory_data, products=list(product_key_mapping.values())
+    )
+
+    print(f"库存矩阵构建完成: 共 {len(inventory_matrix)} 个店铺")
+    return inventory_matrix, stats
+
+
+# 默认的重点关注店铺
+DEFAULT_KEY_STORES = [
+    "始祖鸟新世界百货总店", "始祖鸟新世界百货江南店", "始祖鸟新世界百货Centum City店",
+    "始祖鸟乐天百货总店", "始祖鸟旗舰店江南", "始祖鸟釜山店",
+    "始祖鸟骊州Premium Village店", "始祖鸟The Hyundai首尔", "始祖鸟旗舰店大邱寿城",
+    "始祖鸟现代百货板桥店", "始祖鸟钟路店"
+]
+
+
+def _store_region_keys(matrix):
+    """每个店铺的区域分类键（不在映射表中的店铺为 None）"""
+    return [store_registry.get(store_name).region_key for store_name in matrix.stores]
+
+
+def _favorite_product_keys(favorites_list):
+    """收藏产品在库存矩阵中的产品键"""
+    return [f"{favorite['product_model']} {favorite['color']} {favorite['size']}" for favorite in favorites_list]
+
+
+def _stock_status_distribution(matrix, positive):
+    """库存状态分布（positive 为 stock > 0 的布尔矩阵）"""
     stock_stats = {
         "高库存店铺": {"count": 0, "percentage": 0},
         "低库存店铺": {"count": 0, "percentage": 0},
         "无库存店铺": {"count": 0, "percentage": 0}
     }
 
-    total_stores = len(inventory_matrix)
+    total_stores = len(matrix)
     if total_stores == 0:
         return stock_stats
 
-    for store_data in inventory_matrix.values():
-        has_stock = False
-        low_stock = False
-
-        for stock in store_data.values():
-            if stock and str(stock).isdigit():
-                stock_count = int(stock)
-                if stock_count > 0:
-                    has_stock = True
-                    if 1 <= stock_count <= 2:
-                        low_stock = True
-                    break
-
-        if has_stock:
-            if low_stock:
-                stock_stats["低库存店铺"]["count"] += 1
-            else:
-                stock_stats["高库存店铺"]["count"] += 1
-        else:
-            stock_stats["无库存店铺"]["count"] += 1
+    # 按店铺第一个有库存产品的数量判断高/低库存（1~2件为低库存）
+    has_stock = positive.any(axis=1)
+    if matrix.products:
+        first_stock = matrix.stock[np.arange(total_stores), positive.argmax(axis=1)]
+        low_stock = has_stock & (first_stock <= 2)
+    else:
+        low_stock = has_stock
+
+    stock_stats["高库存店铺"]["count"] = int((has_stock & ~low_stock).sum())
+    stock_stats["低库存店铺"]["count"] = int(low_stock.sum())
+    stock_stats["无库存店铺"]["count"] = int((~has_stock).sum())
 
     # 计算百分比
     for key in stock_stats:
@@ -275,8 +263,8 @@ def calculate_stock_status_distribution(inventory_matrix):
     return stock_stats
 
 
-def calculate_region_heatmap(inventory_matrix):
-    """计算区域库存热力图数据"""
+def _region_heatmap(matrix, region_keys):
+    """区域库存热力图（region_keys 为每个店铺的区域分类键）"""
     region_stats = {
         "首尔圈": {"count": 0, "percentage": 0, "inventory": 0},
         "京畿道圈": {"count": 0, "percentage": 0, "inventory": 0},
@@ -285,51 +273,30 @@ def calculate_region_heatmap(inventory_matrix):
         "其他地区": {"count": 0, "percentage": 0, "inventory": 0}
     }
 
-    total_stores = len(inventory_matrix)
+    total_stores = len(matrix)
     if total_stores == 0:
         return region_stats
 
-    for store_name, store_data in inventory_matrix.items():
-        # 获取店铺区域
-        region = get_store_region(store_name)
-
-        # 确定区域分类
-        if region == "首尔城区":
-            region_key = "首尔圈"
-        elif region == "京畿道地区":
-            region_key = "京畿道圈"
-        elif region == "釜山":
-            region_key = "釜山圈"
-        elif region == "大邱":
-            region_key = "大邱圈"
-        else:
-            region_key = "其他地区"
-
-        # 统计店铺数量
-        region_stats[region_key]["count"] += 1
+    # 店铺区域编码（不在映射表中的店铺归入"其他地区"）
+    region_names = list(region_stats)
+    region_codes = np.array([region_names.index(region_key or "其他地区") for region_key in region_keys])
+    store_counts = np.bincount(region_codes, minlength=len(region_names))
+    store_totals = matrix.stock.sum(axis=1, dtype=np.int64)
+    region_inventory = np.bincount(region_codes, weights=store_totals, minlength=len(region_names))
 
-        # 统计库存总量
-        total_inventory = 0
-        for stock in store_data.values():
-            if stock and str(stock).isdigit():
-                total_inventory += int(stock)
-        region_stats[region_key]["inventory"] += total_inventory
-
-    # 计算百分比
-    for key in region_stats:
-        if total_stores > 0:
-            region_stats[key]["percentage"] = round((region_stats[key]["count"] / total_stores) * 100, 2)
+    for code, key in enumerate(region_names):
+        region_stats[key]["count"] = int(store_counts[code])
+        region_stats[key]["inventory"] = int(region_inventory[code])
+        region_stats[key]["percentage"] = round((region_stats[key]["count"] / total_stores) * 100, 2)
 
     return region_stats
 
 
-def calculate_product_depth_stats(favorites_list, inventory_matrix):
-    """计算产品深度库存统计（包含店铺详情）"""
+def _product_depth_stats(matrix, product_keys, region_keys, simplified_names):
+    """产品深度库存统计"""
     product_stats = {}
 
-    for favorite in favorites_list:
-        product_key = f"{favorite['product_model']} {favorite['color']} {favorite['size']}"
-
+    for product_key in product_keys:
         product_stats[product_key] = {
             "total_inventory": 0,
             "stores_with_stock": 0,
@@ -341,41 +308,89 @@ def calculate_product_depth_stats(favorites_list, inventory_matrix):
             }
         }
 
-        # 统计每个店铺的库存
-        for store_name, products in inventory_matrix.items():
-            if product_key in products:
-                stock = products[product_key]
-                if stock and str(stock).isdigit():
-                    stock_count = int(stock)
-                    if stock_count > 0:
-                        # 更新总统计
-                        product_stats[product_key]["total_inventory"] += stock_count
-                        product_stats[product_key]["stores_with_stock"] += 1
-
-                        # 确定区域
-                        region = get_store_region(store_name)
-                        region_key = map_region_to_key(region)
-
-                        if region_key:
-                            # 简化店铺名称
-                            simplified_name = simplify_store_name(store_name)
-
-                            # 添加店铺详情
-                            product_stats[product_key]["region_distribution"][region_key]["total"] += stock_count
-                            product_stats[product_key]["region_distribution"][region_key]["stores"].append({
-                                "store_name": simplified_name,
-                                "stock": stock_count
-                            })
-
-        # 对每个区域的店铺按库存量降序排序
-        for region_key in product_stats[product_key]["region_distribution"]:
-            product_stats[product_key]["region_distribution"][region_key]["stores"].sort(
-                key=lambda x: x["stock"], reverse=True
-            )
+        column = matrix.column(product_key)
+        in_stock = np.flatnonzero(column > 0)
+        product_stats[product_key]["total_inventory"] = int(column[in_stock].sum())
+        product_stats[product_key]["stores_with_stock"] = int(in_stock.size)
+
+        # 按库存量降序（库存相同保持店铺原顺序）添加店铺详情
+        ordered = in_stock[np.argsort(-column[in_stock], kind="stable")]
+        region_distribution = product_stats[product_key]["region_distribution"]
+        for i in ordered:
+            region_key = region_keys[i]
+            if region_key:
+                stock_count = int(column[i])
+                region_distribution[region_key]["total"] += stock_count
+                region_distribution[region_key]["stores"].append({
+                    "store_name": simplified_names[i],
+                    "stock": stock_count
+                })
 
     return product_stats
 
 
+def _key_store_analysis(matrix, product_keys, key_stores):
+    """重点关注店铺库存分析"""
+    columns = np.array([matrix.product_index.get(key, -1) for key in product_keys], dtype=np.intp)
+    known = columns >= 0
+
+    result = {}
+
+    # 为每个重点关注店铺创建产品库存列表
+    for store_name in key_stores:
+        i = matrix.store_index.get(store_name)
+        if i is None:
+            # 如果店铺不在库存矩阵中，创建空列表
+            result[store_name] = []
+            continue
+
+        # 店铺中没有该产品的记录时库存视为0
+        stock_counts = np.zeros(len(product_keys), dtype=np.int32)
+        stock_counts[known] = matrix.stock[i, columns[known]]
+
+        store_products = []
+        for product_key, stock_count in zip(product_keys, stock_counts.tolist()):
+            if stock_count > 0:
+                # 有库存：显示数量
+                display_text = f"{product_key}({stock_count}件)"
+            else:
+                # 无库存：显示"无"
+                display_text = f"{product_key}(无)"
+
+            store_products.append({
+                "product_key": product_key,
+                "display_text": display_text,
+                "stock_count": stock_count
+            })
+
+        # 按库存量降序排序
+        store_products.sort(key=lambda x: x["stock_count"], reverse=True)
+        result[store_name] = store_products
+
+    return result
+
+
+def calculate_stock_status_distribution(inventory_matrix):
+    """计算库存状态分布"""
+    matrix = as_inventory_matrix(inventory_matrix)
+    return _stock_status_distribution(matrix, matrix.stock > 0)
+
+
+def calculate_region_heatmap(inventory_matrix):
+    """计算区域库存热力图数据"""
+    matrix = as_inventory_matrix(inventory_matrix)
+    return _region_heatmap(matrix, _store_region_keys(matrix))
+
+
+def calculate_product_depth_stats(favorites_list, inventory_matrix):
+    """计算产品深度库存统计（包含店铺详情）"""
+    matrix = as_inventory_matrix(inventory_matrix)
+    simplified_names = [store_registry.get(store_name).simple_name for store_name in matrix.stores]
+    return _product_depth_stats(
+        matrix, _favorite_product_keys(favorites_list), _store_region_keys(matrix), simplified_names
+    )
+
+
 def calculate_key_store_analysis(favorites_list, inventory_matrix, key_stores=None):
     """计算重点关注店铺库存分析
     
@@ -384,57 +399,35 @@ def calculate_key_store_analysis(favorites_list, inventory_matrix, key_stores=No
         inventory_matrix: 库存矩阵
         key_stores: 可选的店铺列表。如果为None，使用默认的重点关注店铺列表
     """
-    # 如果没有提供店铺列表，使用默认的重点关注店铺列表
-    if key_stores is None:
-        key_stores = [
-            "始祖鸟新世界百货总店", "始祖鸟新世界百货江南店", "始祖鸟新世界百货Centum City店",
-            "始祖鸟乐天百货总店", "始祖鸟旗舰店江南", "始祖鸟釜山店",
-            "始祖鸟骊州Premium Village店", "始祖鸟The Hyundai首尔", "始祖鸟旗舰店大邱寿城",
-            "始祖鸟现代百货板桥店", "始祖鸟钟路店"
-        ]
+    matrix = as_inventory_matrix(inventory_matrix)
+    return _key_store_analysis(
+        matrix, _favorite_product_keys(favorites_list),
+        DEFAULT_KEY_STORES if key_stores is None else key_stores
+    )
 
-    result = {}
 
-    # 为每个重点关注店铺创建产品库存列表
-    for store_name in key_stores:
-        if store_name in inventory_matrix:
-            store_products = []
-
-            # 遍历所有收藏产品
-            for favorite in favorites_list:
-                product_key = f"{favorite['product_model']} {favorite['color']} {favorite['size']}"
-
-                if product_key in inventory_matrix[store_name]:
-                    stock = inventory_matrix[store_name][product_key]
-                    if stock and str(stock).isdigit():
-                        stock_count = int(stock)
-                        if stock_count > 0:
-                            # 有库存：显示数量
-                            display_text = f"{product_key}({stock_count}件)"
-                        else:
-                            # 无库存：显示"无"
-                            display_text = f"{product_key}(无)"
-                    else:
-                        # 库存信息异常或无库存
-                        display_text = f"{product_key}(无)"
-                else:
-                    # 店铺中没有该产品的记录
-                    display_text = f"{product_key}(无)"
-
-                store_products.append({
-                    "product_key": product_key,
-                    "display_text": display_text,
-                    "stock_count": int(stock) if stock and str(stock).isdigit() else 0
-                })
+def compute_inventory_analytics(favorites_list, inventory_matrix, key_stores=None):
+    """
+    一次性计算库存看板的全部统计（区域、店铺简称、产品键只解析一次）
+
+    Returns:
+        字典: {"stock_status", "region_heatmap", "product_depth", "key_store_analysis"}
+    """
+    matrix = as_inventory_matrix(inventory_matrix)
+    product_keys = _favorite_product_keys(favorites_list)
+    region_keys = _store_region_keys(matrix)
+    simplified_names = [store_registry.get(store_name).simple_name for store_name in matrix.stores]
+
+    return {
+        "stock_status": _stock_status_distribution(matrix, matrix.stock > 0),
+        "region_heatmap": _region_heatmap(matrix, region_keys),
+        "product_depth": _product_depth_stats(matrix, product_keys, region_keys, simplified_names),
+        "key_store_analysis": _key_store_analysis(
+            matrix, product_keys, DEFAULT_KEY_STORES if key_stores is None else key_stores
+        )
+    }
 
-            # 按库存量降序排序
-            store_products.sort(key=lambda x: x["stock_count"], reverse=True)
-            result[store_name] = store_products
-        else:
-            # 如果店铺不在库存矩阵中，创建空列表
-            result[store_name] = []
 
-    return result
 def calculate_enhanced_inventory_stats(inventory_matrix):
     """计算增强版库存统计（替换原有的calculate_inventory_stats）"""
     return {
@@ -443,15 +436,33 @@ def calculate_enhanced_inventory_stats(inventory_matrix):
     }
 
 
-import concurrent.futures
-import time
 from typing import List, Dict, Any
 
 
+def _revalidate_in_background(product_ids, timeout_per_request=10):
+    """后台刷新过期的库存缓存（不阻塞当前请求）"""
+    claimed = stock_cache.begin_refresh(product_ids)
+    if not claimed:
+        return
+
+    def refresh():
+        try:
+            outcomes = stock_engine.query_many(claimed, concurrency=len(claimed), timeout=timeout_per_request)
+            for product_id, outcome in outcomes.items():
+                if outcome and not isinstance(outcome, Exception):
+                    stock_cache.put(product_id, outcome)
+        except Exception as e:
+            print(f"后台刷新库存缓存失败: {e}")
+        finally:
+            stock_cache.end_refresh(claimed)
+
+    threading.Thread(target=refresh, name="stock-cache-refresh", daemon=True).start()
+
+
 def batch_query_stock_concurrent(product_ids: List[str], max_workers: int = 3, timeout_per_request: int = 10) -> Dict[
     str, Any]:
     """
-    并发批量查询库存（稳定可靠版本）
+    并发批量查询库存（异步引擎版本）
 
     Args:
         product_ids: 产品ID列表
@@ -468,50 +479,78 @@ def batch_query_stock_concurrent(product_ids: List[str], max_workers: int = 3, t
     if not product_ids:
         return {}, {"success": 0, "failed": 0, "failed_details": []}
 
-    if max_workers > 10:  # 安全限制，最大并发数不超过10
-        max_workers = 10
+    if max_workers > MAX_CONCURRENCY:  # 安全限制，最大并发数不超过连接池上限
+        max_workers = MAX_CONCURRENCY
 
-    print(f"开始并发查询 {len(product_ids)} 个产品，并发数: {max_workers}")
     start_time = time.time()
 
-    try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有查询任务
-            future_to_id = {
-                executor.submit(query_stock_by_product_id, pid): pid
-                for pid in product_ids
-            }
+    # 先从共享缓存取数：新鲜数据直接使用，过期数据先使用再后台刷新
+    pending_ids = []
+    stale_ids = []
+    for product_id in product_ids:
+        rows, state = stock_cache.lookup(product_id)
+        if state == FRESH or state == STALE:
+            results[product_id] = rows
+            if state == STALE:
+                stale_ids.append(product_id)
+        else:
+            pending_ids.append(product_id)
+    cache_hits = len(results)
+
+    if stale_ids:
+        _revalidate_in_background(stale_ids, timeout_per_request)
 
-            # 处理完成的任务
-            for future in concurrent.futures.as_completed(future_to_id):
-                product_id = future_to_id[future]
-                try:
-                    # 设置单个请求超时
-                    stock_data = future.result(timeout=timeout_per_request)
-                    if stock_data:
-                        results[product_id] = stock_data
-                        print(f"✓ 成功查询产品 {product_id}")
-                    else:
-                        failed_queries.append((product_id, "返回空数据"))
-                        print(f"⚠ 产品 {product_id} 返回空数据")
-
-                except concurrent.futures.TimeoutError:
-                    failed_queries.append((product_id, "请求超时"))
-                    print(f"⏰ 产品 {product_id} 查询超时")
-                except Exception as e:
-                    failed_queries.append((product_id, str(e)))
-                    print(f"❌ 产品 {product_id} 查询失败: {e}")
+    print(f"开始并发查询 {len(pending_ids)} 个产品（缓存命中 {cache_hits} 个），"
+          f"并发数: {min(max_workers, api_governor.concurrency_limit)}")
 
+    try:
+        outcomes = stock_engine.query_many(
+            pending_ids,
+            concurrency=max_workers,
+            timeout=timeout_per_request
+        )
     except Exception as e:
-        print(f"并发查询执行器异常: {e}")
+        print(f"异步查询引擎异常: {e}")
         # 回退到串行查询
-        serial_results = fallback_serial_query(product_ids)
-        return serial_results, {
-            "success": len(serial_results),
-            "failed": len(product_ids) - len(serial_results),
-            "failed_details": []
+        serial_results = fallback_serial_query(pending_ids)
+        results.update(serial_results)
+        return results, {
+            "success": len(results),
+            "failed": len(product_ids) - len(results),
+            "failed_details": [],
+            "cache_hits": cache_hits
         }
 
+    # 整体超时时只返回已完成的产品：只对缺失的产品串行重试
+    missing_ids = [product_id for product_id in pending_ids if product_id not in outcomes]
+    if missing_ids:
+        print(f"对 {len(missing_ids)} 个未完成的产品串行重试")
+        for product_id, rows in fallback_serial_query(missing_ids).items():
+            results[product_id] = rows
+            stock_cache.put(product_id, rows)
+        for product_id in missing_ids:
+            if product_id not in results:
+                failed_queries.append((product_id, "请求超时"))
+
+    # 处理查询结果
+    for product_id, outcome in outcomes.items():
+        if isinstance(outcome, CircuitOpenError):
+            failed_queries.append((product_id, "上游接口熔断中"))
+            print(f"⛔ 产品 {product_id} 未查询（熔断中）")
+        elif isinstance(outcome, asyncio.TimeoutError):
+            failed_queries.append((product_id, "请求超时"))
+            print(f"⏰ 产品 {product_id} 查询超时")
+        elif isinstance(outcome, Exception):
+            failed_queries.append((product_id, str(outcome)))
+            print(f"❌ 产品 {product_id} 查询失败: {outcome}")
+        elif outcome:
+            results[product_id] = outcome
+            stock_cache.put(product_id, outcome)
+            print(f"✓ 成功查询产品 {product_id}")
+        else:
+            failed_queries.append((product_id, "返回空数据"))
+            print(f"⚠ 产品 {product_id} 返回空数据")
+
     # 统计信息
     end_time = time.time()
     duration = round(end_time - start_time, 2)
@@ -529,7 +568,8 @@ def batch_query_stock_concurrent(product_ids: List[str], max_workers: int = 3, t
         "total": len(product_ids),
         "success_rate": round(success_rate, 1),
         "duration": duration,
-        "failed_details": failed_queries
+        "failed_details": failed_queries,
+        "cache_hits": cache_hits
     }
 
     return results, stats
@@ -544,10 +584,7 @@ def fallback_serial_query(product_ids: List[str]) -> Dict[str, Any]:
 
     for i, pid in enumerate(product_ids, 1):
         try:
-            # 添加延迟避免请求过快
-            if i > 1:
-                time.sleep(0.5)
-
+            # 请求节奏由共享流控（令牌桶）控制，无需固定延迟
             stock_data = query_stock_by_product_id(pid)
             if stock_data:
                 results[pid] = stock_data
@@ -561,10 +598,11 @@ def fallback_serial_query(product_ids: List[str]) -> Dict[str, Any]:
     return results
 
 
-def safe_batch_query(favorites_list, max_workers=None):
+def safe_batch_query(favorites_list, max_workers=None, checkpoint=None, on_chunk=None):
     """
     安全的批量查询入口函数
     包含各种边界条件检查和保护措施
+    不限制查询数量，超过单批上限时自动分批查询（参见 get_inventory_matrix_transposed）
     
     Returns:
         元组: (库存矩阵, 查询统计信息)
@@ -587,12 +625,6 @@ def safe_batch_query(favorites_list, max_workers=None):
         print("错误: 没有有效的SKU可供查询")
         return {}, {"success": 0, "failed": 0, "failed_details": []}
 
-    # 限制最大查询数量（安全限制）
-    MAX_QUERY_LIMIT = 50
-    if len(valid_favorites) > MAX_QUERY_LIMIT:
-        print("警告: 查询数量超过限制 " + str(MAX_QUERY_LIMIT) + "，进行截断")
-        valid_favorites = valid_favorites[:MAX_QUERY_LIMIT]
-
     # 动态计算并发数（保守策略）
     if max_workers is None:
         if len(valid_favorites) <= 2:
@@ -605,4 +637,4 @@ def safe_batch_query(favorites_list, max_workers=None):
     print("安全查询配置: " + str(len(valid_favorites)) + "个产品, 并发数: " + str(max_workers))
 
     # 执行查询
-    return get_inventory_matrix_transposed(valid_favorites)
\ No newline at end of file
+    return get_inventory_matrix_transposed(valid_favorites, checkpoint=checkpoint, on_chunk=on_chunk)
\ No newline at end of file
@@ -0,0 +1,129 @@
+# inventory_matrix.py
+import itertools
+from collections.abc import Mapping
+
+import numpy as np
+
+
+def parse_stock(value):
+    """将接口返回的库存值转换为整数（非数字视为0）"""
+    if value and str(value).isdigit():
+        return int(value)
+    return 0
+
+
+# 矩阵版本号：每个矩阵实例唯一（矩阵内容不可变），统计结果可按版本号缓存
+_versions = itertools.count(1)
+
+
+class InventoryMatrix(Mapping):
+    """列式库存矩阵：店铺 × 产品
+
+    - stores / products: 店铺名称和产品键（"型号 颜色 尺码"）列表，下标即整数ID
+    - stock: int32 数组 (店铺数, 产品数)
+    - present: bool 数组，标记接口是否返回了该店铺该产品的记录
+
+    - version: 矩阵版本号（每次查询生成新矩阵，版本号随之变化）
+
+    同时实现 Mapping 接口，matrix[店铺][产品键] 的用法与原来的嵌套字典一致。
+    """
+
+    def __init__(self, stores, products, stock, present):
+        self.stores = list(stores)
+        self.products = list(products)
+        self.store_index = {name: i for i, name in enumerate(self.stores)}
+        self.product_index = {key: j for j, key in enumerate(self.products)}
+        self.stock = np.asarray(stock, dtype=np.int32)
+        self.present = np.asarray(present, dtype=bool)
+        self.version = next(_versions)
+        self._rows = {}
+
+    @classmethod
+    def from_cells(cls, cells, products=None, stores=None):
+        """
+        从 (店铺, 产品键, 库存) 三元组构建矩阵
+
+        Args:
+            cells: 可迭代的 (store_name, product_key, stock) 三元组
+            products: 可选的产品键顺序（没有任何库存记录的产品也会保留一列）
+            stores: 可选的店铺顺序（没有任何库存记录的店铺也会保留一行）
+        """
+        store_index = {name: i for i, name in enumerate(dict.fromkeys(stores or []))}
+        product_index = {key: j for j, key in enumerate(dict.fromkeys(products or []))}
+        rows, cols, values = [], [], []
+
+        for store_name, product_key, stock in cells:
+            i = store_index.setdefault(store_name, len(store_index))
+            j = product_index.setdefault(product_key, len(product_index))
+            rows.append(i)
+            cols.append(j)
+            values.append(parse_stock(stock))
+
+        stock = np.zeros((len(store_index), len(product_index)), dtype=np.int32)
+        present = np.zeros(stock.shape, dtype=bool)
+        if rows:
+            stock[rows, cols] = values
+            present[rows, cols] = True
+        return cls(store_index, product_index, stock, present)
+
+    @classmethod
+    def from_dict(cls, inventory_data, products=None):
+        """从嵌套字典 {店铺: {产品键: 库存}} 构建矩阵"""
+        if isinstance(inventory_data, InventoryMatrix):
+            return inventory_data
+        cells = (
+            (store_name, product_key, stock)
+            for store_name, store_products in inventory_data.items()
+            for product_key, stock in store_products.items()
+        )
+        return cls.from_cells(cells, products=products, stores=list(inventory_data))
+
+    def to_dict(self):
+        """转换为嵌套字典 {店铺: {产品键: 库存}}"""
+        return {store_name: dict(self[store_name]) for store_name in self.stores}
+
+    def stock_at(self, store_name, product_key, default=0):
+        """查询单个店铺单个产品的库存"""
+        i = self.store_index.get(store_name)
+        j = self.product_index.get(product_key)
+        if i is None or j is None or not self.present[i, j]:
+            return default
+        return int(self.stock[i, j])
+
+    def column(self, product_key):
+        """产品在所有店铺的库存列（无记录视为0）"""
+        j = self.product_index.get(product_key)
+        if j is None:
+            return np.zeros(len(self.stores), dtype=np.int32)
+        return self.stock[:, j]
+
+    # Mapping 接口：按店铺返回 {产品键: 库存}（只包含接口返回过的产品）
+    def __getitem__(self, store_name):
+        row = self._rows.get(store_name)
+        if row is None:
+            i = self.store_index[store_name]
+            columns = np.flatnonzero(self.present[i])
+            row = {self.products[j]: int(self.stock[i, j]) for j in columns}
+            self._rows[store_name] = row
+        return row
+
+    def __iter__(self):
+        return iter(self.stores)
+
+    def __len__(self):
+        return len(self.stores)
+
+    def __contains__(self, store_name):
+        return store_name in self.store_index
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_rows"] = {}
+        return state
+
+
+def as_inventory_matrix(inventory_matrix):
+    """兼容旧的嵌套字典库存矩阵"""
+    if inventory_matrix is None:
+        return InventoryMatrix.from_cells([])
+    return InventoryMatrix.from_dict(inventory_matrix)
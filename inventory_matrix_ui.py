@@ -3,16 +3,159 @@ import pandas as pd
 import time
 from inventory_check import (
     safe_batch_query,
-    calculate_enhanced_inventory_stats,
-    calculate_product_depth_stats,
-    calculate_key_store_analysis,
+    compute_inventory_analytics,
     STORE_REGION_MAPPING
 )
-from filter_utils import apply_filters_and_sort, convert_to_excel
-from favorites_manager import load_favorites
-from purchase_plan_manager import add_to_plan, check_product_in_plan
+from inventory_matrix import as_inventory_matrix
+from filter_utils import apply_filters_and_sort
+from export_utils import EXPORT_FORMATS, available_formats, get_cached_export
+from rerun_context import get_context
+from purchase_plan_manager import add_to_plan, plan_item_from_favorite
+from plan_optimizer import optimize_plan
 from followed_stores_manager import get_followed_store_names
 from calculation_utils import convert_krw_to_cny
+from ui_fragments import fragment, rerun_fragment
+
+
+def get_inventory_analytics(favorites, inventory_matrix, key_stores=None):
+    """获取库存看板统计（按矩阵版本、收藏列表和关注店铺缓存，切换标签页不重复计算）"""
+    cache_key = (
+        inventory_matrix.version,
+        tuple((fav['product_model'], fav['color'], fav['size']) for fav in favorites),
+        tuple(key_stores) if key_stores else None
+    )
+
+    cached = st.session_state.get("inventory_analytics_cache")
+    if cached and cached[0] == cache_key:
+        return cached[1]
+
+    analytics = compute_inventory_analytics(favorites, inventory_matrix, key_stores=key_stores)
+    st.session_state.inventory_analytics_cache = (cache_key, analytics)
+    return analytics
+
+
+def show_plan_optimizer(favorites, inventory_matrix, followed_stores):
+    """智能分配购买计划：为每个收藏产品选择有库存的店铺，使总实付最低"""
+    ctx = get_context()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        store_penalty = st.number_input(
+            "每多去一家店的额外成本（韩元）",
+            min_value=0,
+            value=0,
+            step=10000,
+            key="plan_optimizer_penalty",
+            help="大于0时会尽量减少需要去的店铺数"
+        )
+    with col2:
+        only_followed = st.checkbox(
+            "只分配到关注店铺",
+            value=False,
+            key="plan_optimizer_only_followed",
+            disabled=not followed_stores
+        )
+
+    candidate_stores = followed_stores if only_followed and followed_stores else None
+    cache_key = (
+        inventory_matrix.version,
+        tuple((fav['product_model'], fav['color'], fav['size']) for fav in favorites),
+        store_penalty,
+        tuple(candidate_stores) if candidate_stores else None
+    )
+
+    if st.button("🧭 计算分配方案", key="plan_optimizer_run"):
+        with st.spinner("正在计算分配方案..."):
+            result = optimize_plan(favorites, inventory_matrix, store_penalty_krw=store_penalty,
+                                   candidate_stores=candidate_stores)
+        st.session_state.plan_optimizer_result = (cache_key, result)
+
+    # 库存、收藏或参数变化后，之前的方案失效
+    cached = st.session_state.get("plan_optimizer_result")
+    if not cached or cached[0] != cache_key:
+        return
+    result = cached[1]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        cny = convert_krw_to_cny(result['final_payment'])
+        st.metric("预计总实付", f"{result['final_payment']:,.0f}韩元" + (f" / {cny:,}人民币" if cny else ""))
+    with col2:
+        st.metric("需要去的店铺", f"{result['store_count']}家")
+
+    for store_name, store in result['stores'].items():
+        discounts = "、".join(store['discounts']) if store['discounts'] else "仅退税"
+        st.write(f"**{store_name}**（{discounts}）: 税前 {store['total_krw']:,}韩元 → 实付 {store['final_payment']:,.0f}韩元")
+        for favorite in store['products']:
+            st.write(f"- {favorite['product_model']} - {favorite['color']} - {favorite['size']} - {int(favorite['price']):,}韩元")
+
+    if result['unassigned']:
+        st.warning("⚠️ 以下产品没有任何店铺有库存: " + "、".join(
+            f"{fav['product_model']} {fav['color']} {fav['size']}" for fav in result['unassigned']
+        ))
+
+    if result['stores'] and st.button("📝 写入购买计划", key="plan_optimizer_apply"):
+        added = 0
+        for store_name, store in result['stores'].items():
+            for favorite in store['products']:
+                if ctx.plan_index.contains(favorite['product_model'], favorite['color'], favorite['size'], store_name):
+                    continue
+                if add_to_plan(store_name, plan_item_from_favorite(favorite)):
+                    added += 1
+        ctx.invalidate("plans")
+        st.success(f"✅ 已将 {added} 个产品写入购买计划")
+
+
+@fragment
+def show_key_store_card(store_name, products):
+    """显示单个关注店铺的库存情况（可折叠的产品列表，有库存的产品可加入购买计划）"""
+    ctx = get_context()
+
+    if products:
+        # 创建两列布局：店铺名称在左，库存详情在右（可折叠）
+        col1, col2 = st.columns([1, 3])
+
+        with col1:
+            # 店铺名称始终显示（不折叠）
+            st.write(f"**{store_name}**")
+
+        with col2:
+            # 库存详情可折叠
+            with st.expander(f"查看库存详情", expanded=False):
+                # 显示所有产品的库存状态
+                for product in products:
+                    st.write(f"• {product['display_text']}")
+
+                    # 只有有库存的产品才能加入购买计划
+                    if product['stock_count'] > 0:
+                        # 从product_key中解析product_model、color、size
+                        product_key_parts = product['product_key'].rsplit(' ', 2)
+                        if len(product_key_parts) == 3:
+                            product_model, color, size = product_key_parts
+
+                            # 从收藏索引中查找对应的favorite对象
+                            favorite = ctx.find_favorite(product_model, color, size)
+
+                            if favorite and ctx.plan_index.contains(product_model, color, size, store_name):
+                                st.caption(f"✓ 已在 {store_name} 的购买计划中")
+                            elif favorite:
+                                if st.button("加入购买计划", key=f"add_plan_matrix_{store_name}_{product_model}_{color}_{size}"):
+                                    if add_to_plan(store_name, plan_item_from_favorite(favorite)):
+                                        ctx.invalidate("plans")
+                                        st.success(f"✅ 已添加到 {store_name} 的购买计划")
+                                        rerun_fragment()
+                                    else:
+                                        st.error(f"❌ 添加到 {store_name} 的购买计划失败")
+
+    else:
+        # 如果店铺没有相关产品数据
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            st.write(f"**{store_name}**")
+        with col2:
+            st.write("该店铺无相关产品库存数据")
+
+    st.divider()
 
 
 def show_inventory_matrix_tab():
@@ -33,8 +176,9 @@ def show_inventory_matrix_tab():
     if "query_stats" not in st.session_state:
         st.session_state.query_stats = None
 
-    # 加载收藏产品列表
-    favorites = load_favorites()
+    # 加载收藏产品列表（同一次重跑内共享）
+    ctx = get_context()
+    favorites = ctx.favorites
 
     if not favorites:
         st.info("📌 提示：暂无收藏产品。请先在【收藏产品】标签页添加收藏产品。")
@@ -54,8 +198,31 @@ def show_inventory_matrix_tab():
                 progress_text = st.empty()
                 progress_text.info(f"开始查询所有 {len(favorites)} 个产品的库存...")
 
-                # 实际执行查询（查询所有收藏产品）
-                inventory_matrix, query_stats = safe_batch_query(favorites)
+                # 分批查询时实时展示部分结果（每完成一批刷新一次表格）
+                progress_bar = st.progress(0)
+                partial_table = st.empty()
+
+                def show_partial_matrix(partial_matrix, progress):
+                    progress_bar.progress(progress["done"] / progress["total"])
+                    progress_text.info(
+                        f"正在查询库存... {progress['done']}/{progress['total']} 个产品，"
+                        f"成功 {progress['success']}个 | 失败 {progress['failed']}个 | "
+                        f"已获取 {len(partial_matrix)} 个店铺"
+                    )
+                    if partial_matrix:
+                        partial_table.dataframe(
+                            pd.DataFrame.from_dict(partial_matrix, orient='index'),
+                            use_container_width=True, height=300
+                        )
+
+                # 实际执行查询（查询所有收藏产品，中断后可从断点继续）
+                inventory_matrix, query_stats = safe_batch_query(
+                    favorites,
+                    checkpoint=st.session_state.setdefault("inventory_checkpoint", {}),
+                    on_chunk=show_partial_matrix
+                )
+                progress_bar.empty()
+                partial_table.empty()
 
                 if inventory_matrix:
                     st.session_state.inventory_matrix_queried = True
@@ -118,12 +285,16 @@ def show_inventory_matrix_tab():
     if st.session_state.inventory_matrix_queried and st.session_state.inventory_matrix_data:
         st.info("📊 当前显示所有收藏产品的库存矩阵")
 
-        # 获取缓存的库存矩阵
-        inventory_matrix = st.session_state.inventory_matrix_data
+        # 获取缓存的库存矩阵（兼容旧版本保存的嵌套字典）
+        inventory_matrix = as_inventory_matrix(st.session_state.inventory_matrix_data)
+        st.session_state.inventory_matrix_data = inventory_matrix
 
         if inventory_matrix:
-            # 使用新的统计函数
-            stats = calculate_enhanced_inventory_stats(inventory_matrix)
+            # 获取用户关注的店铺列表（未关注任何店铺时使用默认的重点关注店铺）
+            followed_stores = get_followed_store_names()
+
+            # 一次性计算全部统计（按矩阵版本缓存）
+            stats = get_inventory_analytics(favorites, inventory_matrix, key_stores=followed_stores or None)
 
             # 显示实时库存状态分布
             st.subheader("📊 库存状态分布")
@@ -149,83 +320,18 @@ def show_inventory_matrix_tab():
             # 先显示重点关注店铺分析
             st.subheader("🏪🏪 关注店铺库存分析")
 
-            # 获取用户关注的店铺列表
-            followed_stores = get_followed_store_names()
-            
             # 如果用户没有关注任何店铺，提示用户
             if not followed_stores:
                 st.info("💡 提示：在\"关注店铺\"标签页中添加关注店铺，以在此显示库存分析")
-                # 使用默认的重点关注店铺进行分析
-                key_store_analysis = calculate_key_store_analysis(favorites, inventory_matrix)
-            else:
-                # 使用用户关注的店铺进行分析
-                key_store_analysis = calculate_key_store_analysis(favorites, inventory_matrix, key_stores=followed_stores)
+            key_store_analysis = stats['key_store_analysis']
 
-            # 显示每个重点关注店铺的库存情况
+            # 显示每个重点关注店铺的库存情况（每个店铺为独立片段，加入购买计划只重跑该店铺）
             for store_name, products in key_store_analysis.items():
-                if products:
-                    # 创建两列布局：店铺名称在左，库存详情在右（可折叠）
-                    col1, col2 = st.columns([1, 3])
-
-                    with col1:
-                        # 店铺名称始终显示（不折叠）
-                        st.write(f"**{store_name}**")
-
-                    with col2:
-                        # 库存详情可折叠
-                        with st.expander(f"查看库存详情", expanded=False):
-                            # 显示所有产品的库存状态
-                            for product in products:
-                                st.write(f"• {product['display_text']}")
-                                
-                                # 只有有库存的产品才能加入购买计划
-                                if product['stock_count'] > 0:
-                                    # 从product_key中解析product_model、color、size
-                                    product_key_parts = product['product_key'].rsplit(' ', 2)
-                                    if len(product_key_parts) == 3:
-                                        product_model, color, size = product_key_parts
-                                        
-                                        # 从favorites中查找对应的favorite对象
-                                        favorite = None
-                                        for fav in favorites:
-                                            if (fav['product_model'] == product_model and 
-                                                fav['color'] == color and 
-                                                fav['size'] == size):
-                                                favorite = fav
-                                                break
-                                        
-                                        if favorite:
-                                            if st.button("加入购买计划", key=f"add_plan_matrix_{store_name}_{product_model}_{color}_{size}"):
-                                                # 准备产品信息
-                                                product_info = {
-                                                    "product_model": favorite['product_model'],
-                                                    "exact_model": favorite.get('exact_model', ''),
-                                                    "color": favorite['color'],
-                                                    "size": favorite['size'],
-                                                    "price_krw": int(favorite['price']),
-                                                    "year_info": favorite.get('year_info', ''),
-                                                    "domestic_price_cny": favorite.get('china_price_cny', None)
-                                                }
-                                                
-                                                if add_to_plan(store_name, product_info):
-                                                    st.success(f"✅ 已添加到 {store_name} 的购买计划")
-                                                    st.rerun()
-                                                else:
-                                                    st.error(f"❌ 添加到 {store_name} 的购买计划失败")
-
-                else:
-                    # 如果店铺没有相关产品数据
-                    col1, col2 = st.columns([1, 3])
-                    with col1:
-                        st.write(f"**{store_name}**")
-                    with col2:
-                        st.write("该店铺无相关产品库存数据")
-
-                st.divider()
+                show_key_store_card(store_name, products)
 
             st.subheader("📦📦 产品库存深度分析")
 
-            product_depth_stats = calculate_product_depth_stats(favorites, inventory_matrix)
+            product_depth_stats = stats['product_depth']
 
             for product_key, stats in product_depth_stats.items():
                 with st.expander(f"{product_key} 库存分析"):
@@ -247,6 +353,10 @@ def show_inventory_matrix_tab():
                             for store_info in region_data['stores']:
                                 st.write(f"  - {store_info['store_name']}: {store_info['stock']}件")
 
+            # 智能分配购买计划
+            st.subheader("🧭 智能分配购买计划")
+            show_plan_optimizer(favorites, inventory_matrix, followed_stores)
+
             # 筛选区域
             st.subheader("筛选选项")
             filter_col1, filter_col2, filter_col3, filter_col4 = st.columns([2, 2, 2, 1])
@@ -316,17 +426,30 @@ def show_inventory_matrix_tab():
 
                 st.dataframe(df, use_container_width=True, height=500)
 
-                # Excel下载按钮 - 转换DataFrame为JSON字符串以支持缓存
-                import json
-                df_dict = df.to_dict(orient='index')
-                df_json_str = json.dumps(df_dict, default=str)
-                excel_data = convert_to_excel(df_json_str)
-                st.download_button(
-                    label="下载库存数据(Excel)",
-                    data=excel_data,
-                    file_name="inventory_report.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                # 下载按钮 - 只生成所选格式，按矩阵版本和筛选条件缓存
+                export_col1, export_col2 = st.columns([1, 3])
+                with export_col1:
+                    export_format = st.selectbox(
+                        "导出格式",
+                        available_formats(),
+                        format_func=lambda fmt: EXPORT_FORMATS[fmt][0],
+                        key="inventory_export_format"
+                    )
+                label, extension, mime = EXPORT_FORMATS[export_format]
+                export_data = get_cached_export(
+                    inventory_matrix,
+                    (stock_filter, region_filter, sort_option),
+                    list(filtered_matrix.keys()),
+                    export_format
                 )
+                with export_col2:
+                    st.write("")  # 空行用于对齐
+                    st.download_button(
+                        label=f"下载库存数据({label})",
+                        data=export_data,
+                        file_name=f"inventory_report.{extension}",
+                        mime=mime
+                    )
             else:
                 st.warning("没有找到符合筛选条件的店铺")
         else:
@@ -3,10 +3,9 @@ import streamlit as st
 from discount_config import DISCOUNT_CONFIG
 import pandas as pd
 from product_search import generate_api_url, extract_product_ids_from_api
-from product_detail import extract_product_details, get_product_variants, get_sku_info
-from favorites_manager import load_favorites, add_to_favorites, remove_from_favorites
+from product_detail import extract_product_details, get_product_variants, get_sku_info, prefetch_product_infos
+from favorites_manager import add_to_favorites, remove_favorite_by_id
 from utils import standardize_model_name
-from favorites_manager import add_to_favorites
 # 确保导入以下函数
 from inventory_check import (
     query_stock_by_product_id,
@@ -21,19 +20,22 @@ from inventory_check import (
 import re
 import hashlib
 # 新增filter_utils的导入
-from filter_utils import apply_filters_and_sort, convert_to_excel
+from filter_utils import apply_filters_and_sort
 from exchange_rate import get_exchange_rate  # 新增导入
 # 在 main.py 的导入语句之后，main() 函数之前添加：
 from cache_manager import product_cache
 from product_detail import extract_product_details, get_product_variants
 # 新增购买计划相关导入
-from purchase_plan_manager import add_to_plan, check_product_in_plan, load_plans
-from plan_display import show_purchase_plan_tab
+from purchase_plan_manager import add_to_plan, plan_item_from_favorite
+from plan_display import show_purchase_plan_tab, show_discount_comparison
 from cache_ui import show_cache_management_tab
 from calculation_utils import calculate_detailed_price, convert_krw_to_cny, calculate_tax_refund
 from followed_stores_ui import show_followed_stores_tab
 from followed_stores_manager import get_followed_store_names
+from image_cache import image_cache
 from inventory_matrix_ui import show_inventory_matrix_tab
+from rerun_context import begin_rerun, get_context
+from ui_fragments import fragment, render_navigation, request_view, rerun_fragment
 def format_string(s):
     """格式化字符串用于URL构造"""
     if not s:
@@ -72,6 +74,41 @@ def format_color(s):
 
     # 重新组合
     return '-'.join(formatted_words)
+def get_product_image_url(color_name, color_options, product_id, exact_model, gender):
+    """
+    产品图片URL：优先使用颜色选项中的 image_chip，没有时按产品ID、型号和颜色构造
+
+    Args:
+        color_name: 颜色名称
+        color_options: 产品颜色选项列表
+        product_id: 产品ID
+        exact_model: 产品型号
+        gender: MALE 或 FEMALE
+    """
+    for color_option in color_options:
+        if color_option.get('name', '').strip() == color_name.strip():
+            image_chip = color_option.get('image_chip', '')
+            if image_chip:
+                return image_chip
+            break
+
+    formatted_model = format_string(exact_model)
+    formatted_color = format_color(color_name)
+    if gender == "FEMALE":
+        return f"https://product.arcteryx.co.kr/images/products/{product_id}/{formatted_model}-W-{formatted_color}.jpg"
+    return f"https://product.arcteryx.co.kr/images/products/{product_id}/{formatted_model}-{formatted_color}.jpg"
+
+
+def prefetch_product_images(product_id, exact_model, gender, color_options):
+    """在后台预取产品全部颜色的色块和产品图片（选择产品后立即调用）"""
+    urls = [color.get('image_chip', '') for color in color_options]
+    urls += [
+        get_product_image_url(color.get('name', ''), color_options, product_id, exact_model, gender)
+        for color in color_options if color.get('name')
+    ]
+    return image_cache.prefetch(urls)
+
+
 def get_current_step():
     """获取当前步骤"""
     if "step_history" not in st.session_state:
@@ -195,9 +232,9 @@ def show_product_selection():
         if st.button("← 返回搜索", key="back_to_search"):
             go_back()
 
-    # 4. 优化产品详情获取流程
+    # 4. 优化产品详情获取流程：已缓存的直接使用，其余并发预取
     product_ids = st.session_state.product_ids
-    product_details = []
+    product_infos = {}
 
     # 优化：添加加载状态指示器
     progress_bar = st.progress(0)
@@ -205,33 +242,28 @@ def show_product_selection():
 
     total_products = len(product_ids)
 
-    for i, pid in enumerate(product_ids):
-        # 更新进度状态
-        progress = (i + 1) / total_products
-        progress_bar.progress(progress)
-        status_text.text(f"正在获取产品信息... ({i + 1}/{total_products})")
+    pending_ids = []
+    for pid in product_ids:
+        full_info = product_cache.get(f"product_detail_{pid}")
+        if full_info:
+            product_infos[pid] = (full_info["details"], full_info)
+        else:
+            pending_ids.append(pid)
 
-        detail_url = f"https://arcteryx.co.kr/products/view/{pid}?sc=100"
+    for pid, details, full_info in prefetch_product_infos(pending_ids):
+        if full_info:
+            # 存储完整的缓存信息（会话级LRU缓存，有字节上限）
+            product_cache.put(f"product_detail_{pid}", full_info, product_id=pid)
+        product_infos[pid] = (details, full_info)
 
-        # 优化：添加缓存机制（如果可用）
-        cache_key = f"product_detail_{pid}"
-        if cache_key in st.session_state:
-            full_info = st.session_state[cache_key]
-            details = full_info["details"]
-        else:
-            details = extract_product_details(detail_url)
-            color_options, size_options = get_product_variants(detail_url)
-            if details and color_options:
-                # 存储完整的缓存信息
-                full_info = {
-                    "details": details,
-                    "color_options": color_options,
-                    "size_options": size_options,
-                    "detail_url": detail_url
-                }
-                st.session_state[cache_key] = full_info
-            else:
-                full_info = None
+        # 按完成顺序更新进度状态
+        progress_bar.progress(len(product_infos) / total_products)
+        status_text.text(f"正在获取产品信息... ({len(product_infos)}/{total_products})")
+
+    # 按搜索结果顺序整理产品详情
+    product_details = []
+    for pid in product_ids:
+        details, full_info = product_infos.get(pid, (None, None))
         if details:
             product_details.append({
                 "id": pid,
@@ -282,8 +314,7 @@ def show_product_selection():
                     st.session_state.year_info = product["year_info"]
 
                     # 新增：存储完整缓存信息供后续步骤使用
-                    cache_key = f"product_full_info_{product['id']}"
-                    full_info = st.session_state.get(cache_key)
+                    full_info = product_cache.get(f"product_detail_{product['id']}")
 
                     if full_info:
                         # 使用预缓存的完整信息
@@ -305,6 +336,14 @@ def show_product_selection():
                             st.error("无法获取产品颜色选项，请重新选择")
                             return
 
+                    # 在后台预取全部颜色的图片，进入颜色选择和产品详情时从本地读取
+                    prefetch_product_images(
+                        product["id"],
+                        product["exact_model"],
+                        st.session_state.selected_gender,
+                        st.session_state.cached_product_info.get("color_options", [])
+                    )
+
                     # 优化：添加成功反馈
                     st.success(f"✅ 已选择: {product['exact_model']}")
 
@@ -415,7 +454,9 @@ def show_color_selection():
                 print(f"  => 使用单色: {background_style}")
             elif image_chip:
                 # 没有HEX值但有图片：显示图片作为色块
-                background_style = f"background-image: url('{image_chip}'); background-size: cover; background-position: center;"
+                # 本地缓存的色块以 data URI 内嵌（尚未下载完成时退回原图）
+                chip_src = image_cache.data_uri(image_chip, "chip", wait=False) or image_chip
+                background_style = f"background-image: url('{chip_src}'); background-size: cover; background-position: center;"
                 inner_html = ""
                 print(f"  => 使用图片")
             else:
@@ -507,35 +548,20 @@ def show_product_details():
         st.error("无法获取产品SKU信息")
         return
 
-    # 简化的图片获取逻辑：直接从颜色选项中获取image_chip URL
+    # 图片URL：优先使用颜色选项中的image_chip，没有时使用构造URL
     color_options = cached_info.get('color_options', [])
     image_url = None
-    
+
     try:
-        # 从颜色选项中查找匹配的颜色，获取其image_chip URL
-        for color_option in color_options:
-            if color_option.get('name', '').strip() == st.session_state.selected_color.strip():
-                image_chip = color_option.get('image_chip', '')
-                if image_chip:
-                    image_url = image_chip
-                    break
+        image_url = get_product_image_url(
+            st.session_state.selected_color,
+            color_options,
+            st.session_state.selected_product_id,
+            st.session_state.exact_model,
+            st.session_state.selected_gender  # MALE 或 FEMALE
+        )
     except Exception as e:
         pass
-    
-    # 备用方案：如果没有image_chip，使用构造URL
-    if not image_url:
-        try:
-            product_id = st.session_state.selected_product_id
-            formatted_model = format_string(st.session_state.exact_model)
-            formatted_color = format_color(st.session_state.selected_color)
-            gender = st.session_state.selected_gender  # MALE 或 FEMALE
-
-            if gender == "FEMALE":
-                image_url = f"https://product.arcteryx.co.kr/images/products/{product_id}/{formatted_model}-W-{formatted_color}.jpg"
-            else:
-                image_url = f"https://product.arcteryx.co.kr/images/products/{product_id}/{formatted_model}-{formatted_color}.jpg"
-        except Exception as e:
-            pass
 
     st.session_state.product_image_url = image_url
 
@@ -547,7 +573,9 @@ def show_product_details():
         image_url = st.session_state.get('product_image_url')
         if image_url:
             try:
-                st.image(image_url, caption=f"{st.session_state.exact_model} - {st.session_state.selected_color}",
+                # 优先显示本地缓存的图片（不可用时退回原图）
+                st.image(image_cache.get(image_url, "detail") or image_url,
+                         caption=f"{st.session_state.exact_model} - {st.session_state.selected_color}",
                          use_container_width=True)
             except Exception as e:
                 st.error("图片加载失败")
@@ -642,6 +670,7 @@ def show_product_details():
 
                 success, message = add_to_favorites(product_info)
                 if success:
+                    get_context().invalidate("favorites")
                     st.success(message)
                 else:
                     st.error(message)
@@ -668,6 +697,183 @@ def calculate_discount_rate(korea_price_cny, china_price_cny):
     except (ValueError, TypeError, ZeroDivisionError):
         return "暂无"
 
+# 收藏列表每页显示数量选项
+FAVORITES_PAGE_SIZES = (10, 20, 50)
+
+
+def _reset_favorites_page():
+    st.session_state.favorites_page = 1
+
+
+def show_favorites_pager(total):
+    """
+    显示收藏列表分页控件
+
+    Returns:
+        当前页的下标范围 (start, end)
+    """
+    if st.session_state.get("favorites_page_size") not in FAVORITES_PAGE_SIZES:
+        st.session_state.favorites_page_size = FAVORITES_PAGE_SIZES[1]
+    page_size = st.session_state.favorites_page_size
+    page_count = max(1, -(-total // page_size))
+
+    # 收藏减少后页码可能超出范围
+    page = st.session_state.get("favorites_page", 1)
+    if not isinstance(page, int) or not 1 <= page <= page_count:
+        st.session_state.favorites_page = min(max(int(page or 1), 1), page_count)
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        page = st.number_input("页码", min_value=1, max_value=page_count, step=1, key="favorites_page")
+    with col2:
+        st.selectbox("每页显示", FAVORITES_PAGE_SIZES, key="favorites_page_size", on_change=_reset_favorites_page)
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    with col3:
+        st.caption(f"第 {page}/{page_count} 页，显示第 {start + 1}-{end} 个，共 {total} 个收藏")
+    return start, end
+
+
+@fragment
+def show_favorite_row(i, favorite):
+    """显示单个收藏产品（复选框、产品信息、删除、查库存、加入购买计划）"""
+    ctx = get_context()
+
+    # 使用5列布局，第一列为复选框
+    col1, col2, col3, col4, col5 = st.columns([1, 3, 3, 1, 1])
+
+    with col1:
+        # 复选框 - 管理选中状态（选中状态只用于批量操作，勾选时只重跑本行）
+        is_selected = i in st.session_state.selected_favorites
+        new_selected = st.checkbox(
+            "选择",
+            value=is_selected,
+            key=f"fav_checkbox_{i}",
+            label_visibility="collapsed"  # 隐藏标签但保持可访问性
+        )
+        # 如果复选框状态发生变化，更新session_state
+        if new_selected != is_selected:
+            if new_selected:
+                st.session_state.selected_favorites.add(i)
+            else:
+                st.session_state.selected_favorites.discard(i)
+
+    with col2:
+        # 修改显示格式，与产品详情页保持一致
+        exact_model = favorite.get('exact_model', favorite.get('product_model', '未知型号'))
+        year_info = favorite.get('year_info', '未知年份')
+        st.write(f"*{exact_model} - {year_info}*")
+        st.write(f"**颜色:** {favorite['color']} | **尺码:** {favorite['size']}")
+
+        # 价格显示（韩元 + 人民币）
+        krw_price = int(favorite['price'])
+        cny_price = convert_krw_to_cny(krw_price)
+
+        # 与产品详情页相同的价格显示格式
+        st.write(f"**售价:** {krw_price}韩元 / {cny_price}人民币")
+        # 新增：国内售价和折扣
+        china_price = favorite.get('china_price_cny')
+        discount_rate = favorite.get('discount_rate', "暂无")
+
+        if china_price:
+            st.write(f"**国内售价:** {china_price}人民币")
+            st.write(f"**折扣:** {discount_rate}")
+        else:
+            st.write("**国内售价:** 暂无")
+            st.write("**折扣:** 暂无")
+        st.write(f"**SKU:** {favorite['sku']}")
+
+    with col3:
+        # 显示产品图片（可选功能）
+        image_url = favorite.get('image_url')
+        if image_url:
+            try:
+                # 优先显示本地缩略图（尚未下载完成或不可用时退回原图，不阻塞页面渲染）
+                st.image(image_cache.get(image_url, "thumbnail", wait=False) or image_url, width=150)  # 适当缩小图片尺寸
+            except:
+                # 图片加载失败时显示占位符
+                st.write("🖼️ 图片加载失败")
+        else:
+            # 没有图片URL时显示提示
+            st.write("📷 无图片")
+
+    # 操作按钮区域 - 上下两行
+    with col4:
+        # 删除按钮（需要确认）
+        if st.button("删除", key=f"delete_{i}"):
+            if st.session_state.get(f"confirm_delete_{i}", False):
+                success, message = remove_favorite_by_id(favorite['id'])
+                if success:
+                    ctx.invalidate("favorites")
+                    st.success(message)
+                    # 同时从选中状态中移除
+                    st.session_state.selected_favorites.discard(i)
+                    # 收藏列表发生变化（序号改变），重跑整个页面
+                    st.rerun()
+                else:
+                    st.error(message)
+            else:
+                st.session_state[f"confirm_delete_{i}"] = True
+                st.warning("确认删除？")
+
+    with col5:
+        # 单个产品查库存按钮
+        if st.button("查库存", key=f"check_{i}"):
+            stores = query_stock_by_product_id(favorite['sku'])
+            if stores:
+                # 显示库存查询结果
+                st.subheader(f"{favorite['exact_model']} 库存情况")
+                for store in stores:
+                    store_name = translate_store_name(store.get("store_name", ""))
+                    stock_status = get_stock_status(store.get("usable_stock", ""))
+                    st.write(f"{store_name}: {stock_status}")
+            else:
+                st.error("无法获取库存信息")
+
+    # 第二行：加入购买计划按钮
+    col_plan1, col_plan2, col_plan3 = st.columns([1, 3, 3])
+    with col_plan3:
+        # 检查产品在哪些店铺的购买计划中
+        stores_with_product = ctx.stores_for(
+            favorite['product_model'], 
+            favorite['color'], 
+            favorite['size']
+        )
+
+        if stores_with_product:
+            # 显示已添加的店铺列表
+            stores_display = "、".join(stores_with_product)
+            st.info(f"✓ 已在 {stores_display} 的购买计划中")
+
+        # 无论是否已添加，都显示"加入购买计划"按钮，允许在其他店铺添加
+        if st.button("加入购买计划", key=f"add_plan_{i}"):
+            st.session_state[f"show_store_selection_{i}"] = True
+
+        # 显示店铺选择下拉框
+        if st.session_state.get(f"show_store_selection_{i}", False):
+            store_list = sorted(STORE_REGION_MAPPING.keys())
+            selected_store = st.selectbox(
+                f"选择店铺",
+                store_list,
+                key=f"store_select_{i}"
+            )
+
+            col_confirm, col_cancel = st.columns(2)
+            with col_confirm:
+                if st.button("确认", key=f"confirm_add_plan_{i}"):
+                    if add_to_plan(selected_store, plan_item_from_favorite(favorite)):
+                        ctx.invalidate("plans")
+                        st.session_state[f"show_store_selection_{i}"] = False
+                        rerun_fragment()
+
+            with col_cancel:
+                if st.button("取消", key=f"cancel_add_plan_{i}"):
+                    st.session_state[f"show_store_selection_{i}"] = False
+                    rerun_fragment()
+
+    st.divider()
+
+
 def show_favorites_tab():
     """显示收藏产品标签页"""
     # 数据备份机制
@@ -675,8 +881,9 @@ def show_favorites_tab():
         st.session_state.favorites_backup = None
 
     # 在关键操作前备份数据
+    ctx = get_context()
     try:
-        favorites = load_favorites()
+        favorites = ctx.favorites
         st.session_state.favorites_backup = favorites.copy()  # 备份
     except:
         favorites = st.session_state.get("favorites_backup", [])
@@ -712,9 +919,16 @@ def show_favorites_tab():
             progress_text = st.empty()
             progress_text.info(f"开始查询所有 {len(favorites)} 个产品的库存...")
 
-            # 使用安全的并发查询
+            # 使用安全的并发查询（分批进行，中断后可从断点继续）
             from inventory_check import safe_batch_query
-            inventory_matrix, query_stats = safe_batch_query(favorites)
+            inventory_matrix, query_stats = safe_batch_query(
+                favorites,
+                checkpoint=st.session_state.setdefault("inventory_checkpoint", {}),
+                on_chunk=lambda partial, progress: progress_text.info(
+                    f"正在查询库存... {progress['done']}/{progress['total']} 个产品，"
+                    f"已获取 {len(partial)} 个店铺"
+                )
+            )
 
             if inventory_matrix:
                 st.session_state.inventory_queried = True
@@ -737,8 +951,6 @@ def show_favorites_tab():
 
     st.header("⭐ 收藏产品")
 
-    favorites = load_favorites()
-
     if not favorites:
         st.info("暂无收藏产品")
         return
@@ -746,149 +958,12 @@ def show_favorites_tab():
     # 显示选中状态控制行
     st.subheader("收藏列表")
 
-    # 显示收藏列表（每个产品前添加复选框）
-    for i, favorite in enumerate(favorites):
-        # 使用5列布局，第一列为复选框
-        col1, col2, col3, col4, col5 = st.columns([1, 3, 3, 1, 1])
-
-        with col1:
-            # 复选框 - 管理选中状态
-            is_selected = i in st.session_state.selected_favorites
-            new_selected = st.checkbox(
-                "选择",
-                value=is_selected,
-                key=f"fav_checkbox_{i}",
-                label_visibility="collapsed"  # 隐藏标签但保持可访问性
-            )
-            # 如果复选框状态发生变化，更新session_state
-            if new_selected != is_selected:
-                if new_selected:
-                    st.session_state.selected_favorites.add(i)
-                else:
-                    st.session_state.selected_favorites.discard(i)
-                st.rerun()
-
-        with col2:
-            # 修改显示格式，与产品详情页保持一致
-            exact_model = favorite.get('exact_model', favorite.get('product_model', '未知型号'))
-            year_info = favorite.get('year_info', '未知年份')
-            st.write(f"*{exact_model} - {year_info}*")
-            st.write(f"**颜色:** {favorite['color']} | **尺码:** {favorite['size']}")
-
-            # 价格显示（韩元 + 人民币）
-            krw_price = int(favorite['price'])
-            cny_price = convert_krw_to_cny(krw_price)
-
-            # 与产品详情页相同的价格显示格式
-            st.write(f"**售价:** {krw_price}韩元 / {cny_price}人民币")
-            # 新增：国内售价和折扣
-            china_price = favorite.get('china_price_cny')
-            discount_rate = favorite.get('discount_rate', "暂无")
-
-            if china_price:
-                st.write(f"**国内售价:** {china_price}人民币")
-                st.write(f"**折扣:** {discount_rate}")
-            else:
-                st.write("**国内售价:** 暂无")
-                st.write("**折扣:** 暂无")
-            st.write(f"**SKU:** {favorite['sku']}")
-
-        with col3:
-            # 显示产品图片（可选功能）
-            image_url = favorite.get('image_url')
-            if image_url:
-                try:
-                    st.image(image_url, width=150)  # 适当缩小图片尺寸
-                except:
-                    # 图片加载失败时显示占位符
-                    st.write("🖼️ 图片加载失败")
-            else:
-                # 没有图片URL时显示提示
-                st.write("📷 无图片")
-
-        # 操作按钮区域 - 上下两行
-        with col4:
-            # 删除按钮（需要确认）
-            if st.button("删除", key=f"delete_{i}"):
-                if st.session_state.get(f"confirm_delete_{i}", False):
-                    success, message = remove_from_favorites(i)
-                    if success:
-                        st.success(message)
-                        # 同时从选中状态中移除
-                        st.session_state.selected_favorites.discard(i)
-                        st.rerun()
-                    else:
-                        st.error(message)
-                else:
-                    st.session_state[f"confirm_delete_{i}"] = True
-                    st.warning("确认删除？")
-
-        with col5:
-            # 单个产品查库存按钮
-            if st.button("查库存", key=f"check_{i}"):
-                stores = query_stock_by_product_id(favorite['sku'])
-                if stores:
-                    # 显示库存查询结果
-                    st.subheader(f"{favorite['exact_model']} 库存情况")
-                    for store in stores:
-                        store_name = translate_store_name(store.get("store_name", ""))
-                        stock_status = get_stock_status(store.get("usable_stock", ""))
-                        st.write(f"{store_name}: {stock_status}")
-                else:
-                    st.error("无法获取库存信息")
-
-        # 第二行：加入购买计划按钮
-        col_plan1, col_plan2, col_plan3 = st.columns([1, 3, 3])
-        with col_plan3:
-            # 检查产品在哪些店铺的购买计划中
-            is_in_plan, stores_with_product = check_product_in_plan(
-                favorite['product_model'], 
-                favorite['color'], 
-                favorite['size']
-            )
-            
-            if is_in_plan and stores_with_product:
-                # 显示已添加的店铺列表
-                stores_display = "、".join(stores_with_product) if isinstance(stores_with_product, list) else stores_with_product
-                st.info(f"✓ 已在 {stores_display} 的购买计划中")
-            
-            # 无论是否已添加，都显示"加入购买计划"按钮，允许在其他店铺添加
-            if st.button("加入购买计划", key=f"add_plan_{i}"):
-                st.session_state[f"show_store_selection_{i}"] = True
-            
-            # 显示店铺选择下拉框
-            if st.session_state.get(f"show_store_selection_{i}", False):
-                store_list = sorted(STORE_REGION_MAPPING.keys())
-                selected_store = st.selectbox(
-                    f"选择店铺",
-                    store_list,
-                    key=f"store_select_{i}"
-                )
-                
-                col_confirm, col_cancel = st.columns(2)
-                with col_confirm:
-                    if st.button("确认", key=f"confirm_add_plan_{i}"):
-                        # 准备产品信息
-                        product_info = {
-                            "product_model": favorite['product_model'],
-                            "exact_model": favorite.get('exact_model', ''),
-                            "color": favorite['color'],
-                            "size": favorite['size'],
-                            "price_krw": int(favorite['price']),
-                            "year_info": favorite.get('year_info', ''),
-                            "domestic_price_cny": favorite.get('china_price_cny', None)
-                        }
-                        
-                        if add_to_plan(selected_store, product_info):
-                            st.session_state[f"show_store_selection_{i}"] = False
-                            st.rerun()
-                
-                with col_cancel:
-                    if st.button("取消", key=f"cancel_add_plan_{i}"):
-                        st.session_state[f"show_store_selection_{i}"] = False
-                        st.rerun()
-
-        st.divider()
+    # 分页显示收藏列表（只渲染当前页；每行为独立片段，勾选、查库存、加入购买计划等操作只重跑该行）
+    start, end = show_favorites_pager(len(favorites))
+    # 在后台预取当前页图片（首次显示原图，下载完成后的重跑显示本地缩略图）
+    image_cache.prefetch([favorite.get('image_url') for favorite in favorites[start:end]])
+    for i in range(start, end):
+        show_favorite_row(i, favorites[i])
 
     # 初始化session_state
     if "show_calculation" not in st.session_state:
@@ -912,8 +987,15 @@ def show_favorites_tab():
                 progress_text = st.empty()
                 progress_text.info("开始安全并发查询 " + str(len(selected_favorites)) + " 个产品...")
 
-                # 使用安全的并发查询
-                inventory_matrix = safe_batch_query(selected_favorites)
+                # 使用安全的并发查询（分批进行，中断后可从断点继续）
+                inventory_matrix, query_stats = safe_batch_query(
+                    selected_favorites,
+                    checkpoint=st.session_state.setdefault("inventory_checkpoint", {}),
+                    on_chunk=lambda partial, progress: progress_text.info(
+                        f"正在查询库存... {progress['done']}/{progress['total']} 个产品，"
+                        f"已获取 {len(partial)} 个店铺"
+                    )
+                )
 
                 if inventory_matrix:
                     st.session_state.inventory_queried = True
@@ -1009,6 +1091,11 @@ def show_calculation_config_window(selected_products):
         if selected:
             selected_discounts.append(option)
 
+    # 全部商家优惠组合对比
+    if total_krw > 0:
+        with st.expander("📊 全部商家优惠组合对比", expanded=False):
+            show_discount_comparison(total_krw, store_options)
+
     # 按钮布局
     col1, col2 = st.columns(2)
 
@@ -1189,53 +1276,40 @@ def display_calculation_results(selected_products, result):
     # cny_price = convert_krw_to_cny(result['final_payment'])
     # st.write(f"**人民币价格:** {cny_price:,.0f}元")
 def main():
-    # 获取汇率信息 - 使用缓存避免重复调用
-    @st.cache_data(ttl=300)
-    def get_rate_cached():
-        return get_exchange_rate()
-    
-    rate_info = get_rate_cached()
+    # 每次重跑开始时创建新的数据上下文（收藏和购买计划每次重跑最多加载一次）
+    begin_rerun()
+
+    # 获取汇率信息 - 进程级汇率服务（后台定时刷新，所有会话共享）
+    rate_info = get_exchange_rate()
 
     # 主标题和汇率信息在同一行
     st.title("🏔️ 始祖鸟查货系统")
     if rate_info:
-        st.session_state.exchange_rate_info = rate_info  # 保存供其他模块使用
         # 使用醒目的方式显示
         st.success(f"💱 实时汇率: {rate_info}")
     else:
         st.warning("⚠️ 今日汇率信息暂不可用")
-        st.session_state.exchange_rate_info = None
 
     # 初始化session_state（移到函数内部）
     if "step_history" not in st.session_state:
         st.session_state.step_history = ["start"]
 
-    # 创建标签页
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["🔍 产品查询", "⭐ 收藏产品", "📊 库存矩阵", "🛒 购买计划", "⭐ 关注店铺", "🗑️ 缓存管理"])
-
-    with tab1:
-        show_product_query_tab()
-
-    with tab2:
-        # 检查是否需要从购买计划标签页切换过来并查询全部库存
-        if st.session_state.get("switch_to_favorites_and_query", False):
-            st.session_state.switch_to_favorites_and_query = False
-            st.session_state.trigger_batch_query_all = True
-        
-        show_favorites_tab()
-    
-    with tab3:
-        show_inventory_matrix_tab()
-    
-    with tab4:
-        show_purchase_plan_tab()
-    
-    with tab5:
-        show_followed_stores_tab()
-    
-    with tab6:
-        show_cache_management_tab()
-
+    # 检查是否需要从购买计划标签页切换到收藏产品并查询全部库存
+    if st.session_state.get("switch_to_favorites_and_query", False):
+        st.session_state.switch_to_favorites_and_query = False
+        st.session_state.trigger_batch_query_all = True
+        request_view("favorites")
+
+    # 页面导航：只执行当前视图，其他视图不运行
+    view_renderers = {
+        "query": show_product_query_tab,
+        "favorites": show_favorites_tab,
+        "inventory": show_inventory_matrix_tab,
+        "plan": show_purchase_plan_tab,
+        "followed_stores": show_followed_stores_tab,
+        "cache": show_cache_management_tab,
+    }
+    view_renderers[render_navigation()]()
 
 if __name__ == "__main__":
     # 初始化session_state
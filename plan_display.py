@@ -1,12 +1,17 @@
 ﻿import streamlit as st
 from purchase_plan_manager import (
-    get_plans_grouped_by_store,
-    calculate_store_total_price,
     remove_product_from_plan,
     remove_store_from_plan,
     calculate_store_domestic_total
 )
 from calculation_utils import calculate_detailed_price, convert_krw_to_cny
+from rerun_context import get_context
+from pricing_engine import compare_discount_combinations
+from basket_optimizer import optimize_basket
+from exchange_rate import exchange_rate_service
+from rate_history import rate_history
+from scenario_pricing import scenario_rates, price_plans_across_rates
+from ui_fragments import fragment, rerun_fragment
 import time
 
 
@@ -29,7 +34,8 @@ def show_purchase_plan_tab():
         st.session_state.plan_management_mode = False
     
     # 获取购买计划数据
-    plans_by_store = get_plans_grouped_by_store()
+    plan_index = get_context().plan_index
+    plans_by_store = plan_index.grouped()
     
     if not plans_by_store:
         st.info("暂无购买计划")
@@ -57,143 +63,254 @@ def show_purchase_plan_tab():
     
     st.write("")  # 紧凑间距
     
-    # 遍历每个店铺
+    # 汇率情景分析
+    with st.expander("💱 汇率情景分析", expanded=False):
+        show_rate_scenarios(plans_by_store)
+    
+    # 遍历每个店铺（每个店铺卡片为独立片段，卡片内的操作只重跑该卡片）
     for store_name in plans_by_store.keys():
-        products = plans_by_store[store_name]
-        total_price = calculate_store_total_price(products)
-        
-        # 店铺标题区域
-        st.write(f"**🏪 {store_name}**")
-        
-        # 创建容器用于产品列表
-        with st.container(border=True):
-            # 显示每个产品
-            for idx, product in enumerate(products):
-                # 产品信息
-                product_display = f"{product['exact_model'] or product['product_model']} {product['color']} {product['size']}"
-                
-                # 新增：显示库存信息
-                # 库存矩阵使用 product_model 作为键（不是 exact_model）
-                product_key_for_inventory = f"{product['product_model']} {product['color']} {product['size']}"
-                
-                # 获取当前店铺的库存矩阵
-                inventory_matrix = st.session_state.get('purchase_plan_inventory_matrix', None)
-                
-                if inventory_matrix and store_name in inventory_matrix:
-                    # 查询该店铺下该产品的库存
-                    store_inventory = inventory_matrix[store_name]
-                    if product_key_for_inventory in store_inventory:
-                        stock_count = store_inventory[product_key_for_inventory]
-                        if stock_count and int(stock_count) > 0:
-                            product_display += f"({stock_count}件)"
-                        else:
-                            product_display += "(无库存)"
+        show_store_card(store_name)
+
+
+@fragment
+def show_store_card(store_name: str):
+    """显示单个店铺的购买计划卡片（产品列表、删除、试算）"""
+    ctx = get_context()
+    products = ctx.plan_index.products_for_store(store_name)
+    if not products:
+        return
+    total_price = ctx.plan_index.krw_total(store_name)
+
+    # 店铺标题区域
+    st.write(f"**🏪 {store_name}**")
+
+    # 创建容器用于产品列表
+    with st.container(border=True):
+        # 显示每个产品
+        for idx, product in enumerate(products):
+            # 产品信息
+            product_display = f"{product['exact_model'] or product['product_model']} {product['color']} {product['size']}"
+
+            # 新增：显示库存信息
+            # 库存矩阵使用 product_model 作为键（不是 exact_model）
+            product_key_for_inventory = f"{product['product_model']} {product['color']} {product['size']}"
+
+            # 获取当前店铺的库存矩阵
+            inventory_matrix = st.session_state.get('purchase_plan_inventory_matrix', None)
+
+            if inventory_matrix and store_name in inventory_matrix:
+                # 查询该店铺下该产品的库存
+                store_inventory = inventory_matrix[store_name]
+                if product_key_for_inventory in store_inventory:
+                    stock_count = store_inventory[product_key_for_inventory]
+                    if stock_count and int(stock_count) > 0:
+                        product_display += f"({stock_count}件)"
                     else:
-                        # 库存未找到 - 显示无库存
                         product_display += "(无库存)"
-                        # 添加调试信息（可选，仅在展开器中显示）
-                        with st.expander("ℹ️ 库存匹配调试信息", expanded=False):
-                            st.write(f"🔍 搜索的产品键：`{product_key_for_inventory}`")
-                            st.write(f"📍 店铺：{store_name}")
-                            st.write(f"📝 product_model: `{product.get('product_model')}`")
-                            st.write(f"📝 exact_model: `{product.get('exact_model')}`")
-                            if store_inventory:
-                                st.write(f"📦 该店铺的可用产品键（前10个）：")
-                                for i, key in enumerate(list(store_inventory.keys())[:10]):
-                                    st.write(f"  {i+1}. `{key}`")
-                                if len(store_inventory) > 10:
-                                    st.write(f"  ... 还有 {len(store_inventory) - 10} 个产品")
-                            else:
-                                st.write("❌ 该店铺无库存数据")
                 else:
-                    # 未查询库存
-                    product_display += "(未查库存)"
-                
-                # 价格
-                price_display = f"{product['price_krw']:,}韩元"
-                
-                # 创建删除按钮（只在管理模式显示）
-                delete_button_html = ""
-                if st.session_state.plan_management_mode:
-                    # 使用容器放置删除按钮
-                    col1, col2, col3 = st.columns([3, 1.8, 0.8])
-                    with col1:
-                        st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px;'>{product_display}</p>", unsafe_allow_html=True)
-                    with col2:
-                        st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px;'>{price_display}</p>", unsafe_allow_html=True)
-                    with col3:
-                        if st.button("🗑️", key=f"delete_product_{product['id']}", help="删除该产品"):
-                            if remove_product_from_plan(product['id']):
-                                st.success("已删除")
-                                st.rerun()
-                else:
-                    col1, col2 = st.columns([3, 1.8])
-                    with col1:
-                        st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px;'>{product_display}</p>", unsafe_allow_html=True)
-                    with col2:
-                        st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px;'>{price_display}</p>", unsafe_allow_html=True)
-            # 税前总价
-            col1, col2 = st.columns([3, 1.8])
-            with col1:
-                st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px; font-weight: bold;'>税前总价</p>", unsafe_allow_html=True)
-            with col2:
-                st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px; font-weight: bold;'>{total_price:,}韩元</p>", unsafe_allow_html=True)
-        
-        # 删除店铺和试算按钮区域
-        col1, col2, col3, col4 = st.columns([3, 1, 1, 0.8])
-        
-        with col2:
-            # 试算按钮
-            if st.button("💰 试算", key=f"calc_plan_{store_name}"):
-                st.session_state.show_plan_calculation_config[store_name] = True
-                st.session_state.plan_calculation_result[store_name] = None
-                st.rerun()
-        
-        with col3:
-            # 删除店铺按钮（只在管理模式显示）
+                    # 库存未找到 - 显示无库存
+                    product_display += "(无库存)"
+                    # 添加调试信息（可选，仅在展开器中显示）
+                    with st.expander("ℹ️ 库存匹配调试信息", expanded=False):
+                        st.write(f"🔍 搜索的产品键：`{product_key_for_inventory}`")
+                        st.write(f"📍 店铺：{store_name}")
+                        st.write(f"📝 product_model: `{product.get('product_model')}`")
+                        st.write(f"📝 exact_model: `{product.get('exact_model')}`")
+                        if store_inventory:
+                            st.write(f"📦 该店铺的可用产品键（前10个）：")
+                            for i, key in enumerate(list(store_inventory.keys())[:10]):
+                                st.write(f"  {i+1}. `{key}`")
+                            if len(store_inventory) > 10:
+                                st.write(f"  ... 还有 {len(store_inventory) - 10} 个产品")
+                        else:
+                            st.write("❌ 该店铺无库存数据")
+            else:
+                # 未查询库存
+                product_display += "(未查库存)"
+
+            # 价格
+            price_display = f"{product['price_krw']:,}韩元"
+
+            # 创建删除按钮（只在管理模式显示）
+            delete_button_html = ""
             if st.session_state.plan_management_mode:
-                if st.button("删除店铺", key=f"delete_store_{store_name}"):
-                    # 显示确认对话框
-                    if st.session_state.get(f"confirm_delete_{store_name}", False):
-                        if remove_store_from_plan(store_name):
-                            st.success(f"已删除 {store_name} 及其所有产品")
-                            st.session_state[f"confirm_delete_{store_name}"] = False
+                # 使用容器放置删除按钮
+                col1, col2, col3 = st.columns([3, 1.8, 0.8])
+                with col1:
+                    st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px;'>{product_display}</p>", unsafe_allow_html=True)
+                with col2:
+                    st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px;'>{price_display}</p>", unsafe_allow_html=True)
+                with col3:
+                    if st.button("🗑️", key=f"delete_product_{product['id']}", help="删除该产品"):
+                        if remove_product_from_plan(product['id']):
+                            ctx.invalidate("plans")
+                            st.success("已删除")
+                            # 页面级的店铺列表和汇率情景分析使用购买计划总价，重跑整个页面
                             st.rerun()
-                    else:
-                        st.session_state[f"confirm_delete_{store_name}"] = True
-                        st.rerun()
-        
-        # 显示删除确认
-        if st.session_state.get(f"confirm_delete_{store_name}", False):
-            with col1:
-                st.warning(f"确认删除 {store_name} 下的所有产品吗？")
-            col_confirm, col_cancel = st.columns(2)
-            with col_confirm:
-                if st.button("确认删除", key=f"confirm_delete_btn_{store_name}"):
+            else:
+                col1, col2 = st.columns([3, 1.8])
+                with col1:
+                    st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px;'>{product_display}</p>", unsafe_allow_html=True)
+                with col2:
+                    st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px;'>{price_display}</p>", unsafe_allow_html=True)
+        # 税前总价
+        col1, col2 = st.columns([3, 1.8])
+        with col1:
+            st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px; font-weight: bold;'>税前总价</p>", unsafe_allow_html=True)
+        with col2:
+            st.markdown(f"<p style='margin: 0px; padding: 0px; font-size: 14px; font-weight: bold;'>{total_price:,}韩元</p>", unsafe_allow_html=True)
+
+    # 删除店铺和试算按钮区域
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 0.8])
+
+    with col2:
+        # 试算按钮
+        if st.button("💰 试算", key=f"calc_plan_{store_name}"):
+            st.session_state.show_plan_calculation_config[store_name] = True
+            st.session_state.plan_calculation_result[store_name] = None
+            rerun_fragment()
+
+    with col3:
+        # 删除店铺按钮（只在管理模式显示）
+        if st.session_state.plan_management_mode:
+            if st.button("删除店铺", key=f"delete_store_{store_name}"):
+                # 显示确认对话框
+                if st.session_state.get(f"confirm_delete_{store_name}", False):
                     if remove_store_from_plan(store_name):
+                        ctx.invalidate("plans")
                         st.success(f"已删除 {store_name} 及其所有产品")
                         st.session_state[f"confirm_delete_{store_name}"] = False
+                        # 店铺列表发生变化，重跑整个页面
                         st.rerun()
-            with col_cancel:
-                if st.button("取消", key=f"cancel_delete_btn_{store_name}"):
+                else:
+                    st.session_state[f"confirm_delete_{store_name}"] = True
+                    rerun_fragment()
+
+    # 显示删除确认
+    if st.session_state.get(f"confirm_delete_{store_name}", False):
+        with col1:
+            st.warning(f"确认删除 {store_name} 下的所有产品吗？")
+        col_confirm, col_cancel = st.columns(2)
+        with col_confirm:
+            if st.button("确认删除", key=f"confirm_delete_btn_{store_name}"):
+                if remove_store_from_plan(store_name):
+                    ctx.invalidate("plans")
+                    st.success(f"已删除 {store_name} 及其所有产品")
                     st.session_state[f"confirm_delete_{store_name}"] = False
+                    # 店铺列表发生变化，重跑整个页面
                     st.rerun()
-        
-        # 显示试算配置窗口
-        if st.session_state.show_plan_calculation_config.get(store_name, False):
-            show_store_calculation_config(store_name, products)
-            continue
-        
-        # 显示试算结果
-        if st.session_state.plan_calculation_result.get(store_name):
-            with st.expander(f"💰 {store_name} 试算结果", expanded=True):
-                col_close, _ = st.columns([1, 3])
-                with col_close:
-                    if st.button(f"✕ 关闭试算", key=f"close_calc_{store_name}"):
-                        st.session_state.plan_calculation_result[store_name] = None
-                        st.rerun()
-                
-                display_store_calculation_results(store_name, products, st.session_state.plan_calculation_result[store_name])
+        with col_cancel:
+            if st.button("取消", key=f"cancel_delete_btn_{store_name}"):
+                st.session_state[f"confirm_delete_{store_name}"] = False
+                rerun_fragment()
+
+    # 显示试算配置窗口
+    if st.session_state.show_plan_calculation_config.get(store_name, False):
+        show_store_calculation_config(store_name, products)
+        return
+
+    # 显示试算结果
+    if st.session_state.plan_calculation_result.get(store_name):
+        with st.expander(f"💰 {store_name} 试算结果", expanded=True):
+            col_close, _ = st.columns([1, 3])
+            with col_close:
+                if st.button(f"✕ 关闭试算", key=f"close_calc_{store_name}"):
+                    st.session_state.plan_calculation_result[store_name] = None
+                    rerun_fragment()
+
+            display_store_calculation_results(store_name, products, st.session_state.plan_calculation_result[store_name])
+
+
+def show_rate_scenarios(plans_by_store):
+    """按历史汇率（最低/最高/分位数）批量重算全部购买计划的人民币价格"""
+    period_options = {"最近30天": 30, "最近90天": 90, "全部": None}
+    period = st.selectbox("汇率历史范围", list(period_options), key="rate_scenario_period")
+    
+    summary = rate_history.summary(period_options[period])
+    rates = scenario_rates(summary, exchange_rate_service.get_rate())
+    if not rates:
+        st.info("暂无汇率数据")
+        return
+    if summary:
+        st.caption(f"共 {summary['count']} 条汇率记录，"
+                   f"{time.strftime('%Y-%m-%d', time.localtime(summary['first_at']))} ~ "
+                   f"{time.strftime('%Y-%m-%d', time.localtime(summary['last_at']))}；各店铺按默认商家优惠计算")
+    
+    priced = price_plans_across_rates(plans_by_store, list(rates.values()))
+    baseline = priced['total_cny'][0]
+    table_data = []
+    for k, (label, rate) in enumerate(rates.items()):
+        total_cny = priced['total_cny'][k]
+        table_data.append({
+            "情景": label,
+            "汇率(1万韩元)": f"{rate:.2f}",
+            "总实付(人民币)": f"{total_cny:,.0f}",
+            "与第一行差额": f"{total_cny - baseline:+,.0f}"
+        })
+    st.dataframe(table_data, use_container_width=True, hide_index=True)
+    
+    # 各店铺明细
+    store_rows = []
+    for i, store in enumerate(priced['stores']):
+        row = {"店铺": store, "实付(韩元)": f"{priced['final_payment'][i]:,.0f}"}
+        for k, label in enumerate(rates):
+            row[label] = f"{priced['cny'][i, k]:,.0f}"
+        store_rows.append(row)
+    st.dataframe(store_rows, use_container_width=True, hide_index=True)
+
+
+def show_discount_comparison(total_krw, merchants, top_n=10):
+    """显示所有商家所有优惠组合的试算对比（批量计算，按最终实付升序）"""
+    rows = compare_discount_combinations(total_krw, merchants)
+    
+    table_data = []
+    for row in rows[:top_n]:
+        post_tax_benefit = row['gift_coupon'] + row['points_reward']
+        table_data.append({
+            "商家": row['merchant'],
+            "优惠组合": "、".join(row['discounts']) if row['discounts'] else "无优惠（仅退税）",
+            "税前优惠": f"{row['pre_tax_discount']:,.0f}",
+            "退税额": f"{row['tax_refund']:,.0f}",
+            "商品券/积分": f"{post_tax_benefit:,.0f}",
+            "最终实付(韩元)": f"{row['final_payment']:,.0f}",
+            "最终实付(人民币)": f"{convert_krw_to_cny(row['final_payment']):,.0f}"
+        })
+    
+    st.caption(f"共 {len(rows)} 种组合，显示最终实付最低的 {len(table_data)} 种（商品券和积分按面值计入）")
+    st.dataframe(table_data, use_container_width=True, hide_index=True)
+
+
+def show_basket_split(store_name: str, selected_products: list, selected_discounts: list):
+    """显示拆单优化：将选中产品拆分为多笔交易（分别结账）使总实付最低"""
+    split_key = f"basket_split_{store_name}"
+    input_key = (tuple(p['id'] for p in selected_products), tuple(d['name'] for d in selected_discounts))
+    
+    if st.button("🧮 计算最优拆单", key=f"basket_split_button_{store_name}"):
+        st.session_state[split_key] = (input_key, optimize_basket(selected_products, selected_discounts))
+    
+    # 产品或优惠选择变化后，之前的结果失效
+    cached = st.session_state.get(split_key)
+    if not cached or cached[0] != input_key:
+        st.caption("每笔交易单独计算税前优惠、退税和商品券，限用一次的优惠只计入其中一笔交易")
+        return
+    
+    split = cached[1]
+    if len(split['transactions']) <= 1:
+        st.info("💡 一笔结账已是最优，无需拆单")
+        return
+    
+    st.success(f"✅ 建议分 {len(split['transactions'])} 笔结账，最终实付 {split['final_payment']:,.0f}韩元，"
+               f"比一笔结账节省 {split['savings']:,.0f}韩元")
+    if not split['exact']:
+        st.caption("产品较多，结果为近似最优方案")
+    
+    for i, transaction in enumerate(split['transactions'], 1):
+        result = transaction['result']
+        once_note = f"（使用{'、'.join(transaction['once_only'])}）" if transaction['once_only'] else ""
+        st.write(f"**第{i}笔:** 税前 {transaction['total_krw']:,}韩元 → 实付 {result['final_payment']:,.0f}韩元"
+                 f"（退税 {result['tax_refund']:,.0f}）{once_note}")
+        for product in transaction['products']:
+            st.write(f"- {product['exact_model'] or product['product_model']} - {product['color']} - {product['size']} - {product['price_krw']:,}韩元")
 
 
 def show_store_calculation_config(store_name: str, products: list):
@@ -251,6 +368,16 @@ def show_store_calculation_config(store_name: str, products: list):
         if selected:
             selected_discounts.append(option)
     
+    # 全部商家优惠组合对比
+    if total_krw > 0:
+        with st.expander("📊 全部商家优惠组合对比", expanded=False):
+            show_discount_comparison(total_krw, store_options)
+    
+    # 拆单优化
+    if len(selected_products) > 1:
+        with st.expander("🧮 拆单优化", expanded=False):
+            show_basket_split(store_name, selected_products, selected_discounts)
+    
     # 一键试算按钮
     col1, col2 = st.columns(2)
     with col1:
@@ -264,7 +391,7 @@ def show_store_calculation_config(store_name: str, products: list):
                     result = calculate_detailed_price(total_krw, selected_discounts)
                     st.session_state.plan_calculation_result[store_name] = result
                     st.session_state.show_plan_calculation_config[store_name] = False
-                    st.rerun()
+                    rerun_fragment()
                 except Exception as e:
                     st.error(f"❌ 试算出错: {str(e)}")
                     import traceback
@@ -273,7 +400,7 @@ def show_store_calculation_config(store_name: str, products: list):
     with col2:
         if st.button("← 返回购买计划", key=f"back_to_plan_{store_name}"):
             st.session_state.show_plan_calculation_config[store_name] = False
-            st.rerun()
+            rerun_fragment()
 
 
 def display_store_calculation_results(store_name: str, products: list, result):
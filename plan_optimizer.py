@@ -0,0 +1,327 @@
+# plan_optimizer.py
+import time
+
+import numpy as np
+
+from discount_config import DISCOUNT_CONFIG
+from inventory_matrix import as_inventory_matrix
+from pricing_engine import compile_discounts, price_baskets
+from store_registry import store_registry
+
+# 各商家默认使用的优惠（现代百货的分店专属商品券由对应商家单独配置）
+# 仅限一次的优惠（once_only）在同一商家的多家店铺中只计入一家
+DEFAULT_MERCHANT_DISCOUNTS = {
+    "新世界": ["会员卡5%折扣", "新会员5%折扣", "银联阶梯立减", "银联阶梯赠券"],
+    "旗舰店": ["新会员5%折扣"],
+    "乐天/新世界奥莱": ["新会员5%折扣", "银联满5万10%折扣"],
+    "现代百货": ["新会员5%折扣", "7%积分赠送", "商品券赠送"],
+    "汝矣岛店": ["商品券赠送"],
+    "本店/贸易中心店/新村板桥店": ["商品券赠送"],
+}
+
+# 局部搜索最长时间（秒）
+LOCAL_SEARCH_SECONDS = 1.0
+
+
+def merchant_discounts(merchant, option_names=None):
+    """商家的优惠选项列表（option_names 为 None 时使用默认优惠；未知商家返回空列表，只计算退税）"""
+    if merchant not in DISCOUNT_CONFIG:
+        return []
+    names = DEFAULT_MERCHANT_DISCOUNTS.get(merchant, []) if option_names is None else option_names
+    return [option for option in DISCOUNT_CONFIG[merchant]['options'] if option['name'] in names]
+
+
+def split_once_only(discounts):
+    """将优惠选项分为 (每笔交易都可用的优惠, 仅限一次的优惠)"""
+    return (
+        [option for option in discounts if not option.get('once_only')],
+        [option for option in discounts if option.get('once_only')]
+    )
+
+
+def best_once_only_stores(merchants, gains):
+    """
+    每个商家选出使用仅限一次优惠的店铺（节省金额最大的一家）
+
+    Args:
+        merchants: 各店铺的商家
+        gains: 各店铺使用仅限一次优惠时额外节省的金额
+
+    Returns:
+        使用仅限一次优惠的店铺下标集合
+    """
+    best = {}
+    for k, (merchant, gain) in enumerate(zip(merchants, gains)):
+        if gain > 0 and (merchant not in best or gain > gains[best[merchant]]):
+            best[merchant] = k
+    return set(best.values())
+
+
+class _StoreCosts:
+    """按店铺适用的优惠组批量查询实付（同一商家的店铺共享价格缓存）"""
+
+    def __init__(self, discount_sets):
+        self.discount_sets = [compile_discounts(discounts) for discounts in discount_sets]
+        self._caches = [{0: 0.0} for _ in discount_sets]
+        self._prefetched = set()
+
+    def costs(self, groups, totals):
+        """groups[k] 为优惠组下标，totals[k] 为该店铺的税前总价；返回对应的最终实付数组"""
+        out = np.empty(len(totals), dtype=np.float64)
+        for group in np.unique(groups):
+            mask = groups == group
+            out[mask] = self._group_costs(int(group), totals[mask].tolist())
+        return out
+
+    def prefetch(self, group, base_total, increments):
+        """批量预先计算 base_total 加上各个增量后的价格（同一基准总价只计算一次）"""
+        if (group, base_total) in self._prefetched:
+            return
+        self._prefetched.add((group, base_total))
+        cache = self._caches[group]
+        missing = [total for total in (base_total + increments).tolist() if total not in cache]
+        if missing:
+            cache.update(zip(missing, price_baskets(missing, self.discount_sets[group])['final_payment'].tolist()))
+
+    def cost(self, group, total):
+        return self._group_costs(group, [total])[0]
+
+    def _group_costs(self, group, totals):
+        cache = self._caches[group]
+        missing = [total for total in dict.fromkeys(totals) if total not in cache]
+        if missing:
+            priced = price_baskets(missing, self.discount_sets[group])['final_payment'].tolist()
+            cache.update(zip(missing, priced))
+        return [cache[total] for total in totals]
+
+
+def optimize_plan(favorites, inventory_matrix, store_penalty_krw=0, discounts_by_merchant=None,
+                  candidate_stores=None, time_limit=LOCAL_SEARCH_SECONDS):
+    """
+    智能分配购买计划：为每个收藏产品选择一家有库存的店铺，使总实付最低
+
+    每家店铺的产品按一笔交易计算（商家优惠 + 退税），目标为各店铺实付之和，
+    加上每去一家店铺的额外成本 store_penalty_krw（为0时不限制店铺数）。
+    仅限一次的优惠在同一商家中只用于节省最多的一家店铺。
+    先按价格从高到低贪心分配，再局部搜索（单个产品换店、关闭店铺）改进。
+
+    Args:
+        favorites: 收藏产品列表
+        inventory_matrix: 库存矩阵
+        store_penalty_krw: 每多去一家店铺的额外成本（韩元）
+        discounts_by_merchant: {商家: 优惠选项列表}，缺省使用 DEFAULT_MERCHANT_DISCOUNTS
+        candidate_stores: 可选的候选店铺名称列表（缺省为矩阵中全部店铺）
+        time_limit: 局部搜索最长时间（秒）
+
+    Returns:
+        字典: {
+            "stores": {店铺: {"merchant", "discounts", "products", "total_krw", "final_payment"}}
+                （discounts 为该店铺实际使用的优惠）,
+            "unassigned": 没有任何店铺有库存的收藏产品,
+            "final_payment": 总实付（韩元）,
+            "store_count": 店铺数
+        }
+    """
+    matrix = as_inventory_matrix(inventory_matrix)
+    store_names = [name for name in (candidate_stores or matrix.stores) if name in matrix.store_index]
+    rows = np.array([matrix.store_index[name] for name in store_names], dtype=np.intp)
+
+    # 店铺 -> 优惠组（同一商家的店铺使用同一组优惠）
+    merchants = [store_registry.get(name).merchant for name in store_names]
+    group_keys = list(dict.fromkeys(merchants))
+    groups = np.array([group_keys.index(merchant) for merchant in merchants], dtype=np.intp)
+    discounts_by_merchant = discounts_by_merchant or {}
+    discount_sets = [
+        discounts_by_merchant[merchant] if merchant in discounts_by_merchant else merchant_discounts(merchant)
+        for merchant in group_keys
+    ]
+
+    # 价格组：前 len(group_keys) 组为不含仅限一次优惠的价格，其后为含仅限一次优惠的价格
+    base_sets, full_sets, full_group_of = [], [], []
+    for discounts in discount_sets:
+        base, once = split_once_only(discounts)
+        base_sets.append(base)
+        if once:
+            full_group_of.append(len(group_keys) + len(full_sets))
+            full_sets.append(discounts)
+        else:
+            full_group_of.append(-1)
+    pricer = _StoreCosts(base_sets + full_sets)
+    full_groups = np.array(full_group_of, dtype=np.intp)[groups] if len(groups) else np.array([], dtype=np.intp)
+
+    # 每个产品的候选店铺（有库存的店铺下标）
+    items, candidates, unassigned = [], [], []
+    for favorite in favorites:
+        product_key = f"{favorite['product_model']} {favorite['color']} {favorite['size']}"
+        in_stock = np.flatnonzero(matrix.column(product_key)[rows] > 0) if len(rows) else np.array([], dtype=np.intp)
+        if len(in_stock):
+            items.append(favorite)
+            candidates.append(in_stock)
+        else:
+            unassigned.append(favorite)
+
+    prices = [int(float(favorite['price'])) for favorite in items]
+    price_array = np.unique(np.array(prices, dtype=np.int64))
+    totals = np.zeros(len(store_names), dtype=np.int64)
+    counts = np.zeros(len(store_names), dtype=np.int64)
+    store_costs = np.zeros(len(store_names), dtype=np.float64)  # 各店铺当前实付（不含仅限一次优惠）
+    store_gains = np.zeros(len(store_names), dtype=np.float64)  # 各店铺使用仅限一次优惠时额外节省的金额
+    assignment = [-1] * len(items)
+
+    def gains_at(c, new_totals, new_costs):
+        """店铺 c 的税前总价为 new_totals 时，使用仅限一次优惠额外节省的金额"""
+        out = np.zeros(len(c), dtype=np.float64)
+        mask = full_groups[c] >= 0
+        if mask.any():
+            out[mask] = np.maximum(new_costs[mask] - pricer.costs(full_groups[c][mask], new_totals[mask]), 0)
+        return out
+
+    def group_best_gains():
+        """每个商家的最大节省金额、对应店铺和次大节省金额"""
+        best = np.zeros(len(group_keys))
+        best_store = np.full(len(group_keys), -1, dtype=np.intp)
+        second = np.zeros(len(group_keys))
+        for t in np.flatnonzero(store_gains > 0):
+            g, gain = groups[t], store_gains[t]
+            if gain > best[g]:
+                second[g], best[g], best_store[g] = best[g], gain, t
+            elif gain > second[g]:
+                second[g] = gain
+        return best, best_store, second
+
+    def gain_deltas(c, new_gains):
+        """店铺 c 的节省金额变为 new_gains 时，所属商家仅限一次优惠节省金额的变化（取负即成本变化）"""
+        best, best_store, second = group_best_gains()
+        g = groups[c]
+        others = np.where(best_store[g] == c, second[g], best[g])
+        return np.maximum(new_gains, others) - best[g]
+
+    def add_deltas(c, price):
+        """产品加入候选店铺 c 时的总成本变化"""
+        new_totals = totals[c] + price
+        new_costs = pricer.costs(groups[c], new_totals)
+        delta = new_costs - store_costs[c] + np.where(counts[c] == 0, store_penalty_krw, 0)
+        if len(full_sets):
+            delta -= gain_deltas(c, gains_at(c, new_totals, new_costs))
+        return delta
+
+    def remove_delta(s, price):
+        """产品移出店铺 s 时的总成本变化"""
+        new_total = np.array([totals[s] - price])
+        new_cost = pricer.costs(groups[[s]], new_total)
+        delta = new_cost[0] - store_costs[s] - (store_penalty_krw if counts[s] == 1 else 0)
+        if len(full_sets):
+            delta -= gain_deltas(np.array([s]), gains_at(np.array([s]), new_total, new_cost))[0]
+        return delta
+
+    def total_cost():
+        """当前分配的总成本（各店铺实付 - 各商家仅限一次优惠节省 + 店铺数惩罚）"""
+        return (float(store_costs.sum()) - float(group_best_gains()[0].sum())
+                + store_penalty_krw * int(np.count_nonzero(counts)))
+
+    def update_store(t):
+        store_costs[t] = pricer.cost(groups[t], int(totals[t]))
+        if full_groups[t] >= 0:
+            store_gains[t] = max(store_costs[t] - pricer.cost(full_groups[t], int(totals[t])), 0.0)
+
+    def move(i, s, prefetch=True):
+        source = assignment[i]
+        if source >= 0:
+            totals[source] -= prices[i]
+            counts[source] -= 1
+            update_store(source)
+        assignment[i] = s
+        totals[s] += prices[i]
+        counts[s] += 1
+        update_store(s)
+        # 店铺总价变化后，预先批量计算该店铺再加入任一产品时的价格（试探性移动不预取）
+        if prefetch:
+            for t in (source, s):
+                if t >= 0:
+                    pricer.prefetch(groups[t], int(totals[t]), price_array)
+                    if full_groups[t] >= 0:
+                        pricer.prefetch(full_groups[t], int(totals[t]), price_array)
+
+    for group in range(len(base_sets) + len(full_sets)):
+        pricer.prefetch(group, 0, price_array)
+
+    # 第1步：按价格从高到低贪心分配到边际成本最低的店铺
+    for i in sorted(range(len(items)), key=lambda i: -prices[i]):
+        c = candidates[i]
+        move(i, int(c[np.argmin(add_deltas(c, prices[i]))]))
+
+    # 第2步：局部搜索
+    deadline = time.monotonic() + time_limit
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+
+        # 单个产品换到其他店铺
+        for i in range(len(items)):
+            s = assignment[i]
+            c = candidates[i][candidates[i] != s]
+            if not len(c):
+                continue
+            deltas = add_deltas(c, prices[i]) + remove_delta(s, prices[i])
+            k = int(np.argmin(deltas))
+            if deltas[k] < -1e-6:
+                if groups[c[k]] == groups[s] and full_groups[s] >= 0:
+                    # 同一商家内换店时两部分变化不可相加（仅限一次优惠只计一家），按实际总成本确认
+                    before = total_cost()
+                    move(i, int(c[k]), prefetch=False)
+                    if total_cost() >= before - 1e-6:
+                        move(i, int(s), prefetch=False)
+                        continue
+                    for t in (s, int(c[k])):
+                        pricer.prefetch(groups[t], int(totals[t]), price_array)
+                        pricer.prefetch(full_groups[t], int(totals[t]), price_array)
+                else:
+                    move(i, int(c[k]))
+                improved = True
+
+        # 关闭店铺：把店铺的产品全部移到其他已选店铺
+        if store_penalty_krw > 0:
+            for s in np.argsort(totals):
+                if counts[s] == 0 or time.monotonic() >= deadline:
+                    continue
+                members = [i for i in range(len(items)) if assignment[i] == s]
+                before = total_cost()
+                moved = []
+                for i in members:
+                    c = candidates[i][(candidates[i] != s) & (counts[candidates[i]] > 0)]
+                    if not len(c):
+                        break
+                    moved.append(i)
+                    move(i, int(c[np.argmin(add_deltas(c, prices[i]))]), prefetch=False)
+                if len(moved) == len(members) and total_cost() < before - 1e-6:
+                    for t in np.flatnonzero(counts):
+                        pricer.prefetch(groups[t], int(totals[t]), price_array)
+                    improved = True
+                    continue
+                # 无法改进时撤销
+                for i in moved:
+                    move(i, int(s), prefetch=False)
+
+    # 汇总结果（按实付降序）
+    once_stores = set(group_best_gains()[1].tolist())
+    stores = {}
+    for s in np.flatnonzero(counts):
+        store_name = store_names[s]
+        products = [items[i] for i in range(len(items)) if assignment[i] == s]
+        used = discount_sets[groups[s]] if s in once_stores else base_sets[groups[s]]
+        stores[store_name] = {
+            "merchant": merchants[s],
+            "discounts": [option['name'] for option in used],
+            "products": products,
+            "total_krw": int(totals[s]),
+            "final_payment": float(store_costs[s] - (store_gains[s] if s in once_stores else 0))
+        }
+    stores = dict(sorted(stores.items(), key=lambda item: -item[1]["final_payment"]))
+
+    return {
+        "stores": stores,
+        "unassigned": unassigned,
+        "final_payment": sum(store["final_payment"] for store in stores.values()),
+        "store_count": len(stores)
+    }
+
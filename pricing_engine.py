@@ -0,0 +1,267 @@
+# pricing_engine.py
+import bisect
+from itertools import combinations
+
+import numpy as np
+
+from discount_config import DISCOUNT_CONFIG
+
+# 退税范围表（韩国标准 - 范围制）
+REFUND_RATE_TABLE = [
+    # (min_amount, max_amount, refund_amount)
+    (15000, 29999, 1000),
+    (30000, 49999, 2000),
+    (50000, 74999, 3000),
+    (75000, 99999, 5000),
+    (100000, 124999, 7000),
+    (125000, 149999, 8000),
+    (150000, 174999, 9000),
+    (175000, 199999, 10000),
+    (200000, 224999, 12000),
+    (225000, 249999, 13000),
+    (250000, 274999, 15000),
+    (275000, 299999, 17000),
+    (300000, 324999, 19000),
+    (325000, 349999, 21000),
+    (350000, 374999, 23000),
+    (375000, 399999, 25000),
+    (400000, 424999, 27000),
+    (425000, 449999, 28000),
+    (450000, 474999, 30000),
+    (475000, 499999, 32000),
+    (500000, 549999, 35000),
+    (550000, 599999, 37000),
+    (600000, 649999, 41000),
+    (650000, 699999, 45000),
+    (700000, 749999, 50000),
+    (750000, 799999, 53000),
+    (800000, 849999, 57000),
+    (850000, 899999, 60000),
+    (900000, 949999, 65000),
+    (950000, 999999, 68000),
+    (1000000, 1099999, 75000),
+    (1100000, 1199999, 80000),
+    (1200000, 1299999, 90000),
+    (1300000, 1399999, 95000),
+    (1400000, 1499999, 105000),
+    (1500000, 1599999, 110000),
+    (1600000, 1699999, 115000),
+    (1700000, 1799999, 127000),
+    (1800000, 1899999, 135000),
+    (1900000, 1999999, 140000),
+    (2000000, 2099999, 150000),
+    (2100000, 2199999, 155000),
+    (2200000, 2299999, 160000),
+    (2300000, 2399999, 170000),
+    (2400000, 2499999, 177000),
+    (2500000, 2599999, 185000),
+    (2600000, 2699999, 190000),
+    (2700000, 2799999, 200000),
+    (2800000, 2899999, 210000),
+    (2900000, 2999999, 215000),
+    (3000000, 3099999, 225000),
+    (3100000, 3199999, 230000),
+    (3200000, 3299999, 235000),
+    (3300000, 3399999, 240000),
+    (3400000, 3499999, 250000),
+    (3500000, 3599999, 260000),
+    (3600000, 3699999, 270000),
+    (3700000, 3799999, 280000),
+    (3800000, 3899999, 285000),
+    (3900000, 3999999, 290000),
+    (4000000, 4099999, 300000),
+    (4100000, 4199999, 310000),
+    (4200000, 4299999, 315000),
+    (4300000, 4399999, 320000),
+    (4400000, 4499999, 333000),
+    (4500000, 4599999, 340000),
+    (4600000, 4699999, 350000),
+    (4700000, 4799999, 360000),
+    (4800000, 4899999, 370000),
+    (4900000, 4999999, 380000),
+    (5000000, 5099999, 390000),
+    (5100000, 5199999, 400000),
+    (5200000, 5299999, 410000),
+    (5300000, 5399999, 420000),
+    (5400000, 5499999, 430000),
+    (5500000, 5599999, 440000),
+    (5600000, 5699999, 450000),
+    (5700000, 5799999, 460000),
+    (5800000, 5899999, 470000),
+    (5900000, 5999999, 480000),
+]
+
+# 退税表编译为有序阈值数组：金额落在 [下限, 上限] 区间内取对应退税额，区间之间的空隙（如小数金额）退税为0
+_REFUND_MINS = np.array([row[0] for row in REFUND_RATE_TABLE], dtype=np.float64)
+_REFUND_MAXS = np.array([row[1] for row in REFUND_RATE_TABLE], dtype=np.float64)
+_REFUND_AMOUNTS = np.array([row[2] for row in REFUND_RATE_TABLE], dtype=np.float64)
+_REFUND_MIN_LIST = [row[0] for row in REFUND_RATE_TABLE]
+
+RESULT_FIELDS = ('total_krw', 'pre_tax_discount', 'after_pre_tax', 'tax_refund',
+                 'after_tax', 'gift_coupon', 'points_reward', 'final_payment')
+
+
+def lookup_tax_refund(krw_amount):
+    """单个金额的退税额（二分查找）"""
+    idx = bisect.bisect_right(_REFUND_MIN_LIST, krw_amount) - 1
+    if idx >= 0 and krw_amount <= REFUND_RATE_TABLE[idx][1]:
+        return REFUND_RATE_TABLE[idx][2]
+    return 0
+
+
+def tax_refunds(amounts):
+    """批量计算退税额（向量化）"""
+    amounts = np.asarray(amounts, dtype=np.float64)
+    idx = np.searchsorted(_REFUND_MINS, amounts, side='right') - 1
+    safe_idx = np.clip(idx, 0, len(_REFUND_MINS) - 1)
+    in_range = (idx >= 0) & (amounts <= _REFUND_MAXS[safe_idx])
+    return np.where(in_range, _REFUND_AMOUNTS[safe_idx], 0.0)
+
+
+class CompiledDiscount:
+    """编译后的单个优惠选项（阶梯优惠转换为有序阈值数组）"""
+
+    def __init__(self, option):
+        self.name = option['name']
+        self.type = option['type']
+        self.rate = option.get('rate', 0.0)
+        self.threshold = option.get('threshold', 0)
+        self.amount = option.get('amount', 0)
+        self.cap = option.get('cap', 0)
+
+        tiers = sorted(option.get('tiers', []), key=lambda tier: tier['threshold'])
+        self.tier_thresholds = np.array([tier['threshold'] for tier in tiers], dtype=np.float64)
+        self.tier_amounts = np.array([tier['amount'] for tier in tiers], dtype=np.float64)
+
+    @property
+    def is_pre_tax(self):
+        return self.type.startswith('pre_tax')
+
+    def tier_lookup(self, amounts):
+        """达到的最高阶梯金额（未达到任何阶梯为0）及是否达到"""
+        if not len(self.tier_amounts):
+            return np.zeros_like(amounts), np.zeros(amounts.shape, dtype=bool)
+        idx = np.searchsorted(self.tier_thresholds, amounts, side='right') - 1
+        reached = idx >= 0
+        return np.where(reached, self.tier_amounts[np.clip(idx, 0, None)], 0.0), reached
+
+    def pre_tax_discount(self, totals):
+        """税前优惠金额"""
+        if self.type == 'pre_tax_percent':
+            return totals * self.rate
+        if self.type == 'pre_tax_fixed':
+            return np.where(totals >= self.threshold, float(self.amount), 0.0)
+        if self.type == 'pre_tax_capped':
+            return np.where(totals >= self.threshold, np.minimum(totals * self.rate, self.cap), 0.0)
+        if self.type == 'pre_tax_tiered':
+            return self.tier_lookup(totals)[0]
+        return np.zeros_like(totals)
+
+
+def compile_discounts(selected_discounts):
+    """编译一组优惠选项（已编译的选项原样保留，重复计算时可预先编译）"""
+    return [option if isinstance(option, CompiledDiscount) else CompiledDiscount(option)
+            for option in selected_discounts]
+
+
+def price_baskets(totals, selected_discounts):
+    """
+    批量计算多个购物篮在同一组优惠下的价格（计算规则与 calculate_detailed_price 一致）
+
+    Args:
+        totals: 税前总价数组（韩元）
+        selected_discounts: 优惠选项列表（DISCOUNT_CONFIG 中的 option）
+
+    Returns:
+        字典 {字段名: 数组}，字段同 calculate_detailed_price 的返回值
+    """
+    totals = np.asarray(totals, dtype=np.float64)
+    compiled = compile_discounts(selected_discounts)
+
+    # 第1步：税前优惠（按选项顺序累加）
+    pre_tax_discount = np.zeros_like(totals)
+    for discount in compiled:
+        if discount.is_pre_tax:
+            pre_tax_discount = pre_tax_discount + discount.pre_tax_discount(totals)
+
+    # 第2步：税前优惠后价格
+    after_pre_tax = totals - pre_tax_discount
+
+    # 第3步：税后优惠（同类多个选项时，后面达到阶梯的选项覆盖前面的）
+    gift_coupon = np.zeros_like(totals)
+    points_reward = np.zeros_like(totals)
+    for discount in compiled:
+        if discount.type == 'post_tax_tiered':
+            values, reached = discount.tier_lookup(after_pre_tax)
+            gift_coupon = np.where(reached, values, gift_coupon)
+        elif discount.type == 'post_tax_tiered_points':
+            values, reached = discount.tier_lookup(after_pre_tax)
+            points_reward = np.where(reached, values, points_reward)
+
+    # 第4~6步：退税、税后价格、最终实付
+    tax_refund = tax_refunds(after_pre_tax)
+    after_tax = after_pre_tax - tax_refund
+    final_payment = after_tax - (gift_coupon + points_reward)
+
+    return {
+        'total_krw': totals,
+        'pre_tax_discount': pre_tax_discount,
+        'after_pre_tax': after_pre_tax,
+        'tax_refund': tax_refund,
+        'after_tax': after_tax,
+        'gift_coupon': gift_coupon,
+        'points_reward': points_reward,
+        'final_payment': final_payment
+    }
+
+
+def price_matrix(totals, discount_sets):
+    """
+    批量计算多个购物篮在多组优惠下的价格
+
+    Returns:
+        字典 {字段名: 数组 (优惠组数, 购物篮数)}
+    """
+    totals = np.asarray(totals, dtype=np.float64)
+    results = [price_baskets(totals, discounts) for discounts in discount_sets]
+    if not results:
+        return {field: np.zeros((0, len(totals))) for field in RESULT_FIELDS}
+    return {field: np.stack([result[field] for result in results]) for field in RESULT_FIELDS}
+
+
+def discount_combinations(merchant):
+    """商家所有优惠选项的组合（包括不使用任何优惠）"""
+    options = DISCOUNT_CONFIG[merchant]['options']
+    return [list(combo) for size in range(len(options) + 1) for combo in combinations(options, size)]
+
+
+def compare_discount_combinations(total_krw, merchants=None):
+    """
+    一次计算所有商家所有优惠组合下的价格，按最终实付升序排列
+
+    Returns:
+        列表 [{"merchant", "discounts", 以及 calculate_detailed_price 的各字段}]
+    """
+    merchants = merchants or list(DISCOUNT_CONFIG)
+    labels = []
+    discount_sets = []
+    for merchant in merchants:
+        for combo in discount_combinations(merchant):
+            labels.append((merchant, [option['name'] for option in combo]))
+            discount_sets.append(combo)
+
+    priced = price_matrix([total_krw], discount_sets)
+    rows = []
+    for k, (merchant, names) in enumerate(labels):
+        row = {"merchant": merchant, "discounts": names}
+        row.update({field: to_scalar(priced[field][k, 0]) for field in RESULT_FIELDS})
+        rows.append(row)
+
+    rows.sort(key=lambda row: row['final_payment'])
+    return rows
+
+
+def to_scalar(value):
+    """数组元素转换为 Python 数值（整数值返回 int）"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
@@ -1,10 +1,14 @@
 import requests
 import re
+import time
+import concurrent.futures
 from lxml import html
 from cache_manager import product_cache  # 新增导入
 import streamlit as st
 import json # Added for extract_variant_json_from_html
 from bs4 import BeautifulSoup # Added for extract_variant_json_from_html
+from rate_limiter import governed_get
+from catalog_store import catalog_store
 
 @st.cache_data(ttl=3600)
 def fetch_html_from_url(url):
@@ -17,7 +21,7 @@ def fetch_html_from_url(url):
             "Connection": "keep-alive"
         }
 
-        response = requests.get(url, headers=headers, timeout=10)
+        response = governed_get(url, headers=headers, timeout=10)
         response.raise_for_status()
 
         html_content = response.text
@@ -28,16 +32,19 @@ def fetch_html_from_url(url):
         return None
 
 
-@st.cache_data(ttl=3600)
 def extract_product_details(detail_url):
-    """提取产品详情页的描述、年份信息和准确型号（支持缓存）"""
-    try:
-        html_content = fetch_html_from_url(detail_url)
-        if not html_content:
-            return None
+    """提取产品详情页的描述、年份信息和准确型号（读取变体索引）"""
+    index = get_variant_index(detail_url)
+    if not index:
+        return None
+    return index["details"]
+
 
+def _parse_product_details(html_content, normalized_content):
+    """解析描述、年份信息和准确型号"""
+    try:
         # 使用正则表达式提取年份款式信息
-        year_match = re.search(r'\\"season\\":\\"(\d+\/\w+)\\"', html_content)
+        year_match = _SEASON_RE.search(normalized_content)
         year_info = year_match.group(1) if year_match else "未找到年份信息"
 
         # 提取产品描述
@@ -119,6 +126,154 @@ def parse_hex_list(hex_string):
     return []
 
 
+# 产品页中的选项数据（颜色/尺码/SKU）统一格式：去掉转义后一次扫描即可
+# 颜色选项: "parent_ids":[0]，带 color_chips / image_chip
+# 尺码选项: "parent_ids":[0,颜色ID]，带 sell_price / stock
+_OPTION_RE = re.compile(
+    r'"id":(\d+),"parent_ids":\[(0(?:,\d+)?)\],"sale_state":"(\w*)","value":"([^"]*)","adjust_price":(\d+)'
+    r'(?:,"color_chips":\[([^\]]*)\],"image_chip":"([^"]*)"'
+    r'|,"sell_price":(\d+),"is_orderable":\w+,"stock":(\d+))?'
+)
+_SEASON_RE = re.compile(r'"season":"(\d+/\w+)"')
+# 回退方案使用的SKU格式（与颜色选项无关，按 parent_ids 中的颜色ID归属）
+_LEGACY_SKU_RE = re.compile(
+    r'"id":(\d+),"parent_ids":\[0,(\d+)\],"sale_state":"\w+","value":"([^"]*)",'
+    r'"adjust_price":(\d+),"sell_price":(\d+),"is_orderable":\w+,"stock":(\d+)'
+)
+
+
+def _normalize_html(html_content):
+    """去掉内嵌JSON的转义符，使转义/未转义两种格式可以用同一个正则匹配"""
+    return html_content.replace('\\"', '"').replace('\\/', '/')
+
+
+def build_variant_index(html_content):
+    """
+    将产品页解析为变体索引（每个页面只解析一次）
+
+    Returns:
+        {
+            "details": {"description", "year_info", "exact_model"},
+            "colors": [{"id", "name", "hex_list", "image_chip"}, ...],
+            "sizes": [尺码, ...],
+            "skus": {颜色名称: {尺码: {"sku_id", "adjust_price", "sell_price", "stock"}}}
+        }
+    """
+    normalized = _normalize_html(html_content)
+
+    colors = []
+    color_names = {}  # 颜色ID -> 颜色名称
+    sizes = []
+    skus = {}
+
+    for match in _OPTION_RE.finditer(normalized):
+        option_id, parent_ids, _, value, adjust_price, color_chips, image_chip, sell_price, stock = match.groups()
+
+        if parent_ids == "0":
+            # 颜色选项
+            if option_id in color_names:
+                continue
+            color_names[option_id] = value
+            colors.append({
+                "id": option_id,
+                "name": value,
+                "hex_list": parse_hex_list(color_chips or ""),
+                "image_chip": image_chip or ""
+            })
+            skus.setdefault(value, {})
+        else:
+            # 尺码选项
+            if value not in sizes:
+                sizes.append(value)
+
+            color_name = color_names.get(parent_ids.split(",")[1])
+            if color_name is not None and sell_price is not None:
+                skus[color_name].setdefault(value, {
+                    "sku_id": option_id,
+                    "adjust_price": adjust_price,
+                    "sell_price": sell_price,
+                    "stock": stock
+                })
+
+    return {
+        "details": _parse_product_details(html_content, normalized),
+        "colors": colors,
+        "sizes": sizes,
+        "skus": skus
+    }
+
+
+def _legacy_sku_index(html_content, colors):
+    """
+    按颜色ID收集SKU信息（变体索引未解析到颜色、颜色来自 _legacy_product_variants 时的回退方案）
+
+    Returns:
+        {颜色名称: {尺码: {"sku_id", "adjust_price", "sell_price", "stock"}}}
+    """
+    normalized = _normalize_html(html_content)
+    color_names = {}  # 颜色ID -> 颜色名称
+    for color in colors:
+        color_id = str(color.get("id", ""))
+        if not color_id.isdigit():
+            # 回退解析生成的颜色没有真实ID时，按颜色名称查找
+            match = re.search(
+                fr'"id":(\d+),"parent_ids":\[0\],"sale_state":"\w+","value":"{re.escape(color["name"])}"',
+                normalized
+            )
+            if not match:
+                continue
+            color_id = match.group(1)
+        color_names[color_id] = color["name"]
+
+    skus = {color["name"]: {} for color in colors}
+    for match in _LEGACY_SKU_RE.finditer(normalized):
+        sku_id, color_id, size, adjust_price, sell_price, stock = match.groups()
+        color_name = color_names.get(color_id)
+        if color_name is not None:
+            skus[color_name].setdefault(size, {
+                "sku_id": sku_id,
+                "adjust_price": adjust_price,
+                "sell_price": sell_price,
+                "stock": stock
+            })
+    return skus
+
+
+def _product_id_from_url(detail_url):
+    """从产品详情页URL中提取产品ID"""
+    match = re.search(r'/products/view/(\d+)', detail_url or "")
+    return match.group(1) if match else None
+
+
+def get_variant_index(detail_url):
+    """获取产品页的变体索引（先查本地产品目录，过期或缺失时才请求产品页；不另做内存缓存，清空目录后立即生效）"""
+    product_id = _product_id_from_url(detail_url)
+    cached_index, fetched_at = catalog_store.get(product_id) if product_id else (None, None)
+    if cached_index and catalog_store.is_fresh(fetched_at):
+        return cached_index
+
+    html_content = fetch_html_from_url(detail_url)
+    if not html_content:
+        # 请求失败时使用过期的目录数据
+        return cached_index
+
+    index = build_variant_index(html_content)
+
+    # 快速解析未找到颜色时，回退到原有的逐项解析逻辑
+    if not index["colors"]:
+        color_options, size_options = _legacy_product_variants(html_content)
+        index["colors"] = color_options or []
+        index["sizes"] = size_options or []
+        index["skus"] = _legacy_sku_index(html_content, index["colors"])
+
+    if product_id and index["colors"]:
+        catalog_store.put(product_id, detail_url, index)
+    elif not index["colors"] and cached_index:
+        return cached_index
+
+    return index
+
+
 @st.cache_data(ttl=3600)
 def extract_variant_json_from_html(html_content):
     """
@@ -178,14 +333,17 @@ def extract_variant_json_from_html(html_content):
         return None
 
 
-@st.cache_data(ttl=3600)
 def get_product_variants(detail_url):
-    """获取产品的颜色和尺码选项（从JSON数据提取）"""
-    try:
-        html_content = fetch_html_from_url(detail_url)
-        if not html_content:
-            return None, None
+    """获取产品的颜色和尺码选项（读取变体索引）"""
+    index = get_variant_index(detail_url)
+    if not index:
+        return None, None
+    return index["colors"], index["sizes"]
+
 
+def _legacy_product_variants(html_content):
+    """获取产品的颜色和尺码选项（从JSON数据提取，变体索引解析失败时的回退方案）"""
+    try:
         # 初始化变量
         color_options = []
         size_options = []
@@ -314,51 +472,92 @@ def get_product_variants(detail_url):
         return [], []
 
 
-@st.cache_data(ttl=3600)
 def get_sku_info(detail_url, color_value, size_value):
-    """获取特定颜色和尺码的SKU信息（支持缓存）"""
-    try:
-        html_content = fetch_html_from_url(detail_url)
-        if not html_content:
-            return None
-
-        # 查找颜色ID
-        escaped_color = re.escape(color_value)
-        pattern_color = fr'\\"id\\":(\d+),\\"parent_ids\\":\[0\],\\"sale_state\\":\\"\w+\\",\\"value\\":\\"{escaped_color}\\"'
-        match_color = re.search(pattern_color, html_content, re.DOTALL)
-
-        if not match_color:
-            pattern_color2 = fr'"id":(\d+),"parent_ids":\[0\],"sale_state":"\w+","value":"{escaped_color}"'
-            match_color = re.search(pattern_color2, html_content, re.DOTALL)
-            if not match_color:
-                return None
-
-        color_id = match_color.group(1)
-
-        # 查找尺码信息
-        escaped_size = re.escape(size_value)
-        pattern_sku = fr'\\"id\\":(\d+),\\"parent_ids\\":\[0,{color_id}\],\\"sale_state\\":\\"\w+\\",\\"value\\":\\"{escaped_size}\\",\\"adjust_price\\":(\d+),\\"sell_price\\":(\d+),\\"is_orderable\\":\w+,\\"stock\\":(\d+),\\"images\\":\[\]'
-        match_sku = re.search(pattern_sku, html_content, re.DOTALL)
-
-        if not match_sku:
-            pattern_sku2 = fr'"id":(\d+),"parent_ids":\[0,{color_id}\],"sale_state":"\w+","value":"{escaped_size}","adjust_price":(\d+),"sell_price":(\d+),"is_orderable":\w+,"stock":(\d+),"images":\[\]'
-            match_sku = re.search(pattern_sku2, html_content, re.DOTALL)
-
-        if match_sku:
-            result = {
-                "sku_id": match_sku.group(1),
-                "adjust_price": match_sku.group(2),
-                "sell_price": match_sku.group(3),
-                "stock": match_sku.group(4)
-            }
-
-            return result
-
+    """获取特定颜色和尺码的SKU信息（变体索引中的字典查找）"""
+    index = get_variant_index(detail_url)
+    if not index:
         return None
 
-    except Exception as e:
-        print(f"SKU信息提取失败: {e}")
-        return None
+    return index["skus"].get(color_value, {}).get(size_value)
+
+
+# 产品详情预取：并发数与单个产品的超时时间（秒）
+PREFETCH_WORKERS = 8
+PREFETCH_TIMEOUT = 20
+
+
+def build_detail_url(product_id):
+    """生成产品详情页URL"""
+    return f"https://arcteryx.co.kr/products/view/{product_id}?sc=100"
+
+
+def load_product_info(product_id):
+    """
+    获取单个产品的详情和变体信息
+
+    Returns:
+        元组: (详情字典 或 None, 完整信息字典 或 None)
+    """
+    detail_url = build_detail_url(product_id)
+    details = extract_product_details(detail_url)
+    color_options, size_options = get_product_variants(detail_url)
+    if details and color_options:
+        full_info = {
+            "details": details,
+            "color_options": color_options,
+            "size_options": size_options,
+            "detail_url": detail_url
+        }
+    else:
+        full_info = None
+    return details, full_info
+
+
+def prefetch_product_infos(product_ids, max_workers=PREFETCH_WORKERS, timeout_per_item=PREFETCH_TIMEOUT):
+    """
+    并发预取多个产品的详情页并解析（按完成顺序逐个返回）
+
+    Yields:
+        元组: (product_id, 详情字典 或 None, 完整信息字典 或 None)
+        超时或失败的产品返回 (product_id, None, None)
+    """
+    if not product_ids:
+        return
+
+    started_at = {}
+
+    def worker(pid):
+        started_at[pid] = time.monotonic()
+        return load_product_info(pid)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        future_to_id = {executor.submit(worker, pid): pid for pid in product_ids}
+        pending = set(future_to_id)
+
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, timeout=1, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                pid = future_to_id[future]
+                try:
+                    details, full_info = future.result()
+                except Exception as e:
+                    print(f"产品 {pid} 预取失败: {e}")
+                    details, full_info = None, None
+                yield pid, details, full_info
+
+            # 单个产品超时：放弃等待（线程会在请求超时后自行结束）
+            now = time.monotonic()
+            for future in list(pending):
+                pid = future_to_id[future]
+                if pid in started_at and now - started_at[pid] > timeout_per_item:
+                    print(f"⏰ 产品 {pid} 预取超时")
+                    pending.discard(future)
+                    yield pid, None, None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 # 新增：缓存管理函数
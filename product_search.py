@@ -2,6 +2,7 @@ import requests
 import json
 from urllib.parse import quote
 import streamlit as st
+from rate_limiter import governed_get
 
 def generate_api_url(product_model, gender="MALE", page=1, display_size=16):
     """生成API请求URL"""
@@ -34,7 +35,7 @@ def extract_product_ids_from_api(api_url):
             "Referer": "https://arcteryx.co.kr/"
         }
 
-        response = requests.get(api_url, headers=headers, timeout=10)
+        response = governed_get(api_url, headers=headers, timeout=10)
         response.raise_for_status()
 
         data = response.json()
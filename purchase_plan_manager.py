@@ -16,6 +16,19 @@ def load_plans():
         return []
 
 
+def plan_item_from_favorite(favorite: dict) -> dict:
+    """由收藏产品生成 add_to_plan 所需的产品信息"""
+    return {
+        "product_model": favorite['product_model'],
+        "exact_model": favorite.get('exact_model', ''),
+        "color": favorite['color'],
+        "size": favorite['size'],
+        "price_krw": int(favorite['price']),
+        "year_info": favorite.get('year_info', ''),
+        "domestic_price_cny": favorite.get('china_price_cny', None)
+    }
+
+
 def add_to_plan(store_name: str, product_info: dict) -> bool:
     """
     添加产品到购买计划
@@ -88,22 +101,80 @@ def remove_store_from_plan(store_name: str) -> bool:
         return False
 
 
-def get_plans_grouped_by_store() -> dict:
+class PlanIndex:
+    """购买计划索引（由计划列表一次性构建，查询均为 O(1)）
+
+    - (product_model, color, size) -> 所在店铺元组（按计划顺序，用于显示）和店铺集合（用于成员检查）
+    - 店铺 -> 计划产品列表（按店铺名称排序）
+    - 每个店铺预先汇总税前总价和国内价格总额
     """
-    获取购买计划，按店铺分组
+
+    def __init__(self, plans: list):
+        self.plans = plans
+        stores_by_product = {}
+        products_by_store = {}
+
+        for plan in plans:
+            key = (plan["product_model"], plan["color"], plan["size"])
+            # 字典保持插入顺序，同时去重
+            stores_by_product.setdefault(key, {})[plan["store_name"]] = None
+            products_by_store.setdefault(plan["store_name"], []).append(plan)
+
+        self._stores_by_product = {key: tuple(stores) for key, stores in stores_by_product.items()}
+        self._store_sets = {key: frozenset(stores) for key, stores in stores_by_product.items()}
+
+        # 按店铺名称排序（按字母顺序）
+        self._products_by_store = dict(sorted(products_by_store.items()))
+        self._krw_totals = {
+            store: calculate_store_total_price(products)
+            for store, products in self._products_by_store.items()
+        }
+        self._domestic_totals = {
+            store: calculate_store_domestic_total(products)
+            for store, products in self._products_by_store.items()
+        }
+
+    def stores_for(self, product_model: str, color: str, size: str) -> tuple:
+        """产品所在的店铺（元组，按计划顺序）"""
+        return self._stores_by_product.get((product_model, color, size), ())
+
+    def contains(self, product_model: str, color: str, size: str, store_name: str = None) -> bool:
+        """产品是否在购买计划中（提供store_name时检查特定店铺）"""
+        stores = self._store_sets.get((product_model, color, size), frozenset())
+        if store_name:
+            return store_name in stores
+        return bool(stores)
+
+    def grouped(self) -> dict:
+        """按店铺分组的计划: {店铺名: [产品1, 产品2, ...]}"""
+        return self._products_by_store
+
+    def products_for_store(self, store_name: str) -> list:
+        """店铺下的计划产品"""
+        return self._products_by_store.get(store_name, [])
+
+    def krw_total(self, store_name: str) -> int:
+        """店铺税前总价（韩元）"""
+        return self._krw_totals.get(store_name, 0)
+
+    def domestic_total(self, store_name: str) -> tuple:
+        """店铺国内价格总额: (总额, 是否所有产品都有国内价格)"""
+        return self._domestic_totals.get(store_name, (0, True))
+
+
+def build_plan_index(plans: list = None) -> PlanIndex:
+    """构建购买计划索引（未传入计划列表时从Supabase加载）"""
+    if plans is None:
+        plans = load_plans()
+    return PlanIndex(plans)
+
+
+def get_plans_grouped_by_store(plans: list = None) -> dict:
+    """
+    获取购买计划，按店铺分组（可传入已加载的计划列表，避免重复查询）
     返回格式: {店铺名: [产品1, 产品2, ...]}
     """
-    plans = load_plans()
-    grouped = {}
-    
-    for plan in plans:
-        store = plan["store_name"]
-        if store not in grouped:
-            grouped[store] = []
-        grouped[store].append(plan)
-    
-    # 按店铺名称排序（按字母顺序）
-    return dict(sorted(grouped.items()))
+    return build_plan_index(plans).grouped()
 
 
 def calculate_store_total_price(products: list) -> int:
@@ -140,29 +211,19 @@ def check_product_in_plan(product_model: str, color: str, size: str, store_name:
       - 如果store_name未提供: (是否存在于任何店铺, 存在的店铺列表 或 None)
     """
     try:
-        plans = load_plans()
+        plan_index = build_plan_index()
         
         if store_name:
             # 检查产品是否在特定店铺存在
-            for plan in plans:
-                if (plan["product_model"] == product_model and 
-                    plan["color"] == color and 
-                    plan["size"] == size and
-                    plan["store_name"] == store_name):
-                    return (True, store_name)
+            if plan_index.contains(product_model, color, size, store_name):
+                return (True, store_name)
             return (False, None)
         else:
             # 返回产品所在的所有店铺
-            stores = []
-            for plan in plans:
-                if (plan["product_model"] == product_model and 
-                    plan["color"] == color and 
-                    plan["size"] == size):
-                    if plan["store_name"] not in stores:
-                        stores.append(plan["store_name"])
+            stores = plan_index.stores_for(product_model, color, size)
             
             if stores:
-                return (True, stores)
+                return (True, list(stores))
             else:
                 return (False, None)
     except Exception as e:
@@ -0,0 +1,140 @@
+# rate_history.py
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from catalog_store import CACHE_DIR
+
+# 数据库结构版本：结构变化时递增，旧数据会被自动清空重建
+SCHEMA_VERSION = 1
+
+RATE_HISTORY_DB_PATH = os.path.join(CACHE_DIR, "rate_history.sqlite3")
+
+# 汇率统计使用的分位数
+RATE_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class RateHistoryStore:
+    """本地 SQLite 汇率历史（记录每次成功获取的汇率，10000韩元兑人民币）"""
+
+    def __init__(self, db_path=RATE_HISTORY_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _ensure_schema(self):
+        """初始化数据库结构（版本不一致时重建）"""
+        if self._ready:
+            return
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS rates")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rates (
+                    fetched_at REAL PRIMARY KEY,
+                    rate REAL NOT NULL
+                )
+            """)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._ready = True
+
+    def record(self, rate, fetched_at=None):
+        """记录一次获取到的汇率"""
+        try:
+            with self._lock:
+                self._ensure_schema()
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO rates (fetched_at, rate) VALUES (?, ?)",
+                        (fetched_at or time.time(), float(rate))
+                    )
+        except (sqlite3.Error, OSError) as e:
+            print(f"汇率历史写入失败: {e}")
+
+    def latest(self):
+        """最近一次记录的汇率，返回 (汇率, 时间戳)，没有记录时返回 None"""
+        try:
+            with self._lock:
+                self._ensure_schema()
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT rate, fetched_at FROM rates ORDER BY fetched_at DESC LIMIT 1"
+                    ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            print(f"汇率历史读取失败: {e}")
+            return None
+        return tuple(row) if row else None
+
+    def history(self, days=None):
+        """
+        读取汇率历史（按时间升序）
+
+        Args:
+            days: 只读取最近多少天（None 为全部）
+
+        Returns:
+            元组: (时间戳数组, 汇率数组)
+        """
+        since = time.time() - days * 86400 if days else 0
+        try:
+            with self._lock:
+                self._ensure_schema()
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        "SELECT fetched_at, rate FROM rates WHERE fetched_at >= ? ORDER BY fetched_at",
+                        (since,)
+                    ).fetchall()
+        except (sqlite3.Error, OSError) as e:
+            print(f"汇率历史读取失败: {e}")
+            rows = []
+
+        if not rows:
+            return np.zeros(0), np.zeros(0)
+        timestamps, rates = np.array(rows, dtype=np.float64).T
+        return timestamps, rates
+
+    def summary(self, days=None):
+        """
+        汇率统计（最低、最高、平均、最新及分位数）
+
+        Returns:
+            字典 {"count", "min", "max", "mean", "latest", "first_at", "last_at", "percentiles": {分位: 汇率}}，
+            没有历史记录时返回 None
+        """
+        timestamps, rates = self.history(days)
+        if not len(rates):
+            return None
+        return {
+            "count": len(rates),
+            "min": float(rates.min()),
+            "max": float(rates.max()),
+            "mean": float(rates.mean()),
+            "latest": float(rates[-1]),
+            "first_at": float(timestamps[0]),
+            "last_at": float(timestamps[-1]),
+            "percentiles": dict(zip(RATE_PERCENTILES, np.percentile(rates, RATE_PERCENTILES).tolist()))
+        }
+
+    def count(self):
+        """获取汇率记录数量"""
+        try:
+            with self._lock:
+                self._ensure_schema()
+                with self._connect() as conn:
+                    return conn.execute("SELECT COUNT(*) FROM rates").fetchone()[0]
+        except (sqlite3.Error, OSError) as e:
+            print(f"汇率历史读取失败: {e}")
+            return 0
+
+
+# 创建全局汇率历史实例
+rate_history = RateHistoryStore()
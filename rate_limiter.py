@@ -0,0 +1,222 @@
+# rate_limiter.py
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+# 令牌桶速率（请求/秒）与并发上下限
+DEFAULT_RATE = 20.0
+MIN_RATE = 1.0
+MAX_RATE = 50.0
+MIN_CONCURRENCY = 2
+MAX_CONCURRENCY = 20
+INITIAL_CONCURRENCY = 10
+
+# 延迟超过该值（秒）视为上游拥塞
+TARGET_LATENCY = 1.5
+
+# 熔断：连续失败次数阈值与冷却时间（秒）
+FAILURE_THRESHOLD = 5
+COOLDOWN_SECONDS = 30
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开时拒绝请求"""
+
+
+class ApiGovernor:
+    """arcteryx.co.kr 接口的共享流量控制器
+
+    - 令牌桶限制请求速率
+    - AIMD 根据延迟和 429/5xx 比例自适应调整并发数与速率
+    - 熔断器在连续失败时暂停请求，冷却后放行单个探测请求
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_RATE, target_latency=TARGET_LATENCY,
+                 failure_threshold=FAILURE_THRESHOLD, cooldown_seconds=COOLDOWN_SECONDS):
+        self.rate = rate
+        self.burst = burst
+        self.target_latency = target_latency
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._limit = float(INITIAL_CONCURRENCY)
+        self._last_decrease = 0.0
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._probe_id = 0
+
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._slot_available = threading.Condition(self._lock)
+
+    @property
+    def concurrency_limit(self):
+        """当前允许的并发数"""
+        return int(self._limit)
+
+    @property
+    def state(self):
+        return self._state
+
+    def _check_circuit(self):
+        """检查熔断状态（需持有锁），放行的是半开状态的探测请求时返回探测令牌，否则返回 None"""
+        if self._state == CLOSED:
+            return None
+        now = time.monotonic()
+        if self._state == OPEN and now - self._opened_at >= self.cooldown_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        if self._state == HALF_OPEN and self._probe_in_flight and now - self._probe_started_at >= self.cooldown_seconds:
+            # 探测请求超过冷却时间仍未回报结果（调用方异常退出等），视为丢失，放行新的探测
+            print("⚠ 熔断探测请求未回报结果，重新探测")
+            self._probe_in_flight = False
+        if self._state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            self._probe_started_at = now
+            self._probe_id += 1
+            return self._probe_id
+        raise CircuitOpenError("上游接口熔断中，请稍后重试")
+
+    def _reserve_token(self):
+        """预留一个令牌，返回需要等待的秒数（需持有锁）"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def acquire(self):
+        """同步获取请求许可（可能抛出 CircuitOpenError），返回探测令牌（非探测请求为 None）"""
+        with self._lock:
+            probe = self._check_circuit()
+            wait = self._reserve_token()
+        if wait > 0:
+            time.sleep(wait)
+        return probe
+
+    async def acquire_async(self):
+        """异步获取请求许可（可能抛出 CircuitOpenError），返回探测令牌（非探测请求为 None）"""
+        with self._lock:
+            probe = self._check_circuit()
+            wait = self._reserve_token()
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.release_probe(probe)
+                raise
+        return probe
+
+    @contextmanager
+    def slot(self):
+        """同步并发控制：等待空闲并发位并获取令牌，产出探测令牌（结果需传给 record 的 probe 参数）"""
+        with self._slot_available:
+            while self._in_flight >= self.concurrency_limit:
+                self._slot_available.wait()
+            self._in_flight += 1
+        try:
+            yield self.acquire()
+        finally:
+            with self._slot_available:
+                self._in_flight -= 1
+                self._slot_available.notify_all()
+
+    def record(self, latency, status=None, error=None, probe=None):
+        """
+        记录一次请求结果，驱动 AIMD 调整与熔断状态
+
+        熔断打开后，此前发出的请求陆续返回的结果不改变熔断状态；
+        半开状态下只有当前探测请求（probe 为 acquire 返回的令牌）的结果能关闭或重新打开熔断。
+        """
+        throttled = error is not None or status == 429 or (status is not None and status >= 500)
+
+        with self._lock:
+            now = time.monotonic()
+            if throttled or latency > self.target_latency:
+                # 乘性减：同一秒内只减一次，避免一批失败把并发直接压到最低
+                if now - self._last_decrease >= 1.0:
+                    factor = 0.5 if throttled else 0.8
+                    self._limit = max(MIN_CONCURRENCY, self._limit * factor)
+                    self.rate = max(MIN_RATE, self.rate * factor)
+                    self._last_decrease = now
+            else:
+                # 加性增：每个往返周期大约增加一个并发
+                self._limit = min(MAX_CONCURRENCY, self._limit + 1.0 / self._limit)
+                self.rate = min(MAX_RATE, self.rate + 0.5)
+
+            is_probe = (probe is not None and probe == self._probe_id
+                        and self._state == HALF_OPEN and self._probe_in_flight)
+            if is_probe:
+                self._probe_in_flight = False
+                if throttled:
+                    self._failures += 1
+                    print(f"⚠ 熔断探测请求失败，继续熔断 {self.cooldown_seconds} 秒")
+                    self._state = OPEN
+                    self._opened_at = now
+                else:
+                    self._failures = 0
+                    self._state = CLOSED
+            elif self._state == CLOSED:
+                if throttled:
+                    self._failures += 1
+                    if self._failures >= self.failure_threshold:
+                        print(f"⚠ 上游接口连续失败 {self._failures} 次，熔断 {self.cooldown_seconds} 秒")
+                        self._state = OPEN
+                        self._opened_at = now
+                else:
+                    self._failures = 0
+
+        with self._slot_available:
+            self._slot_available.notify_all()
+
+    def release_probe(self, probe):
+        """请求未完成就被取消时调用：释放探测名额，不计入成功或失败（probe 为 None 或已过期时忽略）"""
+        if probe is None:
+            return
+        with self._lock:
+            if probe == self._probe_id:
+                self._probe_in_flight = False
+
+    def get_statistics(self):
+        """获取当前流控状态"""
+        with self._lock:
+            return {
+                "state": self._state,
+                "concurrency_limit": self.concurrency_limit,
+                "rate": round(self.rate, 1),
+                "in_flight": self._in_flight,
+                "consecutive_failures": self._failures
+            }
+
+
+def governed_get(url, session=None, **kwargs):
+    """经过共享流控的 GET 请求（返回 requests.Response，不检查状态码）"""
+    http = session or requests
+    with api_governor.slot() as probe:
+        start = time.monotonic()
+        try:
+            response = http.get(url, **kwargs)
+        except Exception as e:
+            api_governor.record(time.monotonic() - start, error=e, probe=probe)
+            raise
+    api_governor.record(time.monotonic() - start, status=response.status_code, probe=probe)
+    return response
+
+
+# 创建全局流控实例（库存、搜索、详情页请求共用）
+api_governor = ApiGovernor()
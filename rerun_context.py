@@ -0,0 +1,82 @@
+# rerun_context.py
+import itertools
+
+import streamlit as st
+
+from favorites_manager import load_favorites
+from purchase_plan_manager import load_plans, PlanIndex
+
+_CONTEXT_KEY = "_rerun_context"
+_run_ids = itertools.count(1)
+
+
+class RerunContext:
+    """单次重跑内的数据上下文
+
+    每张表在一次重跑中最多从 Supabase 加载一次，成员查询都在内存索引上完成。
+    写操作后调用 invalidate()，下次访问时重新加载。
+    """
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self._data = {}
+
+    def _get(self, name, builder):
+        if name not in self._data:
+            self._data[name] = builder()
+        return self._data[name]
+
+    def invalidate(self, name=None):
+        """清除指定数据（favorites / plans）或全部数据"""
+        if name is None:
+            self._data.clear()
+            return
+        # 派生索引随源数据一起失效
+        for key in list(self._data):
+            if key == name or key.startswith(f"{name}:"):
+                del self._data[key]
+
+    @property
+    def favorites(self):
+        """收藏列表（按添加时间倒序）"""
+        return self._get("favorites", load_favorites)
+
+    @property
+    def plans(self):
+        """购买计划列表"""
+        return self._get("plans", load_plans)
+
+    def _build_favorite_index(self):
+        return {
+            (fav["product_model"], fav["color"], fav["size"]): fav
+            for fav in reversed(self.favorites)
+        }
+
+    def find_favorite(self, product_model, color, size):
+        """按 (型号, 颜色, 尺码) 查找收藏记录"""
+        index = self._get("favorites:by_key", self._build_favorite_index)
+        return index.get((product_model, color, size))
+
+    @property
+    def plan_index(self):
+        """购买计划索引"""
+        return self._get("plans:index", lambda: PlanIndex(self.plans))
+
+    def stores_for(self, product_model, color, size):
+        """产品所在购买计划的店铺（元组，按计划顺序）"""
+        return self.plan_index.stores_for(product_model, color, size)
+
+
+def begin_rerun():
+    """在每次重跑开始时调用，创建新的数据上下文"""
+    context = RerunContext(next(_run_ids))
+    st.session_state[_CONTEXT_KEY] = context
+    return context
+
+
+def get_context():
+    """获取当前重跑的数据上下文（未初始化时自动创建）"""
+    context = st.session_state.get(_CONTEXT_KEY)
+    if context is None:
+        context = begin_rerun()
+    return context
@@ -0,0 +1,93 @@
+# scenario_pricing.py
+import numpy as np
+
+from plan_optimizer import best_once_only_stores, merchant_discounts, split_once_only
+from pricing_engine import price_baskets
+from store_registry import store_registry
+
+
+def scenario_rates(summary, current_rate=None):
+    """
+    由汇率历史统计生成情景汇率
+
+    Args:
+        summary: rate_history.summary() 的返回值（可为 None）
+        current_rate: 当前汇率（可为 None）
+
+    Returns:
+        有序字典 {情景名称: 汇率（10000韩元兑人民币）}
+    """
+    rates = {}
+    if current_rate:
+        rates["当前汇率"] = float(current_rate)
+    if summary:
+        rates["历史最低"] = summary["min"]
+        for percentile, rate in summary["percentiles"].items():
+            rates[f"P{percentile}"] = rate
+        rates["历史平均"] = summary["mean"]
+        rates["历史最高"] = summary["max"]
+    return rates
+
+
+def default_store_discounts(store_name):
+    """店铺默认适用的商家优惠"""
+    return merchant_discounts(store_registry.get(store_name).merchant)
+
+
+def price_plans_across_rates(plans_by_store, rates, discounts_for_store=default_store_discounts):
+    """
+    所有店铺的购买计划在多个汇率下的人民币价格（一次批量计算）
+
+    韩元实付与汇率无关：同一组优惠的店铺一次 price_baskets 批量计算，再与汇率向量做外积。
+    仅限一次的优惠在同一商家中只计入节省最多的一家店铺。
+
+    Args:
+        plans_by_store: {店铺: [产品]}（产品需包含 price_krw）
+        rates: 汇率列表（10000韩元兑人民币）
+        discounts_for_store: 店铺 -> 优惠选项列表
+
+    Returns:
+        字典: {
+            "stores": 店铺名称列表,
+            "total_krw": 税前总价数组 (店铺数,),
+            "final_payment": 韩元实付数组 (店铺数,),
+            "cny": 人民币实付数组 (店铺数, 汇率数),
+            "total_cny": 全部店铺人民币实付合计 (汇率数,)
+        }
+    """
+    stores = list(plans_by_store)
+    totals = np.array([sum(int(product['price_krw']) for product in plans_by_store[store]) for store in stores],
+                      dtype=np.float64)
+    final_payment = np.zeros(len(stores), dtype=np.float64)
+
+    # 按优惠组合分组批量计算韩元实付（先不含仅限一次的优惠）
+    groups = {}
+    discount_sets = {}
+    for k, store in enumerate(stores):
+        discounts = discounts_for_store(store)
+        key = tuple(option['name'] for option in discounts)
+        groups.setdefault(key, []).append(k)
+        discount_sets[key] = discounts
+
+    gains = np.zeros(len(stores), dtype=np.float64)  # 使用仅限一次优惠时额外节省的金额
+    for key, indices in groups.items():
+        base, once = split_once_only(discount_sets[key])
+        final_payment[indices] = price_baskets(totals[indices], base)['final_payment']
+        if once:
+            full = price_baskets(totals[indices], discount_sets[key])['final_payment']
+            gains[indices] = np.maximum(final_payment[indices] - full, 0)
+
+    # 每个商家只有一家店铺使用仅限一次的优惠
+    merchants = [store_registry.get(store).merchant for store in stores]
+    for k in best_once_only_stores(merchants, gains.tolist()):
+        final_payment[k] -= gains[k]
+
+    rates = np.asarray(rates, dtype=np.float64)
+    cny = np.outer(final_payment, rates) / 10000
+    return {
+        "stores": stores,
+        "total_krw": totals,
+        "final_payment": final_payment,
+        "cny": cny,
+        "total_cny": cny.sum(axis=0)
+    }
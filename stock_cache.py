@@ -0,0 +1,103 @@
+# stock_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+# 库存缓存配置（秒）：TTL 内直接使用；超过 TTL 但未超过过期上限时先返回旧数据再后台刷新
+STOCK_CACHE_TTL_SECONDS = 120
+STOCK_CACHE_STALE_SECONDS = 600
+STOCK_CACHE_MAX_ENTRIES = 5000
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class StockCache:
+    """进程级库存缓存（按 product_option_id 缓存店铺库存列表，所有会话共享）"""
+
+    def __init__(self, ttl_seconds=STOCK_CACHE_TTL_SECONDS, stale_seconds=STOCK_CACHE_STALE_SECONDS,
+                 max_entries=STOCK_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # product_id -> (fetched_at, rows)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def lookup(self, product_id):
+        """
+        查询缓存
+
+        Returns:
+            元组: (店铺库存列表 或 None, 状态 FRESH/STALE/MISS)
+        """
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is None:
+                self.misses += 1
+                return None, MISS
+
+            fetched_at, rows = entry
+            age = time.time() - fetched_at
+            if age <= self.ttl_seconds:
+                self._entries.move_to_end(product_id)
+                self.hits += 1
+                return rows, FRESH
+            if age <= self.stale_seconds:
+                self._entries.move_to_end(product_id)
+                self.stale_hits += 1
+                return rows, STALE
+
+            del self._entries[product_id]
+            self.misses += 1
+            return None, MISS
+
+    def put(self, product_id, rows):
+        """写入缓存（空结果不缓存）"""
+        if not rows:
+            return
+        with self._lock:
+            self._entries[product_id] = (time.time(), rows)
+            self._entries.move_to_end(product_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def begin_refresh(self, product_ids):
+        """标记需要后台刷新的产品，返回此前未在刷新中的产品ID列表（避免重复刷新）"""
+        with self._lock:
+            claimed = [pid for pid in product_ids if pid not in self._refreshing]
+            self._refreshing.update(claimed)
+            return claimed
+
+    def end_refresh(self, product_ids):
+        """取消刷新标记"""
+        with self._lock:
+            self._refreshing.difference_update(product_ids)
+
+    def invalidate(self, product_id=None):
+        """清除单个产品或全部缓存"""
+        with self._lock:
+            if product_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(product_id, None)
+
+    def get_statistics(self):
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "count": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "ttl_seconds": self.ttl_seconds,
+                "stale_seconds": self.stale_seconds
+            }
+
+
+# 创建全局库存缓存实例
+stock_cache = StockCache()
@@ -0,0 +1,179 @@
+# stock_engine.py
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+import time
+
+import aiohttp
+
+from rate_limiter import api_governor, MAX_CONCURRENCY
+
+STORES_API_URL = "https://api.arcteryx.co.kr/api/stores"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "application/json",
+    "Connection": "keep-alive"
+}
+
+
+def build_stock_query_url(product_id):
+    """生成库存查询URL"""
+    return (f"{STORES_API_URL}?limit=0&page=1&local_code=&search_keyword=&x=&y="
+            f"&product_option_id={product_id}&orderby=store_sort%7Casc")
+
+
+class AsyncStockEngine:
+    """异步库存查询引擎
+
+    在后台线程中运行一个常驻事件循环，所有查询共享同一个 aiohttp 会话（keep-alive连接池），
+    避免每个SKU都重新建立 TCP+TLS 连接。实际并发数和请求速率由 api_governor 自适应控制。
+    """
+
+    def __init__(self, max_connections=MAX_CONCURRENCY, keepalive_timeout=60):
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._gate = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """启动后台事件循环（进程内只启动一次）"""
+        with self._lock:
+            if self._loop is not None and self._thread.is_alive():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="stock-engine-loop", daemon=True)
+            thread.start()
+            self._loop = loop
+            self._thread = thread
+            self._session = None
+            self._gate = None
+            self._in_flight = 0
+            return loop
+
+    async def _get_session(self):
+        """获取共享会话（在事件循环线程内懒加载）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS)
+        return self._session
+
+    async def _enter_gate(self, concurrency):
+        """等待空闲并发位（上限取调用方并发数与流控当前并发数的较小值）"""
+        if self._gate is None:
+            self._gate = asyncio.Condition()
+        async with self._gate:
+            await self._gate.wait_for(
+                lambda: self._in_flight < min(concurrency, api_governor.concurrency_limit)
+            )
+            self._in_flight += 1
+
+    async def _leave_gate(self):
+        async with self._gate:
+            self._in_flight -= 1
+            self._gate.notify_all()
+
+    async def _fetch_stock(self, session, product_id, concurrency, timeout):
+        """查询单个产品的库存"""
+        await self._enter_gate(concurrency)
+        try:
+            probe = await api_governor.acquire_async()
+            client_timeout = aiohttp.ClientTimeout(total=timeout)
+            start = time.monotonic()
+            try:
+                async with session.get(build_stock_query_url(product_id), timeout=client_timeout) as response:
+                    status = response.status
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+            except aiohttp.ClientResponseError as e:
+                api_governor.record(time.monotonic() - start, status=e.status, probe=probe)
+                raise
+            except asyncio.CancelledError:
+                api_governor.release_probe(probe)
+                raise
+            except Exception as e:
+                # 连接错误、超时、响应解析失败等都要回报，否则熔断探测名额不会释放
+                api_governor.record(time.monotonic() - start, error=e, probe=probe)
+                raise
+            api_governor.record(time.monotonic() - start, status=status, probe=probe)
+        finally:
+            await self._leave_gate()
+
+        if data.get("success"):
+            return data["data"]["rows"]
+        return []
+
+    async def _query_one(self, session, product_id, concurrency, timeout, outcomes):
+        """查询单个产品并立即记录结果（整体超时被取消时，已完成的结果仍然保留）"""
+        try:
+            outcomes[product_id] = await self._fetch_stock(session, product_id, concurrency, timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            outcomes[product_id] = e
+
+    async def _query_many(self, product_ids, concurrency, timeout, outcomes):
+        session = await self._get_session()
+        await asyncio.gather(
+            *(self._query_one(session, pid, concurrency, timeout, outcomes) for pid in product_ids)
+        )
+        return outcomes
+
+    def query_many(self, product_ids, concurrency=10, timeout=10):
+        """
+        并发查询多个产品的库存
+
+        Returns:
+            字典 {product_id: 店铺库存列表 或 异常对象}
+            整体超时时取消未完成的请求，只返回已完成的产品（调用方可只对缺失的产品重试）
+        """
+        if not product_ids:
+            return {}
+
+        concurrency = max(1, min(concurrency, self.max_connections))
+        loop = self._ensure_loop()
+        outcomes = {}
+        future = asyncio.run_coroutine_threadsafe(
+            self._query_many(list(product_ids), concurrency, timeout, outcomes), loop
+        )
+
+        # 整体超时：按当前并发估算批次，加上令牌桶排队时间，再留出余量
+        effective = max(1, min(concurrency, api_governor.concurrency_limit))
+        waves = -(-len(product_ids) // effective)
+        try:
+            return future.result(timeout=waves * timeout + len(product_ids) / api_governor.rate + 5)
+        except concurrent.futures.TimeoutError:
+            # 取消仍在进行的请求，避免与调用方的重试同时访问上游
+            future.cancel()
+            completed = dict(outcomes)
+            print(f"⏰ 批量库存查询超时，已完成 {len(completed)}/{len(product_ids)} 个，其余请求已取消")
+            return completed
+
+    def close(self):
+        """关闭共享会话并停止事件循环"""
+        with self._lock:
+            loop, session = self._loop, self._session
+            self._loop = None
+            self._thread = None
+            self._session = None
+
+        if loop is None:
+            return
+        if session is not None and not session.closed:
+            asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+# 创建全局库存查询引擎实例
+stock_engine = AsyncStockEngine()
+atexit.register(stock_engine.close)
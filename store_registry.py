@@ -0,0 +1,319 @@
+# store_registry.py
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional
+
+# 官方API的52家店铺数据（从用户提供的JSON中提取）
+official_stores = {
+    81: {"name": "아크테릭스 롯데백화점 본점", "address_full": "(04533) 서울 중구 남대문로 81 롯데백화점본점 7층", "code": "SB301"},
+    82: {"name": "아크테릭스 롯데백화점 평촌점", "address_full": "(14073) 경기 안양시 동안구 시민대로 180 롯데백화점 평촌점 4층", "code": "SB308"},
+    87: {"name": "아크테릭스 플래그십 스토어 강남", "address_full": "(06018) 서울 강남구 선릉로157길 18 아크테릭스 플래그십 스토어 강남", "code": "SA211"},
+    88: {"name": "아크테릭스 플래그십 스토어 대구수성", "address_full": "(42089) 대구 수성구 달구벌대로 2560 아크테릭스 플래그십 스토어 대구수성", "code": "SA205"},
+    89: {"name": "아크테릭스 도봉산점", "address_full": "(01300) 서울 도봉구 도봉산길 59 아크테릭스 도봉산점", "code": "SA204"},
+    90: {"name": "아크테릭스 봉무점", "address_full": "(41020) 대구 동구 팔공로 340 아크테릭스 봉무점", "code": "SA207"},
+    91: {"name": "아크테릭스 부산점", "address_full": "(48984) 부산 중구 구덕로 39 (남포동4가) 1층 아크테릭스 부산점", "code": "SA208"},
+    92: {"name": "아크테릭스 여주프리미엄빌리지점", "address_full": "(12646) 경기 여주시 명품1로 42-5 아크테릭스 여주프리미엄빌리지점", "code": "SC102"},
+    93: {"name": "아크테릭스 일산점", "address_full": "(10447) 경기 고양시 일산동구 중앙로 1080 116-117호", "code": "SA202"},
+    94: {"name": "아크테릭스 종로점", "address_full": "(03196) 서울 종로구 동호로38길 23 아크테릭스 종로점", "code": "SA201"},
+    95: {"name": "아크테릭스 롯데프리미엄아울렛 의왕점", "address_full": "(16016) 경기 의왕시 바라산로 1 롯데프리미엄아울렛 타임빌라스점 2층", "code": "SB338"},
+    96: {"name": "아크테릭스 롯데프리미엄아울렛 동부산점", "address_full": "(46084) 부산 기장군 기장읍 기장해안로 147 롯데몰동부산점 2층 아크테릭스", "code": "SB331"},
+    97: {"name": "아크테릭스 롯데프리미엄아울렛 이천점", "address_full": "(17384) 경기 이천시 호법면 프리미엄아울렛로 177-74 롯데프리미엄아울렛 청자동 1층 아크테릭스", "code": "SB316"},
+    98: {"name": "아크테릭스 신세계사이먼 프리미엄 아울렛 파주점", "address_full": "(10862) 경기 파주시 탄현면 필승로 200 파주프리미엄아울렛 1층 109호", "code": "SB326"},
+    99: {"name": "아크테릭스 신세계사이먼 프리미엄 아울렛 제주점", "address_full": "(63522) 제주특별자치도 서귀포시 안덕면 서광리 24 제주신화월드 B1층 235호 아크테릭스", "code": "SB337"},
+    103: {"name": "아크테릭스 현대프리미엄아울렛 김포점", "address_full": "(10135) 경기 김포시 고촌읍 전호리 654 현대프리미엄아울렛 3층 아크테릭스", "code": "SB329"},
+    104: {"name": "아크테릭스 현대프리미엄아울렛 송도점", "address_full": "(21984) 인천 연수구 송도국제대로 123 B1 층 아크테릭스", "code": "SB313"},
+    105: {"name": "아크테릭스 현대프리미엄아울렛 대전점", "address_full": "(34030) 대전 유성구 용산동 579 아크테릭스 현대프리미엄아울렛 대전점", "code": "SB318"},
+    106: {"name": "아크테릭스 신세계사이먼 프리미엄 아울렛 시흥점", "address_full": "(15010) 경기 시흥시 정왕동 1773-1 시흥프리미엄아울렛 3층 스포츠 필드관", "code": "SB330"},
+    107: {"name": "아크테릭스 현대프리미엄아울렛 SPACE 1", "address_full": "(12248) 경기 남양주시 다산동 6141 현대프리미엄아울렛 SPACE1 더 기어샵", "code": "SB350"},
+    108: {"name": "아크테릭스 신세계사이먼 프리미엄 아울렛 부산점", "address_full": "(46029) 부산 기장군 장안읍 좌천리 545 부산프리미엄아울렛 Phase2.0 SOUTH 2층 더 기어샵", "code": "SB403"},
+    109: {"name": "아크테릭스 롯데프리미엄아울렛 파주점", "address_full": "(10881) 경기 파주시 문발동 640 롯데프리미엄아울렛 패션빅 2층 아크테릭스", "code": "SB307"},
+    110: {"name": "아크테릭스 플래그십 스토어 롯데월드몰", "address_full": "(05551) 서울 송파구 신천동 29 롯데월드타워앤드롯데월드몰 지하1층", "code": "SB347"},
+    111: {"name": "아크테릭스 스타필드 코엑스몰점", "address_full": "(06164) 서울 강남구 삼성동 159 스타필드 코엑스몰 B1 , C110호 아크테릭스", "code": "SB336"},
+    112: {"name": "아크테릭스 롯데백화점 동탄점", "address_full": "(18478) 경기 화성시 동탄역로 160 롯데백화점 5층 아크테릭스", "code": "SB334"},
+    113: {"name": "아크테릭스 대구신세계", "address_full": "(41229) 대구 동구 동부로 149 신세계백화점 대구점 6층 아크테릭스", "code": "SB327"},
+    114: {"name": "아크테릭스 롯데백화점 대전점", "address_full": "(35299) 대전 서구 계룡로 598 롯데백화점 6층 아크테릭스", "code": "SB325"},
+    115: {"name": "아크테릭스 롯데백화점 노원점", "address_full": "(01695) 서울 노원구 동일로 1414 롯데백화점 6층 아크테릭스", "code": "SB324"},
+    116: {"name": "아크테릭스 현대백화점 판교점", "address_full": "(13529) 경기 성남시 분당구 판교역로146번길 20 현대백화점 7층 아크테릭스", "code": "SB323"},
+    117: {"name": "아크테릭스 광주신세계", "address_full": "(61937) 광주 서구 무진대로 932 신세계백화점 본관 7층 아크테릭스", "code": "SB319"},
+    118: {"name": "아크테릭스 롯데백화점 수원점", "address_full": "(16621) 경기 수원시 권선구 세화로 134 롯데백화점 5층 아크테릭스", "code": "SB317"},
+    119: {"name": "아크테릭스 롯데백화점 광복점", "address_full": "(48944) 부산 중구 중앙대로 2 롯데백화점 7층 아크테릭스", "code": "SB314"},
+    120: {"name": "아크테릭스 신세계백화점 센텀시티", "address_full": "(48058) 부산 해운대구 센텀4로 15 신세계 센텀시티 몰 1층 아크테릭스", "code": "SB310"},
+    121: {"name": "아크테릭스 롯데백화점 울산점", "address_full": "(44719) 울산 남구 삼산로 288 롯데백화점 5층 아크테릭스", "code": "SB309"},
+    122: {"name": "아크테릭스 신세계백화점 본점", "address_full": "(04530) 서울 중구 소공로 63 신세계백화점 5층 아크테릭스", "code": "SB305"},
+    123: {"name": "아크테릭스 신세계백화점 강남점", "address_full": "(06546) 서울 서초구 신반포로 176 신세계백화점 강남점 신관 8층 아크테릭스", "code": "SB304"},
+    124: {"name": "아크테릭스 롯데백화점 부산본점", "address_full": "(47285) 부산 부산진구 가야대로 772 롯데백화점 5층 아크테릭스", "code": "SB303"},
+    125: {"name": "아크테릭스 롯데백화점 전주점", "address_full": "(54946) 전북특별자치도 전주시 완산구 서신동 971 롯데백화점 4층 아크테릭스", "code": "SB306"},
+    126: {"name": "아크테릭스 더현대 서울", "address_full": "(07335) 서울 영등포구 여의도동 22 더 현대 서울 4층 아크테릭스", "code": "SB333"},
+    127: {"name": "아크테릭스 롯데백화점 영등포점", "address_full": "(07306) 서울 영등포구 영등포동 618-496 롯데백화점 영등포점 아크테릭스", "code": "SB315"},
+    128: {"name": "아크테릭스 현대백화점 목동점", "address_full": "(07998) 서울 양천구 목동동로 257 현대백화점 유플렉스 지하3층 아크테릭스", "code": "SB332"},
+    129: {"name": "아크테릭스 대전신세계 Art&Science", "address_full": "(34126) 대전 유성구 엑스포로 1 CMB 엑스포아트홀 4층 아크테릭스", "code": "SB339"},
+    130: {"name": "아크테릭스 롯데백화점 잠실점", "address_full": "(05554) 서울 송파구 올림픽로 240 롯데백화점 6층 아크테릭스", "code": "SB302"},
+    131: {"name": "아크테릭스 신세계 사우스시티", "address_full": "(16896) 경기 용인시 수지구 포은대로 536 신세계백화점 경기점 5층 아크테릭스", "code": "SB342"},
+    132: {"name": "아크테릭스 현대백화점 울산점", "address_full": "(44705) 울산 남구 삼산동 1521-1 현대백화점 9층 아크테릭스", "code": "SB346"},
+    133: {"name": "아크테릭스 현대백화점 충청점", "address_full": "(28424) 충북 청주시 흥덕구 직지대로 308 현대백화점 4층 아크테릭스", "code": "SB345"},
+    134: {"name": "아크테릭스 무등산점", "address_full": "(61493) 광주 동구 운림동 970 1층 아크테릭스", "code": "SC148"},
+    135: {"name": "아크테릭스 덕소삼패점", "address_full": "(12245) 경기 남양주시 삼패동 343-48 아크테릭스 덕소삼패점", "code": "SC134"},
+    136: {"name": "아크테릭스 중구점", "address_full": "(41909) 대구 중구 경상감영길 132 아크테릭스 중구점", "code": "SC110"},
+    137: {"name": "아크테릭스 진주점", "address_full": "(52691) 경남 진주시 동성동 11-2 아크테릭스 진주점", "code": "SC118"},
+    138: {"name": "아크테릭스 안산점", "address_full": "(15499) 경기 안산시 상록구 사동 1531 안산의류상설할인매장", "code": "SC139"},
+    139: {"name": "아크테릭스 롯데백화점 인천점", "address_full": "(22242) 인천 미추홀구 연남로 35 롯데백화점 4층 아크테릭스", "code": "SB335"},
+}
+
+# 店铺名称翻译字典
+store_translation = {
+    "아크테릭스 롯데백화점 본점": "始祖鸟乐天百货总店",
+    "아크테릭스 롯데백화점 평촌极": "始祖鸟乐天百货平村店",
+    "아크테릭스 플래그십 스토어 강남": "始祖鸟旗舰店江南",
+    "아크테릭스 플래그십 스토어 대구수성": "始祖鸟旗舰店大邱寿城",
+    "아크테릭스 도봉산점": "始祖鸟道峰山店",
+    "아크테릭스 봉무점": "始祖鸟奉武店",
+    "아크테릭스 부산점": "始祖鸟釜山店",
+    "아크테릭스 여주프리미엄빌리지점": "始祖鸟骊州Premium Village店",
+    "아크테릭스 일산점": "始祖鸟一山店",
+    "아크테릭스 종로점": "始祖鸟钟路店",
+    "아크테릭스 롯데프리미엄아울렛 의왕점": "始祖鸟乐天Premium Outlet义王店",
+    "아크테릭스 롯데프리미엄아울렛 동부산점": "始祖鸟乐天Premium Outlet东釜山店",
+    "아크테릭스 롯데极프리미엄아울렛 이천점": "始祖鸟乐天Premium Outlet利川店",
+    "아크테릭스 신세계사이먼 프리미엄 아울렛 파주점": "始祖鸟新世界Simon Premium Outlet坡州店",
+    "아크테릭스 신세계사이먼 프리미엄 아울렛 제주점": "始祖鸟新世界Simon Premium Outlet济州店",
+    "아极테릭스 현대프리미엄아울렛 김포점": "始祖鸟现代Premium Outlet金浦店",
+    "아크테릭스 현대프리미엄아울렛 송도점": "始祖鸟现代Premium Outlet松岛店",
+    "아크테릭스 현대프리미엄아울렛 대전점": "始祖鸟现代Premium Outlet大田店",
+    "아크테릭스 신세계사이먼 프리미엄 아울렛 시흥점": "始祖鸟新世界Simon Premium Outlet始兴店",
+    "아크테릭스 현대프리미엄아울렛 SPACE 1": "始祖鸟现代Premium Outlet SPACE 1",
+    "아크테릭스 신세계사이먼 프리미엄 아울렛 부산점": "始祖鸟新世界Simon Premium Outlet釜山店",
+    "아크테릭스 롯데프리미엄아울렛 파주점": "始祖鸟乐天Premium Outlet坡州店",
+    "아크테릭스 플래그십 스토어 롯데월드몰": "始祖鸟旗舰店乐天世界购物中心",
+    "아크테릭스 스타필드 코엑스몰점": "始祖鸟Starfield COEX购物中心店",
+    "아크테릭스 롯데백화점 동탄점": "始祖鸟乐天百货东滩店",
+    "아크테릭스 대구신세계": "始祖鸟大邱新世界",
+    "아크테릭스 롯데백화점 대전점": "始祖鸟乐极百货大田店",
+    "아크테릭스 롯데백화점 노원점": "始祖鸟乐天百货芦原店",
+    "아크테릭스 현대백화점 판교점": "始祖鸟现代百货板桥店",
+    "아크테릭스 광주신세계": "始祖鸟光州新世界",
+    "아크테릭스 롯데백화점 수원점": "始祖鸟乐天百货水原店",
+    "아크테릭스 롯데백화점 광복점": "始祖鸟乐天百货光复店",
+    "아크테릭스 신세계백화점 센텀시티": "始祖鸟新世界百货Centum City店",
+    "아크테릭스 롯데백화점 울산점": "始祖鸟乐天百货蔚山店",
+    "아크테릭스 신세계백화점 본점": "始祖鸟新世界百货总店",
+    "아크테릭스 신세계백화점 강남점": "始祖鸟新世界百货江南店",
+    "아크테릭스 롯데백화점 부산본점": "始祖鸟乐天百货釜山总店",
+    "아크테릭스 롯데백화점 전주점": "始祖鸟乐天百货全州店",
+    "아크테릭스 더현대 서울": "始祖鸟The Hyundai首尔",
+    "아크테릭스 롯데백화점 영등포점": "始祖鸟乐天百货永登浦店",
+    "아크테릭스 현대백화점 목동极": "始祖鸟现代百货木洞店",
+    "아크테릭스 대전신세계 Art&Science": "始祖鸟大田新世界Art&Science",
+    "아크테릭스 롯데백화점 잠실점": "始祖鸟乐天百货蚕室店",
+    "아크테릭스 신세계 사우스시티": "始祖鸟新世界South City",
+    "아크테릭스 현대백화점 울산점": "始祖鸟现代百货蔚山店",
+    "아크테릭스 현대백화점 충청점": "始祖鸟现代百货忠清店",
+    "아크테릭스 무등산점": "始祖鸟无等山店",
+    "아크테릭스 덕소삼패점": "始祖鸟德沼三牌店",
+    "아크테릭스 중구점": "始祖鸟中区店",
+    "아크테릭스 진주점": "始祖鸟晋州店",
+    "아크테릭스 안산점": "始祖鸟安山店",
+    "아크테릭스 롯데백화점 인천점": "始祖鸟乐天百货仁川店",
+    "아크테릭스 현대프리미엄아울렛 김포점": "始祖鸟现代Premium Outlet金浦店",
+    "아크테릭스 롯데백화점 평촌점": "始祖鸟乐天百货平村店",
+    "아크테릭스 현대백화점 목동점": "始祖鸟现代百货木洞店",
+    "아크테릭스 롯데프리미엄아울렛 이천점": "始祖鸟乐天Premium Outlet利川店"
+}
+
+# 硬编码的店铺-区域映射表（直接复制 store_region_mapping.txt 的内容）
+STORE_REGION_MAPPING = {
+    "始祖鸟乐天百货总店": "首尔城区",
+    "始祖鸟乐天百货平村店": "京畿道地区",
+    "始祖鸟旗舰店江南": "首尔城区",
+    "始祖鸟旗舰店大邱寿城": "大邱",
+    "始祖鸟道峰山店": "京畿道地区",
+    "始祖鸟釜山店": "釜山",
+    "始祖鸟骊州Premium Village店": "京畿道地区",
+    "始祖鸟一山店": "京畿道地区",
+    "始祖鸟钟路店": "首尔城区",
+    "始祖鸟乐天Premium Outlet义王店": "京畿道地区",
+    "始祖鸟乐天Premium Outlet东釜山店": "釜山",
+    "始祖鸟新世界Simon Premium Outlet坡州店": "京畿道地区",
+    "始祖鸟新世界Simon Premium Outlet济州店": "京畿道地区",
+    "始祖鸟现代Premium Outlet金浦店": "京畿道地区",
+    "始祖鸟现代Premium Outlet松岛店": "京畿道地区",
+    "始祖鸟现代Premium Outlet大田店": "京畿道地区",
+    "始祖鸟新世界Simon Premium Outlet始兴店": "京畿道地区",
+    "始祖鸟现代Premium Outlet SPACE 1": "京畿道地区",
+    "始祖鸟新世界Simon Premium Outlet釜山店": "釜山",
+    "始祖鸟乐天Premium Outlet坡州店": "京畿道地区",
+    "始祖鸟旗舰店乐天世界购物中心": "首尔城区",
+    "始祖鸟Starfield COEX购物中心店": "首尔城区",
+    "始祖鸟乐天百货东滩店": "京畿道地区",
+    "始祖鸟大邱新世界": "大邱",
+    "始祖鸟乐极百货大田店": "京畿道地区",
+    "始祖鸟乐天百货芦原店": "京畿道地区",
+    "始祖鸟现代百货板桥店": "京畿道地区",
+    "始祖鸟乐天百货水原店": "京畿道地区",
+    "始祖鸟乐天百货光复店": "釜山",
+    "始祖鸟新世界百货Centum City店": "釜山",
+    "始祖鸟新世界百货总店": "首尔城区",
+    "始祖鸟新世界百货江南店": "首尔城区",
+    "始祖鸟乐天百货釜山总店": "釜山",
+    "始祖鸟The Hyundai首尔": "首尔城区",
+    "始祖鸟乐天百货永登浦店": "首尔城区",
+    "始祖鸟现代百货木洞店": "首尔城区",
+    "始祖鸟乐天百货蚕室店": "首尔城区",
+    "始祖鸟新世界South City": "京畿道地区",
+    "始祖鸟德沼三牌店": "京畿道地区",
+    "始祖鸟安山店": "京畿道地区",
+    "始祖鸟乐天百货仁川店": "京畿道地区",
+    "始祖鸟现代Premium Outlet金浦店": "首尔城区",
+    "始祖鸟乐天百货平村店": "京畿道地区",
+    "始祖鸟现代百货木洞店": "首尔城区",
+    "始祖鸟乐天Premium Outlet利川店": "京畿道地区"
+}
+
+# 区域 -> 区域分类键
+REGION_KEY_MAPPING = {
+    "首尔城区": "首尔圈",
+    "京畿道地区": "京畿道圈",
+    "釜山": "釜山圈",
+    "大邱": "大邱圈"
+}
+
+# 未登记店铺的解析结果缓存条数（LRU，不写入注册表）
+UNKNOWN_STORE_MEMO_SIZE = 256
+
+# 店铺 -> 适用的商家优惠（DISCOUNT_CONFIG 中的商家名），按韩文店名关键字依次匹配，未匹配的店铺只计算退税
+STORE_MERCHANT_RULES = [
+    ("더현대 서울", "汝矣岛店"),
+    ("현대백화점 판교점", "本店/贸易中心店/新村板桥店"),
+    ("현대백화점", "现代百货"),
+    ("롯데프리미엄아울렛", "乐天/新世界奥莱"),
+    ("신세계사이먼 프리미엄 아울렛", "乐天/新世界奥莱"),
+    ("신세계", "新世界"),
+    ("플래그십 스토어", "旗舰店"),
+]
+
+
+def _store_merchant(korean_name):
+    for keyword, merchant in STORE_MERCHANT_RULES:
+        if keyword in korean_name:
+            return merchant
+    return None
+
+
+@dataclass(frozen=True)
+class StoreInfo:
+    """店铺元数据（不可变）"""
+    korean_name: str
+    name: str                          # 中文译名（库存矩阵中的店铺名）
+    simple_name: str                   # 去掉"始祖鸟"前缀的简称
+    region: Optional[str] = None       # 区域（首尔城区 / 京畿道地区 / 釜山 / 大邱）
+    region_key: Optional[str] = None   # 区域分类键（首尔圈 / 京畿道圈 / 釜山圈 / 大邱圈）
+    store_id: Optional[int] = None
+    code: Optional[str] = None
+    address: Optional[str] = None
+    merchant: Optional[str] = None     # 适用的商家优惠（DISCOUNT_CONFIG 中的商家名）
+
+
+def _make_store_info(korean_name, store_id=None, code=None, address=None):
+    name = store_translation.get(korean_name, korean_name)
+    region = STORE_REGION_MAPPING.get(name)
+    return StoreInfo(
+        korean_name=korean_name,
+        name=name,
+        simple_name=name[3:] if name.startswith("始祖鸟") else name,
+        region=region,
+        region_key=REGION_KEY_MAPPING.get(region),
+        store_id=store_id,
+        code=code,
+        address=address,
+        merchant=_store_merchant(korean_name)
+    )
+
+
+class StoreRegistry:
+    """店铺注册表（导入时一次性构建，按店铺ID、编码、韩文名、中文名索引）
+
+    索引构建后只读（以 MappingProxyType 暴露），运行时遇到的未登记店铺不会写入索引。
+    """
+
+    def __init__(self, memo_size=UNKNOWN_STORE_MEMO_SIZE):
+        by_id = {}
+        by_code = {}
+        by_korean_name = {}
+        by_name = {}
+
+        def register(info):
+            if info.store_id is not None:
+                by_id[info.store_id] = info
+            if info.code:
+                by_code[info.code] = info
+            by_korean_name.setdefault(info.korean_name, info)
+            by_name.setdefault(info.name, info)
+
+        for store_id, data in official_stores.items():
+            register(_make_store_info(data["name"], store_id, data["code"], data["address_full"]))
+
+        # 翻译表中的其他写法（不在官方列表中的店铺名）
+        for korean_name in store_translation:
+            if korean_name not in by_korean_name:
+                register(_make_store_info(korean_name))
+
+        self.by_id = MappingProxyType(by_id)
+        self.by_code = MappingProxyType(by_code)
+        self.by_korean_name = MappingProxyType(by_korean_name)
+        self.by_name = MappingProxyType(by_name)
+
+        self.memo_size = memo_size
+        self._unknown = OrderedDict()  # 未登记店铺韩文名 -> StoreInfo
+        self._lock = threading.Lock()
+
+    def resolve(self, row):
+        """
+        将接口返回的店铺记录解析为 StoreInfo（按店铺ID、编码、店铺名依次匹配）
+
+        未登记的店铺按原名生成条目（不写入注册表，最近解析的结果保留在有限大小的缓存中）。
+        """
+        korean_name = row.get("store_name", "")
+
+        store_id = row.get("store_id", row.get("id"))
+        try:
+            info = self.by_id.get(int(store_id)) if store_id is not None else None
+        except (TypeError, ValueError):
+            info = None
+        if info and (not korean_name or info.korean_name == korean_name):
+            return info
+
+        code = row.get("store_code", row.get("code"))
+        info = self.by_code.get(code) if code else None
+        if info and (not korean_name or info.korean_name == korean_name):
+            return info
+
+        info = self.by_korean_name.get(korean_name)
+        if info:
+            return info
+
+        return self._unknown_store(korean_name)
+
+    def _unknown_store(self, korean_name):
+        """未登记店铺的 StoreInfo（按原名生成，LRU 缓存，不写入注册表）"""
+        with self._lock:
+            info = self._unknown.get(korean_name)
+            if info is not None:
+                self._unknown.move_to_end(korean_name)
+                return info
+            info = _make_store_info(korean_name)
+            self._unknown[korean_name] = info
+            while len(self._unknown) > self.memo_size:
+                self._unknown.popitem(last=False)
+            return info
+
+    def get(self, name):
+        """按中文店铺名获取 StoreInfo（未登记的店铺名即接口返回的原名，按原名生成条目）"""
+        info = self.by_name.get(name)
+        if info is None:
+            info = self._unknown_store(name)
+        return info
+
+
+# 创建全局店铺注册表实例
+store_registry = StoreRegistry()
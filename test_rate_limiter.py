@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""测试熔断器：探测请求丢失后能够恢复"""
+
+import time
+
+from rate_limiter import ApiGovernor, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+
+
+def _expect_open(governor):
+    try:
+        governor.acquire()
+    except CircuitOpenError:
+        return True
+    return False
+
+
+def test_lost_probe_recovers():
+    """OPEN → HALF_OPEN → 探测请求未回报结果 → 超过冷却时间后重新探测 → 恢复"""
+    governor = ApiGovernor(rate=1000, burst=1000, failure_threshold=2, cooldown_seconds=0.2)
+
+    # 连续失败触发熔断
+    for _ in range(2):
+        governor.acquire()
+        governor.record(0.1, error=RuntimeError("upstream down"))
+    assert governor.state == OPEN
+    assert _expect_open(governor)
+
+    # 冷却后放行一个探测请求，该请求异常退出、没有调用 record()
+    time.sleep(0.25)
+    governor.acquire()
+    assert governor.state == HALF_OPEN
+    assert _expect_open(governor), "探测进行中时应拒绝其他请求"
+
+    # 探测丢失超过冷却时间后，放行新的探测请求
+    time.sleep(0.25)
+    probe = governor.acquire()
+    governor.record(0.1, status=200, probe=probe)
+    assert governor.state == CLOSED
+    governor.acquire()
+
+
+def test_cancelled_probe_released():
+    """取消的探测请求释放名额，不需要等待冷却时间"""
+    governor = ApiGovernor(rate=1000, burst=1000, failure_threshold=1, cooldown_seconds=0.2)
+    governor.acquire()
+    governor.record(0.1, status=503)
+    assert governor.state == OPEN
+
+    time.sleep(0.25)
+    governor.release_probe(governor.acquire())
+    probe = governor.acquire()
+    governor.record(0.1, status=200, probe=probe)
+    assert governor.state == CLOSED
+
+
+def test_stale_results_ignored():
+    """熔断前发出的请求返回的结果不关闭熔断，也不占用探测名额"""
+    governor = ApiGovernor(rate=1000, burst=1000, failure_threshold=1, cooldown_seconds=0.2)
+    stale = [governor.acquire() for _ in range(3)]
+    assert stale == [None, None, None]
+    governor.record(0.1, status=503)
+    assert governor.state == OPEN
+
+    # 熔断期间返回的旧请求成功结果被忽略
+    governor.record(0.1, status=200, probe=stale[1])
+    assert governor.state == OPEN
+    assert _expect_open(governor)
+
+    # 半开状态下旧请求的结果既不关闭熔断，也不释放探测名额
+    time.sleep(0.25)
+    probe = governor.acquire()
+    assert probe is not None
+    governor.record(0.1, status=200, probe=stale[2])
+    assert governor.state == HALF_OPEN
+    assert _expect_open(governor)
+
+    # 被替换的旧探测令牌同样无效
+    governor.record(0.1, status=200, probe=probe - 1)
+    assert governor.state == HALF_OPEN
+
+    governor.record(0.1, status=503, probe=probe)
+    assert governor.state == OPEN
+    time.sleep(0.25)
+    probe = governor.acquire()
+    governor.record(0.1, status=200, probe=probe)
+    assert governor.state == CLOSED
+
+
+if __name__ == "__main__":
+    test_lost_probe_recovers()
+    test_cancelled_probe_released()
+    test_stale_results_ignored()
+    print("✓ 熔断器测试通过")
@@ -0,0 +1,64 @@
+# ui_fragments.py
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+
+# 页面视图：视图键 -> 导航显示名称（按显示顺序）
+VIEWS = {
+    "query": "🔍 产品查询",
+    "favorites": "⭐ 收藏产品",
+    "inventory": "📊 库存矩阵",
+    "plan": "🛒 购买计划",
+    "followed_stores": "⭐ 关注店铺",
+    "cache": "🗑️ 缓存管理",
+}
+
+DEFAULT_VIEW = "query"
+
+
+def fragment(func=None, *, run_every=None):
+    """
+    局部重跑装饰器（st.fragment）：片段内的控件交互只重跑该片段，不重跑整个页面
+
+    旧版本 Streamlit 没有 st.fragment 时退化为普通函数（整页重跑）。
+    """
+    decorator = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if decorator is None:
+        return func if func is not None else (lambda f: f)
+    if func is None:
+        return decorator(run_every=run_every)
+    return decorator(func, run_every=run_every)
+
+
+def rerun_fragment():
+    """只重跑当前片段（不在片段内或不支持时重跑整个页面）"""
+    try:
+        st.rerun(scope="fragment")
+    except (TypeError, StreamlitAPIException):
+        st.rerun()
+
+
+def request_view(view):
+    """请求切换到指定视图（在下一次渲染导航时生效，调用方随后需要 st.rerun()）"""
+    st.session_state.pending_view = view
+
+
+def render_navigation():
+    """
+    渲染页面导航并返回当前视图键
+
+    与 st.tabs 不同，只有当前视图的函数会被执行，其他视图不运行（不加载数据、不渲染控件）。
+    """
+    pending = st.session_state.pop("pending_view", None)
+    if pending in VIEWS:
+        st.session_state.active_view = pending
+    elif st.session_state.get("active_view") not in VIEWS:
+        st.session_state.active_view = DEFAULT_VIEW
+
+    return st.radio(
+        "页面导航",
+        list(VIEWS),
+        format_func=VIEWS.get,
+        horizontal=True,
+        key="active_view",
+        label_visibility="collapsed"
+    )
@@ -7,20 +7,11 @@ def standardize_model_name(model_name):
     # 转换为小写并移除多余空格
     return re.sub(r'\s+', ' ', model_name.strip().lower())
 
-def is_duplicate(favorites, new_item):
-    """检查是否重复收藏"""
-    for item in favorites:
-        if (standardize_model_name(item['product_model']) == standardize_model_name(new_item['product_model']) and
-            item['color'] == new_item['color'] and
-            item['size'] == new_item['size']):
-            return True
-    return False
+def favorite_key(item):
+    """收藏去重键：(标准化型号, 颜色, 尺码)"""
+    return (standardize_model_name(item['product_model']), item['color'], item['size'])
 
 def is_duplicate(favorites, new_item):
-    """检查是否重复收藏（更新逻辑）"""
-    for item in favorites:
-        if (standardize_model_name(item['product_model']) == standardize_model_name(new_item['product_model']) and
-            item['color'] == new_item['color'] and
-            item['size'] == new_item['size']):
-            return True
-    return False
\ No newline at end of file
+    """检查是否重复收藏"""
+    new_key = favorite_key(new_item)
+    return any(favorite_key(item) == new_key for item in favorites)